@@ -1,9 +1,30 @@
 from django.contrib import admin
-from .models import Customer, Product, Round, Order, OrderItem
+from django.core.paginator import Paginator
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.utils.functional import cached_property
+
+from . import ledger
+from .models import Customer, Product, Round, Order, OrderItem, PriceList, PriceListEntry
+from .summary import LINE_REVENUE
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Zählt höchstens COUNT_LIMIT + 1 Zeilen (COUNT über ein LIMIT-Subquery) statt
+    COUNT(*) über die ganze Tabelle. Darüber zeigt die Liste nur COUNT_LIMIT
+    Einträge an Seiten an – wer so weit blättert, filtert besser.
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        return min(self.object_list[:self.COUNT_LIMIT + 1].count(), self.COUNT_LIMIT)
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ("name", "phone", "active")
+    list_display = ("name", "phone", "active", "balance")
+    readonly_fields = ("balance",)
     search_fields = ("name", "phone")
     list_filter = ("active",)
 
@@ -17,15 +38,55 @@ class ProductAdmin(admin.ModelAdmin):
 class RoundAdmin(admin.ModelAdmin):
     list_display = ("date", "travel_km", "is_active")
     list_filter = ("is_active",)
+    search_fields = ("date",)  # für die Autocomplete-Auswahl in Bestellungen
     ordering = ("-is_active", "-date")
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ("product",)
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("customer", "round", "source", "paid", "picked_up", "created_at")
-    list_filter = ("paid", "picked_up", "source", "round")
+    list_display = ("customer", "round", "source", "paid", "picked_up", "total", "created_at")
+    list_select_related = ("customer", "round")
+    # Datumsnavigation statt eines Filters, der jede Runde in die Seitenleiste lädt
+    list_filter = ("paid", "picked_up", "source")
+    date_hierarchy = "round__date"
     search_fields = ("customer__name",)
+    autocomplete_fields = ("customer", "round")
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     inlines = [OrderItemInline]
+
+    def get_queryset(self, request):
+        # Bestellsumme als Subquery je Zeile, kein GROUP BY über die ganze Liste
+        totals = (
+            OrderItem.objects
+            .filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(total=Sum(LINE_REVENUE))
+            .values("total")
+        )
+        return super().get_queryset(request).annotate(total=Subquery(totals, output_field=DecimalField()))
+
+    @admin.display(description="Summe", ordering="total")
+    def total(self, obj):
+        return f"{obj.total or 0:.2f} €"
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # als bezahlt gespeichert: Positionen kommen erst nach der Bestellung -> jetzt ausbuchen
+        if form.instance.paid and (not change or "paid" in form.changed_data):
+            ledger.settle_orders(Order.objects.filter(pk=form.instance.pk))
+
+class PriceListEntryInline(admin.TabularInline):
+    model = PriceListEntry
+    extra = 0
+    autocomplete_fields = ("product",)
+
+@admin.register(PriceList)
+class PriceListAdmin(admin.ModelAdmin):
+    list_display = ("name", "valid_from", "created_at")
+    date_hierarchy = "valid_from"
+    inlines = [PriceListEntryInline]
@@ -0,0 +1,161 @@
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Max, Sum
+
+from .models import NEVER, Customer, OrderItem, Round, RoundSummary, SalesFact
+from .summary import LINE_COST, LINE_REVENUE
+
+
+def refresh_round(round_id, version=None, using=DEFAULT_DB_ALIAS):
+    """
+    Ersetzt die SalesFact-Zeilen einer Runde durch ein frisches Aggregat ihrer
+    Positionen (using: Datenbank, in der die Runde liegt, z.B. das Archiv).
+    version: data_version der Runde, die dabei als facts_version vermerkt wird.
+    """
+    round_date = Round.objects.using(using).filter(pk=round_id).values_list("date", flat=True).first()
+    rows = (
+        OrderItem.objects
+        .using(using)
+        .filter(order__round_id=round_id)
+        .values("product_id", "order__customer_id")
+        .annotate(qty=Sum("quantity"), revenue=Sum(LINE_REVENUE), cost=Sum(LINE_COST))
+        .order_by()
+    )
+    facts = [
+        SalesFact(
+            round_id=round_id,
+            round_date=round_date,
+            product_id=row["product_id"],
+            customer_id=row["order__customer_id"],
+            quantity=row["qty"],
+            revenue=row["revenue"],
+            cost=row["cost"],
+        )
+        for row in rows
+    ] if round_date else []
+
+    with transaction.atomic():
+        customer_ids = _round_customers(round_id) | {fact.customer_id for fact in facts}
+        SalesFact.objects.filter(round_id=round_id).delete()
+        SalesFact.objects.bulk_create(facts, batch_size=1000)
+        if version is not None:
+            RoundSummary.objects.filter(round_id=round_id).update(facts_version=version)
+        update_customer_activity(customer_ids)
+    return len(facts)
+
+
+def _round_customers(round_id):
+    return set(SalesFact.objects.filter(round_id=round_id).values_list("customer_id", flat=True).distinct())
+
+
+MONEY = Decimal("0.01")
+
+
+def update_customer_activity(customer_ids=None):
+    """
+    Kennzahlen der Kundenliste (letzte Bestellung, Anzahl Runden, Umsatz) aus den
+    SalesFacts (inkl. archivierter Runden) in die Kundenzeilen schreiben, ein
+    gruppierter Query. customer_ids: nur diese Kunden, None = alle.
+    """
+    rows = (
+        SalesFact.objects
+        .values("customer_id")
+        .annotate(last=Max("round_date"), rounds=Count("round_id", distinct=True), total=Sum("revenue"))
+        .order_by()
+    )
+    customers = Customer.objects.only("pk", "last_order", "round_count", "revenue")
+    if customer_ids is not None:
+        rows = rows.filter(customer_id__in=customer_ids)
+        customers = customers.filter(pk__in=customer_ids)
+    stats = {row["customer_id"]: row for row in rows}
+
+    changed = []
+    for customer in customers:
+        row = stats.get(customer.pk, {})
+        values = (
+            row.get("last") or NEVER,
+            row.get("rounds") or 0,
+            Decimal(str(row.get("total") or 0)).quantize(MONEY),
+        )
+        if (customer.last_order, customer.round_count, customer.revenue) != values:
+            customer.last_order, customer.round_count, customer.revenue = values
+            changed.append(customer)
+    Customer.objects.bulk_update(changed, ["last_order", "round_count", "revenue"], batch_size=500)
+    return len(changed)
+
+
+def _stale():
+    return RoundSummary.objects.exclude(facts_version=F("data_version"))
+
+
+def stale_count():
+    """Runden, deren Bestellungen sich seit dem letzten Aufbau der Fakten geändert haben."""
+    return _stale().count()
+
+
+def refresh_stale():
+    """
+    Bringt die Fakten aller veralteten Runden auf Stand – im Alltag nur die
+    laufende Runde. Läuft per Knopf auf den Auswertungen und per
+    manage.py rebuild_sales_facts --stale (Cron), nie nebenbei in einem anderen Request.
+    """
+    stale = list(_stale().values_list("round_id", "data_version"))
+    for round_id, version in stale:
+        refresh_round(round_id, version)
+    return len(stale)
+
+
+def forget_round(round_id):
+    customer_ids = _round_customers(round_id)
+    SalesFact.objects.filter(round_id=round_id).delete()
+    update_customer_activity(customer_ids)
+
+
+def _in_range(facts, date_from=None, date_to=None):
+    if date_from:
+        facts = facts.filter(round_date__gte=date_from)
+    if date_to:
+        facts = facts.filter(round_date__lte=date_to)
+    return facts
+
+
+def product_stats(date_from=None, date_to=None):
+    """Menge, Umsatz, Einkauf und Marge je Produkt."""
+    return (
+        _in_range(SalesFact.objects.all(), date_from, date_to)
+        .values("product_id", "product__name", "product__unit")
+        .annotate(
+            total_qty=Sum("quantity"),
+            total_revenue=Sum("revenue"),
+            margin=Sum(F("revenue") - F("cost")),
+            rounds=Count("round_id", distinct=True),
+        )
+        .order_by("-total_revenue")
+    )
+
+
+def product_trend(product, limit=20):
+    """Nachfrage eines Produkts je Runde (die letzten limit Runden, älteste zuerst)."""
+    rows = (
+        SalesFact.objects
+        .filter(product=product)
+        .values("round_id", "round_date")
+        .annotate(total_qty=Sum("quantity"), customers=Count("customer_id"))
+        .order_by("-round_date", "-round_id")[:limit]
+    )
+    return list(reversed(rows))
+
+
+def customer_stats(date_from=None, date_to=None, limit=100):
+    """Umsatz und Häufigkeit je Kunde, umsatzstärkste zuerst."""
+    return (
+        _in_range(SalesFact.objects.all(), date_from, date_to)
+        .values("customer_id", "customer__name")
+        .annotate(
+            total_revenue=Sum("revenue"),
+            rounds=Count("round_id", distinct=True),
+            last_date=Max("round_date"),
+        )
+        .order_by("-total_revenue")[:limit]
+    )
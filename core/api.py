@@ -0,0 +1,547 @@
+"""
+JSON-API für den Mobil-Client: Listen mit Cursor-Paginierung und Feldauswahl,
+dazu Sammel-Endpunkte, die viele Bestellungen/Produkte in einer Transaktion schreiben.
+
+    GET  api/<resource>/?fields=id,name&limit=100&cursor=…   (rounds, orders, items, customers, products)
+    POST api/orders/bulk/     {"create": [...], "update": [...]}
+    POST api/products/bulk/   {"create": [...], "update": [...]}
+    POST api/sync/            {"mutations": [{"key": "…", "type": "create_order", "data": {...}}]}
+
+Anmeldung über die normale Session, POST mit X-CSRFToken.
+"""
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Customer, Order, OrderItem, Product, Round, SyncMutation
+from .orders import create_order, update_order
+from .paging import keyset_page
+from .utils import parse_decimal
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_BULK = 500
+SYNC_KEEP_DAYS = 30  # so lange werden Idempotenz-Schlüssel aufbewahrt
+
+
+def _parse_bool(value):
+    value = str(value).strip().lower()
+    if value in ("1", "true", "ja"):
+        return True
+    if value in ("0", "false", "nein"):
+        return False
+    return None
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_datetime(value):
+    try:
+        return parse_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Resource:
+    """
+    Auslieferbare Felder (Name im JSON -> ORM-Pfad), erlaubte Filter (Parameter -> (Lookup, Parser))
+    und die Sortierung für die Keyset-Paginierung (immer mit eindeutigem letzten Feld).
+    """
+
+    def __init__(self, model, fields, ordering, filters=None, default_fields=None):
+        self.model = model
+        self.fields = fields
+        self.ordering = ordering
+        self.filters = filters or {}
+        self.default_fields = default_fields or [name for name in fields if name != "items"]
+
+
+RESOURCES = {
+    "rounds": Resource(
+        Round,
+        {"id": "id", "date": "date", "is_active": "is_active", "travel_km": "travel_km"},
+        ordering=["-date", "-id"],
+        filters={"active": ("is_active", _parse_bool)},
+    ),
+    "orders": Resource(
+        Order,
+        {
+            "id": "id", "round_id": "round_id", "customer_id": "customer_id", "customer_name": "customer__name",
+            "source": "source", "comment": "comment", "paid": "paid", "picked_up": "picked_up",
+            "created_at": "created_at", "version": "version",
+            "items": None,  # Positionen, ein zusätzlicher Query pro Seite
+        },
+        ordering=["id"],
+        filters={
+            "round": ("round_id", _parse_id), "customer": ("customer_id", _parse_id),
+            "paid": ("paid", _parse_bool), "picked_up": ("picked_up", _parse_bool),
+        },
+    ),
+    "items": Resource(
+        OrderItem,
+        {
+            "id": "id", "order_id": "order_id", "product_id": "product_id", "quantity": "quantity",
+            "sell_price": "sell_price", "buy_price": "buy_price",
+        },
+        ordering=["id"],
+        filters={
+            "order": ("order_id", _parse_id), "round": ("order__round_id", _parse_id),
+            "product": ("product_id", _parse_id),
+        },
+    ),
+    "customers": Resource(
+        Customer,
+        {
+            "id": "id", "name": "name", "phone": "phone", "active": "active", "notes": "notes",
+            "updated_at": "updated_at",
+        },
+        ordering=["name", "id"],
+        # changed_since: nur geänderte Kunden (Offline-Kundenliste in quick_order.html)
+        filters={"active": ("active", _parse_bool), "changed_since": ("updated_at__gte", _parse_datetime)},
+    ),
+    "products": Resource(
+        Product,
+        {
+            "id": "id", "name": "name", "unit": "unit", "sell_price": "sell_price",
+            "buy_price": "buy_price", "active": "active", "pack_size": "pack_size",
+        },
+        ordering=["name", "id"],
+        filters={"active": ("active", _parse_bool)},
+    ),
+}
+
+ITEM_FIELDS = ["id", "product_id", "quantity", "sell_price", "buy_price"]
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+
+def api_view(method):
+    """Session-Login prüfen (401 statt Redirect), Methode prüfen, ApiError -> JSON."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({"error": "Nicht angemeldet"}, status=401)
+            if request.method != method:
+                return JsonResponse({"error": f"Nur {method}"}, status=405)
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                body = {"error": str(exc)}
+                if exc.errors:
+                    body["errors"] = exc.errors
+                return JsonResponse(body, status=exc.status)
+        return wrapper
+    return decorator
+
+
+def _selected_fields(spec, raw):
+    if not raw:
+        return spec.default_fields
+    fields = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in spec.fields]
+    if unknown:
+        raise ApiError(f"Unbekannte Felder: {', '.join(unknown)}")
+    return fields
+
+
+def _filtered(spec, params):
+    queryset = spec.model.objects.all()
+    for param, (lookup, parse) in spec.filters.items():
+        if param not in params:
+            continue
+        value = parse(params[param])
+        if value is None:
+            raise ApiError(f"Ungültiger Filter {param}")
+        queryset = queryset.filter(**{lookup: value})
+    if "ids" in params:
+        ids = [_parse_id(value) for value in params["ids"].split(",")]
+        if None in ids:
+            raise ApiError("Ungültige ids")
+        queryset = queryset.filter(pk__in=ids)
+    return queryset
+
+
+def _attach_items(rows):
+    by_order = {row["id"]: row for row in rows}
+    for row in rows:
+        row["items"] = []
+    items = (
+        OrderItem.objects
+        .filter(order_id__in=by_order)
+        .order_by("id")
+        .values("order_id", *ITEM_FIELDS)
+    )
+    for item in items:
+        by_order[item.pop("order_id")]["items"].append(item)
+
+
+@api_view("GET")
+def resource_list(request, resource):
+    spec = RESOURCES.get(resource)
+    if spec is None:
+        raise ApiError("Unbekannte Ressource", status=404)
+
+    fields = _selected_fields(spec, request.GET.get("fields"))
+    limit = _parse_id(request.GET.get("limit")) or DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    # nur die angefragten Spalten laden (plus Sortierfelder für den Cursor, plus id für items)
+    wanted = {name for name in fields if name != "items"}
+    wanted |= {field.lstrip("-") for field in spec.ordering}
+    if "items" in fields:
+        wanted.add("id")
+    plain = [name for name in wanted if spec.fields[name] == name]
+    aliased = {name: F(spec.fields[name]) for name in wanted if spec.fields[name] != name}
+
+    queryset = _filtered(spec, request.GET).values(*plain, **aliased)
+    rows, next_cursor = keyset_page(queryset, spec.ordering, request.GET.get("cursor"), size=limit)
+    if "items" in fields:
+        _attach_items(rows)
+
+    return JsonResponse({
+        "results": [{name: row[name] for name in fields} for row in rows],
+        "next": next_cursor,
+    })
+
+
+def _read_bulk(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        raise ApiError("Kein gültiges JSON")
+    if not isinstance(payload, dict):
+        raise ApiError("JSON-Objekt erwartet")
+    create = payload.get("create") or []
+    update = payload.get("update") or []
+    if not isinstance(create, list) or not isinstance(update, list):
+        raise ApiError("create/update müssen Listen sein")
+    if len(create) + len(update) > MAX_BULK:
+        raise ApiError(f"Höchstens {MAX_BULK} Einträge pro Anfrage", status=413)
+    return create, update
+
+
+def _quantity(value):
+    # gleiche Regeln wie im Formular ("1,5", " 2.25 "), Zahlen aus JSON als Text
+    return parse_decimal(None if value is None else str(value))
+
+
+def _lines(entry, products, errors, where, allow_zero):
+    """items eines Eintrags -> [(product, Menge)], Fehler landen in errors."""
+    raw_items = entry.get("items") or []
+    if not isinstance(raw_items, list):
+        errors.append({**where, "error": "items muss eine Liste sein"})
+        return []
+    lines = []
+    for raw in raw_items:
+        product = products.get(_parse_id(raw.get("product")) if isinstance(raw, dict) else None)
+        qty = _quantity(raw.get("quantity")) if isinstance(raw, dict) else None
+        if product is None:
+            errors.append({**where, "error": "Unbekanntes oder inaktives Produkt"})
+        elif qty is None or qty < 0 or (qty == 0 and not allow_zero):
+            errors.append({**where, "error": f"Ungültige Menge für {product.name}"})
+        else:
+            lines.append((product, qty))
+    return lines
+
+
+def _ids(entries, key):
+    return {_parse_id(entry.get(key)) for entry in entries if isinstance(entry, dict)} - {None}
+
+
+class OrderLookups:
+    """Runden, Kunden, Produkte und Bestellungen eines ganzen Stapels, je ein Query."""
+
+    def __init__(self, create, update):
+        entries = [entry for entry in create + update if isinstance(entry, dict)]
+        product_ids = {
+            _parse_id(raw.get("product"))
+            for entry in entries if isinstance(entry.get("items"), list)
+            for raw in entry["items"] if isinstance(raw, dict)
+        } - {None}
+        self.rounds = Round.objects.in_bulk(_ids(create, "round"))
+        self.customers = Customer.objects.in_bulk(_ids(create, "customer"))
+        self.products = Product.objects.filter(active=True).in_bulk(product_ids)
+        # nur zum Prüfen; Positionen liest _apply_update je Änderung frisch
+        self.orders = Order.objects.in_bulk(_ids(update, "id"))
+
+
+def _check_create(entry, lookups, errors, where):
+    """Prüft eine neue Bestellung, gibt die Argumente für create_order zurück (oder None)."""
+    if not isinstance(entry, dict):
+        errors.append({**where, "error": "Objekt erwartet"})
+        return None
+    count = len(errors)
+    rnd = lookups.rounds.get(_parse_id(entry.get("round")))
+    customer = lookups.customers.get(_parse_id(entry.get("customer")))
+    source = entry.get("source") or Order.Source.CALL
+    if rnd is None:
+        errors.append({**where, "error": "Unbekannte Runde"})
+    if customer is None:
+        errors.append({**where, "error": "Unbekannter Kunde"})
+    if source not in Order.Source.values:
+        errors.append({**where, "error": "Unbekannte Quelle"})
+    lines = _lines(entry, lookups.products, errors, where, allow_zero=False)
+    if not lines:
+        errors.append({**where, "error": "Keine Positionen"})
+    if len(errors) > count:
+        return None
+    return rnd, customer, lines, source, str(entry.get("comment") or "")
+
+
+def _check_update(entry, lookups, errors, where):
+    """Prüft eine Änderung, gibt (order, wanted, fields) für update_order zurück (oder None)."""
+    if not isinstance(entry, dict):
+        errors.append({**where, "error": "Objekt erwartet"})
+        return None
+    order = lookups.orders.get(_parse_id(entry.get("id")))
+    if order is None:
+        errors.append({**where, "error": "Unbekannte Bestellung"})
+        return None
+    count = len(errors)
+    fields = {}
+    for name in ("paid", "picked_up"):
+        if name in entry:
+            value = _parse_bool(entry[name])
+            if value is None:
+                errors.append({**where, "error": f"{name} muss true/false sein"})
+            fields[name] = value
+    if "comment" in entry:
+        fields["comment"] = str(entry["comment"] or "")
+    if "source" in entry:
+        if entry["source"] not in Order.Source.values:
+            errors.append({**where, "error": "Unbekannte Quelle"})
+        fields["source"] = entry["source"]
+    lines = _lines(entry, lookups.products, errors, where, allow_zero=True)
+    if len(errors) > count:
+        return None
+    return order, {product.id: (product, qty) for product, qty in lines}, fields
+
+
+def _apply_create(rnd, customer, lines, source, comment):
+    return create_order(rnd, customer, lines, source=source, comment=comment).id
+
+
+def _apply_update(order, wanted, fields):
+    """
+    Gibt (id, gelöscht) zurück – ohne übrige Positionen löscht update_order die Bestellung.
+    Bestellung und Positionen werden frisch gelesen, denn eine frühere Änderung im
+    selben Stapel kann sie schon geändert oder gelöscht haben. Gelöscht -> None.
+    """
+    order_id = order.id
+    order = Order.objects.filter(pk=order_id).first()
+    if order is None:
+        return None
+    existing = {item.product_id: item for item in OrderItem.objects.filter(order_id=order_id)}
+    update_order(order, existing, wanted, **fields)
+    return order_id, order.pk is None
+
+
+@api_view("POST")
+def orders_bulk(request):
+    """
+    Viele Bestellungen anlegen/ändern, alles oder nichts:
+      create: [{"round": 1, "customer": 2, "source": "call", "comment": "", "items": [{"product": 3, "quantity": "1,5"}]}]
+      update: [{"id": 7, "paid": true, "comment": "…", "items": [{"product": 3, "quantity": "0"}]}]
+    Bei update werden nur die genannten Produkte geändert, Menge 0 entfernt die Position.
+    Erst wird alles geprüft und mit wenigen Queries vorgeladen, dann in einer Transaktion geschrieben.
+    """
+    create, update = _read_bulk(request)
+    lookups = OrderLookups(create, update)
+
+    errors = []
+    to_create = [_check_create(entry, lookups, errors, {"create": i}) for i, entry in enumerate(create)]
+    to_update = [_check_update(entry, lookups, errors, {"update": i}) for i, entry in enumerate(update)]
+    if errors:
+        raise ApiError("Nichts gespeichert, Eingaben prüfen", errors=errors)
+
+    try:
+        with transaction.atomic():
+            created = [_apply_create(*plan) for plan in to_create]
+            updated, deleted = [], []
+            for i, plan in enumerate(to_update):
+                applied = _apply_update(*plan)
+                if applied is None:
+                    raise ApiError("Nichts gespeichert, Eingaben prüfen", errors=[
+                        {"update": i, "error": "Bestellung wurde im selben Stapel gelöscht"},
+                    ])
+                order_id, gone = applied
+                if gone:
+                    deleted.append(order_id)
+                elif order_id not in updated:
+                    updated.append(order_id)
+    except DatabaseError:
+        raise ApiError("Speichern fehlgeschlagen, nichts geändert", status=409)
+
+    return JsonResponse({"created": created, "updated": updated, "deleted": deleted}, status=201 if created else 200)
+
+
+def _read_mutations(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        raise ApiError("Kein gültiges JSON")
+    mutations = payload.get("mutations") if isinstance(payload, dict) else None
+    if not isinstance(mutations, list):
+        raise ApiError("mutations muss eine Liste sein")
+    if len(mutations) > MAX_BULK:
+        raise ApiError(f"Höchstens {MAX_BULK} Einträge pro Anfrage", status=413)
+    for mutation in mutations:
+        key = mutation.get("key") if isinstance(mutation, dict) else None
+        if not isinstance(key, str) or not 0 < len(key) <= 64:
+            raise ApiError("Jede Änderung braucht einen key (max. 64 Zeichen)")
+    return mutations
+
+
+@api_view("POST")
+def sync(request):
+    """
+    Offline-Warteschlange abarbeiten: jede Änderung hat einen vom Client erzeugten
+    key. Schon verarbeitete keys liefern ihr gespeichertes Ergebnis erneut (doppeltes
+    Senden schadet nicht), neue werden geprüft und zusammen in einer Transaktion
+    geschrieben. Ungültige Änderungen bekommen status "error" und blockieren den Rest nicht.
+      type create_order: data wie ein create-Eintrag von api/orders/bulk/
+      type update_order: data wie ein update-Eintrag
+    """
+    mutations = _read_mutations(request)
+
+    done = {m.key: m.result for m in SyncMutation.objects.filter(key__in=[m["key"] for m in mutations])}
+    pending, seen = [], set(done)
+    for mutation in mutations:
+        if mutation["key"] not in seen:
+            seen.add(mutation["key"])
+            pending.append(mutation)
+
+    def data(kind):
+        return [m.get("data") for m in pending if m.get("type") == kind]
+
+    lookups = OrderLookups(data("create_order"), data("update_order"))
+
+    try:
+        with transaction.atomic():
+            results = {}
+            for mutation in pending:
+                errors = []
+                where = {"key": mutation["key"]}
+                if mutation.get("type") == "create_order":
+                    plan = _check_create(mutation.get("data"), lookups, errors, where)
+                    result = {"status": "ok", "order": _apply_create(*plan)} if plan else None
+                elif mutation.get("type") == "update_order":
+                    plan = _check_update(mutation.get("data"), lookups, errors, where)
+                    applied = _apply_update(*plan) if plan else None
+                    if applied:
+                        order_id, gone = applied
+                        result = {"status": "ok", "order": order_id, "deleted": gone}
+                    else:
+                        if plan:
+                            errors.append({**where, "error": "Bestellung nicht mehr vorhanden"})
+                        result = None
+                else:
+                    errors.append({**where, "error": "Unbekannter type"})
+                    result = None
+                results[mutation["key"]] = result or {
+                    "status": "error", "errors": [error["error"] for error in errors],
+                }
+
+            SyncMutation.objects.bulk_create([
+                SyncMutation(key=m["key"], user=request.user, kind=str(m.get("type"))[:20], result=results[m["key"]])
+                for m in pending
+            ])
+    except DatabaseError:
+        # z.B. derselbe Stapel parallel von einem zweiten Tab: nichts geschrieben, Client sendet erneut
+        raise ApiError("Speichern fehlgeschlagen, nichts geändert", status=409)
+
+    SyncMutation.objects.filter(created_at__lt=timezone.now() - timedelta(days=SYNC_KEEP_DAYS)).delete()
+
+    return JsonResponse({"results": [
+        {"key": m["key"], **(results.get(m["key"]) or {**done[m["key"]], "duplicate": True})}
+        for m in mutations
+    ]})
+
+
+@api_view("POST")
+def products_bulk(request):
+    """
+    Produkte anlegen/ändern, alles oder nichts:
+      create: [{"name": "Steak", "unit": "kg", "sell_price": "29,90", "buy_price": "21"}]
+      update: [{"id": 3, "sell_price": "31,50", "active": false}]
+    Preise mit den gleichen Regeln wie im Produktformular.
+    """
+    create, update = _read_bulk(request)
+    existing = Product.objects.in_bulk(_ids(update, "id"))
+
+    errors, to_create, to_update = [], [], []
+
+    def apply(product, entry, where):
+        if "name" in entry:
+            product.name = str(entry["name"] or "").strip()
+            if not product.name:
+                errors.append({**where, "error": "Name fehlt"})
+        if "unit" in entry:
+            product.unit = str(entry["unit"] or "").strip() or "kg"
+        for name in ("sell_price", "buy_price"):
+            if name in entry:
+                price = _quantity(entry[name])
+                if price is None or price < 0:
+                    errors.append({**where, "error": f"Ungültiger Preis {name}"})
+                setattr(product, name, price)
+        if "pack_size" in entry:
+            # leer/0 heißt kein Gebinde
+            pack_size = _quantity(entry["pack_size"])
+            product.pack_size = pack_size if pack_size and pack_size > 0 else None
+        if "active" in entry:
+            product.active = _parse_bool(entry["active"])
+            if product.active is None:
+                errors.append({**where, "error": "active muss true/false sein"})
+
+    for index, entry in enumerate(create):
+        where = {"create": index}
+        if not isinstance(entry, dict):
+            errors.append({**where, "error": "Objekt erwartet"})
+            continue
+        missing = [name for name in ("name", "sell_price", "buy_price") if name not in entry]
+        if missing:
+            errors.append({**where, "error": f"Fehlt: {', '.join(missing)}"})
+            continue
+        product = Product(unit="kg", active=True)
+        apply(product, entry, where)
+        to_create.append(product)
+
+    for index, entry in enumerate(update):
+        where = {"update": index}
+        product = existing.get(_parse_id(entry.get("id"))) if isinstance(entry, dict) else None
+        if product is None:
+            errors.append({**where, "error": "Unbekanntes Produkt"})
+            continue
+        apply(product, entry, where)
+        to_update.append(product)
+
+    if errors:
+        raise ApiError("Nichts gespeichert, Eingaben prüfen", errors=errors)
+
+    with transaction.atomic():
+        # save() statt bulk: Suche, Versionen und gecachte Karten hängen an den Signalen
+        for product in to_create + to_update:
+            product.save()
+
+    return JsonResponse(
+        {"created": [p.id for p in to_create], "updated": [p.id for p in to_update]},
+        status=201 if to_create else 200,
+    )
@@ -0,0 +1,130 @@
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from . import analytics, search, signals
+from .models import Customer, Order, OrderItem, Product, Round, RoundProductTotal, RoundSummary
+from .routers import ARCHIVE_DB
+from .summary import rebuild_round_summary, touch_orders
+
+
+def configured():
+    return ARCHIVE_DB in connections.settings
+
+
+def available():
+    """Archiv-DB eingerichtet und migriert (legt keine leere Datei an)."""
+    if not configured():
+        return False
+    connection = connections[ARCHIVE_DB]
+    if not connection.is_in_memory_db() and not Path(connection.settings_dict["NAME"]).exists():
+        return False
+    return "core_round" in connection.introspection.table_names()
+
+
+def prepare():
+    call_command("migrate", database=ARCHIVE_DB, verbosity=0)
+
+
+def get_round(round_id):
+    """Runde aus der Haupt-DB, sonst aus dem Archiv (nur lesen)."""
+    rnd = Round.objects.filter(pk=round_id).first()
+    if rnd is None and available():
+        rnd = Round.objects.using(ARCHIVE_DB).filter(pk=round_id).first()
+    return rnd
+
+
+def is_archived(rnd):
+    return rnd._state.db == ARCHIVE_DB
+
+
+def closed_rounds(before):
+    """Inaktive Runden vor dem Stichtag, in denen alles bezahlt und abgeholt ist."""
+    return (
+        Round.objects
+        .filter(is_active=False, date__lt=before)
+        .filter(summary__paid_count=F("summary__order_count"), summary__picked_count=F("summary__order_count"))
+        .order_by("date", "id")
+    )
+
+
+def _fields(model):
+    return [f.attname for f in model._meta.concrete_fields if not f.primary_key]
+
+
+def _copy_master_data(model, objs, target, overwrite):
+    """Kunden/Produkte, auf die die Runde zeigt, im Ziel anlegen (gleiche IDs)."""
+    existing = set(model.objects.using(target).filter(pk__in=[o.pk for o in objs]).values_list("pk", flat=True))
+    created = [o for o in objs if o.pk not in existing]
+    model.objects.using(target).bulk_create(created)
+    if overwrite:
+        model.objects.using(target).bulk_update([o for o in objs if o.pk in existing], _fields(model))
+    return created
+
+
+def _copy_round(round_id, source, target):
+    """
+    Kopiert eine Runde mit Bestellungen, Positionen und Summen von source nach target,
+    IDs bleiben gleich (Links auf runde/<id>/ funktionieren weiter). Bulk-Inserts,
+    also ohne Signale. Eine evtl. vorhandene halbe Kopie im Ziel wird ersetzt.
+    """
+    rnd = Round.objects.using(source).get(pk=round_id)
+    orders = list(Order.objects.using(source).filter(round_id=round_id))
+    items = list(OrderItem.objects.using(source).filter(order__round_id=round_id))
+    summaries = list(RoundSummary.objects.using(source).filter(round_id=round_id))
+    totals = list(RoundProductTotal.objects.using(source).filter(round_id=round_id))
+
+    customers = list(Customer.objects.using(source).filter(pk__in={o.customer_id for o in orders}))
+    products = list(Product.objects.using(source).filter(
+        pk__in={i.product_id for i in items} | {t.product_id for t in totals}
+    ))
+
+    with transaction.atomic(using=target):
+        # Im Archiv immer der aktuelle Stand der Stammdaten, in der Haupt-DB
+        # nur fehlende ergänzen (dort kann sich seitdem etwas geändert haben)
+        overwrite = target == ARCHIVE_DB
+        new_customers = _copy_master_data(Customer, customers, target, overwrite)
+        new_products = _copy_master_data(Product, products, target, overwrite)
+
+        Round.objects.using(target).filter(pk=round_id).delete()
+        for model, objs in [(Round, [rnd]), (Order, orders), (OrderItem, items),
+                            (RoundSummary, summaries), (RoundProductTotal, totals)]:
+            model.objects.using(target).bulk_create(objs)
+
+    return orders, new_customers, new_products
+
+
+def archive_round(round_id):
+    rnd = Round.objects.get(pk=round_id)
+    if rnd.is_active:
+        raise ValueError("Die aktive Runde kann nicht archiviert werden.")
+    # Auswertung bleibt in der Haupt-DB, vorher auf den letzten Stand bringen
+    summary = RoundSummary.objects.filter(round_id=round_id).first()
+    if summary is None or summary.facts_version != summary.data_version:
+        analytics.refresh_round(round_id, summary.data_version if summary else None)
+
+    orders, _, _ = _copy_round(round_id, DEFAULT_DB_ALIAS, ARCHIVE_DB)
+    # erst löschen, wenn die Kopie im Archiv committet ist
+    with transaction.atomic(), signals.keep_history(round_id):
+        Round.objects.filter(pk=round_id).delete()
+    return len(orders)
+
+
+def restore_round(round_id):
+    orders, customers, products = _copy_round(round_id, ARCHIVE_DB, DEFAULT_DB_ALIAS)
+
+    # Bulk-Inserts haben Suche, Summen und Versionen nicht gepflegt
+    for customer in customers:
+        search.index_customer(customer)
+    for product in products:
+        search.index_product(product)
+    for order in Order.objects.filter(round_id=round_id).exclude(comment="").select_related("customer"):
+        search.index_order(order)
+    rebuild_round_summary(round_id)
+    touch_orders(round_id=round_id)
+
+    with transaction.atomic(using=ARCHIVE_DB):
+        Round.objects.using(ARCHIVE_DB).filter(pk=round_id).delete()
+    return len(orders)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+
+# Broadcaster im Prozess (ohne externen Broker): pro Runde die Queues der
+# verbundenen Dashboards. Schreibende Requests laufen in Worker-Threads,
+# daher wird über call_soon_threadsafe in den Event-Loop des Clients zugestellt.
+# Reicht nur für einen ASGI-Prozess – bei mehreren Workern sieht jeder nur seine Clients.
+
+QUEUE_SIZE = 200
+
+_lock = threading.Lock()
+_listeners = defaultdict(set)  # round_id -> {(loop, queue)}
+
+
+def subscribe(round_id):
+    """Aus dem Event-Loop des SSE-Views aufrufen."""
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    with _lock:
+        _listeners[round_id].add((asyncio.get_running_loop(), queue))
+    return queue
+
+
+def unsubscribe(round_id, queue):
+    with _lock:
+        listeners = _listeners.get(round_id)
+        if listeners is None:
+            return
+        listeners -= {entry for entry in listeners if entry[1] is queue}
+        if not listeners:
+            del _listeners[round_id]
+
+
+def drain(queue):
+    messages = []
+    while True:
+        try:
+            messages.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return messages
+
+
+def _put(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Client kommt nicht hinterher -> Rückstand verwerfen, einmal komplett neu laden
+        drain(queue)
+        queue.put_nowait(("reload", None))
+
+
+def publish(round_id, kind, order_id=None):
+    with _lock:
+        listeners = list(_listeners.get(round_id, ()))
+    for loop, queue in listeners:
+        try:
+            loop.call_soon_threadsafe(_put, queue, (kind, order_id))
+        except RuntimeError:
+            pass  # Loop schon beendet, Client ist weg
+
+
+def _publish_on_commit(round_id, kind, order_id=None):
+    # ohne Zuhörer in diesem Prozess gar nichts vormerken
+    if round_id is None or round_id not in _listeners:
+        return
+    transaction.on_commit(lambda: publish(round_id, kind, order_id))
+
+
+def order_changed(round_id, order_id):
+    _publish_on_commit(round_id, "order", order_id)
+
+
+def order_removed(round_id, order_id):
+    _publish_on_commit(round_id, "removed", order_id)
+
+
+def round_reload(round_id):
+    """Viele Bestellungen auf einmal geändert (z.B. Alle bezahlt)."""
+    _publish_on_commit(round_id, "reload")
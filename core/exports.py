@@ -0,0 +1,43 @@
+import csv
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-Datei für csv.writer: gibt die Zeile zurück statt sie zu puffern."""
+
+    def write(self, value):
+        return value
+
+
+def fmt(value):
+    # Excel (deutsch) erwartet Komma als Dezimaltrenner
+    if isinstance(value, (Decimal, float)):
+        return f"{value:.2f}".replace(".", ",")
+    if isinstance(value, bool):
+        return "ja" if value else "nein"
+    if value is None:
+        return ""
+    return value
+
+
+def csv_response(filename, header, rows):
+    """
+    Streamt eine CSV-Datei Zeile für Zeile (Semikolon, UTF-8 mit BOM),
+    der Speicherbedarf hängt nicht von der Anzahl Zeilen ab.
+    """
+    writer = csv.writer(Echo(), delimiter=";")
+
+    def stream():
+        yield "\ufeff"  # BOM, damit Excel UTF-8 erkennt
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([fmt(value) for value in row])
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import ForecastLine, SalesFact
+from .summary import touch_rounds
+
+
+# so viele zurückliegende Runden (mit Bestellungen) fließen ein
+WINDOW = 8
+# Gewicht jeder älteren Runde beim Wiederkauf, die jüngste zählt 1
+DECAY = 0.75
+
+CENT = Decimal("0.01")
+
+
+def _history(rnd):
+    """
+    Runden vor rnd (älteste zuerst) und ihre Fakten je Produkt × Kunde, nur aktive
+    Produkte und Kunden. Liest die vorsummierte SalesFact-Tabelle, nicht alle Positionen.
+    """
+    rounds = list(
+        SalesFact.objects
+        .filter(round_date__lte=rnd.date)
+        .exclude(round_id=rnd.pk)
+        .values_list("round_id", "round_date")
+        .distinct()
+        .order_by("-round_date", "-round_id")[:WINDOW]
+    )
+    index = {round_id: i for i, (round_id, _) in enumerate(reversed(rounds))}
+    facts = (
+        SalesFact.objects
+        .filter(round_id__in=index, product__active=True, customer__active=True)
+        .values_list("round_id", "product_id", "customer_id", "quantity")
+    )
+    return len(index), [(index[round_id], product_id, customer_id, float(qty))
+                        for round_id, product_id, customer_id, qty in facts]
+
+
+def _slope(series):
+    """Steigung der Ausgleichsgeraden (Menge je Runde)."""
+    n = len(series)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(series) / n
+    var = sum((x - mean_x) ** 2 for x in range(n))
+    return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(series)) / var
+
+
+def compute(rnd):
+    """
+    Prognose je Produkt aus den letzten WINDOW Runden:
+    - average: gleitender Mittelwert der Rundenmenge
+    - trend: Steigung der Ausgleichsgeraden über diese Runden
+    - buyers: Summe der Wiederkaufwahrscheinlichkeiten der Kunden (jüngere Runden zählen mehr)
+    - quantity: je Kunde Wahrscheinlichkeit × übliche Menge, plus eine Runde Trend
+    """
+    n, facts = _history(rnd)
+    if not n:
+        return []
+
+    weights = [DECAY ** (n - 1 - i) for i in range(n)]
+    total_weight = sum(weights)
+
+    series = defaultdict(lambda: [0.0] * n)
+    bought = defaultdict(list)  # (Produkt, Kunde) -> [(Runde, Menge)]
+    for i, product_id, customer_id, qty in facts:
+        series[product_id][i] += qty
+        bought[product_id, customer_id].append((i, qty))
+
+    expected = defaultdict(float)
+    buyers = defaultdict(float)
+    for (product_id, _), rows in bought.items():
+        chance = sum(weights[i] for i, _ in rows) / total_weight
+        usual = sum(qty for _, qty in rows) / len(rows)
+        expected[product_id] += chance * usual
+        buyers[product_id] += chance
+
+    def dec(value):
+        return Decimal(str(value)).quantize(CENT)
+
+    lines = []
+    for product_id, values in series.items():
+        trend = _slope(values)
+        lines.append({
+            "product_id": product_id,
+            "quantity": dec(max(0.0, expected[product_id] + trend)),
+            "average": dec(sum(values) / n),
+            "trend": dec(trend),
+            "buyers": dec(buyers[product_id]),
+        })
+    return lines
+
+
+def build_forecast(rnd):
+    """
+    Berechnet die Prognose einer Runde und speichert sie (ersetzt eine vorhandene).
+    Nimmt die Fakten, wie sie sind – aufgefrischt werden sie per Cron bzw. Knopf.
+    """
+    lines = [ForecastLine(round=rnd, **values) for values in compute(rnd)]
+    with transaction.atomic():
+        ForecastLine.objects.filter(round=rnd).delete()
+        ForecastLine.objects.bulk_create(lines)
+        # gecachte Einkaufsliste im Dashboard neu rendern
+        touch_rounds(round_id=rnd.pk)
+    return len(lines)
+
+
+def with_forecast(rnd, items):
+    """
+    Einkaufslisten-Zeilen (round_product_totals) um die Prognose ergänzen; Produkte,
+    die erwartet, aber noch nicht bestellt sind, kommen mit Menge 0 dazu.
+    """
+    lines = {
+        line.product_id: line
+        for line in ForecastLine.objects.using(rnd._state.db).filter(round=rnd).select_related("product")
+    }
+    rows = []
+    for item in items:
+        line = lines.pop(item["product_id"], None)
+        rows.append({**item, "forecast": line.quantity if line else None})
+    for line in lines.values():
+        if line.quantity > 0:
+            rows.append({
+                "product_id": line.product_id,
+                "product__name": line.product.name,
+                "product__unit": line.product.unit,
+                "total_qty": Decimal("0"),
+                "forecast": line.quantity,
+            })
+    rows.sort(key=lambda row: row["product__name"])
+    return rows
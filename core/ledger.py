@@ -0,0 +1,163 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Customer, LedgerEntry, Order, OrderItem
+from .summary import LINE_REVENUE
+
+
+STEP = Decimal("0.0001")  # Genauigkeit wie die Rundensumme
+
+Kind = LedgerEntry.Kind
+
+
+def _amount(value):
+    return Decimal(str(value or 0)).quantize(STEP)
+
+
+def post(entries):
+    """
+    Buchungen schreiben und die Salden der Kunden per F() nachziehen – in der
+    Transaktion des Aufrufers, also zusammen mit der Änderung an der Bestellung.
+    """
+    entries = [entry for entry in entries if entry.amount]
+    if not entries:
+        return []
+    per_customer = defaultdict(Decimal)
+    for entry in entries:
+        per_customer[entry.customer_id] += entry.amount
+    with transaction.atomic(savepoint=False):
+        LedgerEntry.objects.bulk_create(entries)
+        for customer_id, delta in per_customer.items():
+            if delta:
+                Customer.objects.filter(pk=customer_id).update(balance=F("balance") + delta)
+    return entries
+
+
+def charge_orders(changes, note=""):
+    """
+    Belastungen für geänderte Bestellungen buchen.
+    changes: Iterable aus (customer_id, order_id, Betrag) – Deltas, auch negativ.
+    Auch bei bezahlten Bestellungen bleibt die Ausbuchung unangetastet (die entsteht
+    nur beim Markieren als bezahlt): ein Mehrbetrag ist offen, ein Minderbetrag wird
+    gutgeschrieben – genau wie beim Löschen (cancel_orders).
+    """
+    per_order = defaultdict(Decimal)
+    for customer_id, order_id, amount in changes:
+        per_order[customer_id, order_id] += _amount(amount)
+    return post(
+        LedgerEntry(customer_id=customer_id, order_id=order_id, kind=Kind.CHARGE, amount=amount, note=note)
+        for (customer_id, order_id), amount in per_order.items()
+    )
+
+
+def book_orders(orders):
+    """Bestellungen, die ohne Buchung angelegt wurden (Bulk-Import, seed_data): ein gruppierter Query."""
+    rows = (
+        OrderItem.objects
+        .filter(order__in=orders)
+        .values("order_id", "order__customer_id")
+        .annotate(total=Sum(LINE_REVENUE))
+        .order_by()
+    )
+    entries = charge_orders((row["order__customer_id"], row["order_id"], row["total"]) for row in rows)
+    # schon als bezahlt angelegt -> wie beim Markieren ausbuchen
+    return entries + settle_orders(Order.objects.filter(pk__in=[order.pk for order in orders], paid=True))
+
+
+def _per_order(orders, **filters):
+    return (
+        LedgerEntry.objects
+        .filter(order_id__in=orders.values("pk"), **filters)
+        .values("order_id", "customer_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+
+def settle_orders(orders):
+    """Bestellungen wurden bezahlt: den offenen Rest jeder Bestellung ausbuchen (Überzahlung bleibt Guthaben)."""
+    return post(
+        LedgerEntry(customer_id=row["customer_id"], order_id=row["order_id"], kind=Kind.SETTLED, amount=-row["total"])
+        for row in _per_order(orders).filter(total__gt=0)
+    )
+
+
+def reopen_orders(orders):
+    """Bezahlt zurückgenommen: nur die Ausbuchungen stornieren, Teilzahlungen bleiben."""
+    return post(
+        LedgerEntry(customer_id=row["customer_id"], order_id=row["order_id"], kind=Kind.SETTLED, amount=-row["total"])
+        for row in _per_order(orders, kind=Kind.SETTLED)
+    )
+
+
+def cancel_orders(orders, note="Bestellung gelöscht"):
+    """
+    Bestellungen werden gelöscht: ihre Belastungen stornieren. Was schon gezahlt
+    wurde, bleibt als Guthaben des Kunden stehen.
+    """
+    return post(
+        LedgerEntry(
+            customer_id=row["customer_id"], order_id=row["order_id"], kind=Kind.CHARGE, amount=-row["total"], note=note
+        )
+        for row in _per_order(orders, kind=Kind.CHARGE)
+    )
+
+
+@transaction.atomic
+def move_order(order_id, old_customer_id, new_customer_id):
+    """Bestellung hat den Kunden gewechselt: ihre Buchungen samt Saldo mitnehmen."""
+    entries = LedgerEntry.objects.filter(order_id=order_id, customer_id=old_customer_id)
+    total = _amount(entries.aggregate(total=Sum("amount"))["total"])
+    entries.update(customer_id=new_customer_id)
+    if total:
+        Customer.objects.filter(pk=old_customer_id).update(balance=F("balance") - total)
+        Customer.objects.filter(pk=new_customer_id).update(balance=F("balance") + total)
+
+
+def record_payment(customer, amount, order=None, note=""):
+    """Zahlung (auch Teilzahlung) eines Kunden, wahlweise auf eine Bestellung."""
+    return post([LedgerEntry(
+        customer_id=customer.pk,
+        order_id=order.pk if order else None,
+        kind=Kind.PAYMENT,
+        amount=-_amount(amount),
+        note=note,
+    )])
+
+
+def open_amount(order):
+    return _amount(LedgerEntry.objects.filter(order_id=order.pk).aggregate(total=Sum("amount"))["total"])
+
+
+def open_orders(customer):
+    """Bestellungen des Kunden mit offenem Betrag (ein gruppierter Query über dessen Buchungen)."""
+    rows = (
+        LedgerEntry.objects
+        .filter(customer=customer, order_id__isnull=False)
+        .values("order_id")
+        .annotate(open=Sum("amount"))
+        .exclude(open=0)
+        .order_by("order_id")
+    )
+    open_amounts = {row["order_id"]: row["open"] for row in rows}
+    orders = Order.objects.filter(pk__in=open_amounts).select_related("round").order_by("round__date", "id")
+    return [(order, open_amounts[order.pk]) for order in orders]
+
+
+@transaction.atomic
+def rebuild_balances():
+    """Salden aus den Buchungen neu berechnen (Reparatur, manage.py rebuild_balances)."""
+    totals = dict(
+        LedgerEntry.objects.values("customer_id").annotate(total=Sum("amount")).order_by().values_list("customer_id", "total")
+    )
+    Customer.objects.exclude(pk__in=totals).exclude(balance=0).update(balance=0)
+    changed = 0
+    for customer_id, balance in Customer.objects.filter(pk__in=totals).values_list("pk", "balance"):
+        total = _amount(totals[customer_id])
+        if balance != total:
+            Customer.objects.filter(pk=customer_id).update(balance=total)
+            changed += 1
+    return changed
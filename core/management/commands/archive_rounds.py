@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Verschiebt abgeschlossene Runden (inaktiv, alles bezahlt und abgeholt) vor einem "
+        "Stichtag samt Bestellungen in die Archiv-Datenbank."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Stichtag JJJJ-MM-TT (Standard: heute minus --days)")
+        parser.add_argument("--days", type=int, default=90, help="Runden älter als so viele Tage")
+        parser.add_argument("--dry-run", action="store_true", help="Nur anzeigen, nichts verschieben")
+
+    def handle(self, *args, **options):
+        if not archive.configured():
+            raise CommandError("Keine Archiv-Datenbank in DATABASES konfiguriert.")
+
+        if options["before"]:
+            before = parse_date(options["before"])
+            if before is None:
+                raise CommandError("--before erwartet ein Datum JJJJ-MM-TT.")
+        else:
+            before = timezone.localdate() - timedelta(days=options["days"])
+
+        rounds = list(archive.closed_rounds(before).values_list("id", "date"))
+        if options["dry_run"]:
+            for round_id, date in rounds:
+                self.stdout.write(f"  Runde {round_id} ({date})")
+            self.stdout.write(f"{len(rounds)} Runde(n) vor {before} würden archiviert.")
+            return
+
+        archive.prepare()
+        orders = 0
+        for round_id, date in rounds:
+            count = archive.archive_round(round_id)
+            orders += count
+            self.stdout.write(f"  Runde {round_id} ({date}): {count} Bestellungen")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(rounds)} Runde(n) mit {orders} Bestellungen vor {before} archiviert."
+        ))
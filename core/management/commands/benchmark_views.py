@@ -0,0 +1,227 @@
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from core.models import Customer, Order, Product, Round, RoundSummary
+
+
+URLCONFS = [settings.ROOT_URLCONF, "core.urls"]
+
+# Basisgröße einer Stufe, wird mit --scales multipliziert
+BASE = {"customers": 100, "products": 20, "rounds": 4, "orders_per_round": 40, "items_per_order": 4}
+
+# Gemessen wird nur lesend per GET. Routen, die Daten ändern (oder per GET nur
+# weiterleiten), würden die Daten zwischen den Wiederholungen verändern und
+# landen mit Grund in der Ausgabe statt in der Baseline.
+SKIP = {
+    "analytics_refresh": "nur POST, baut die Auswertung neu",
+    "api_orders_bulk": "nur POST, schreibt Bestellungen",
+    "api_products_bulk": "nur POST, schreibt Produkte",
+    "api_sync": "nur POST, schreibt Bestellungen",
+    "mark_paid": "nur POST, ändert den Bezahlstatus",
+    "mark_picked": "nur POST, ändert den Abholstatus",
+    "order_delete": "GET leitet nur weiter, POST löscht",
+    "order_status": "nur POST, ändert den Status",
+    "price_list_create": "GET leitet nur weiter, POST legt eine Preisliste an",
+    "round_mark_all_paid": "GET leitet nur weiter, POST ändert den Bezahlstatus",
+    "round_mark_all_picked": "GET leitet nur weiter, POST ändert den Abholstatus",
+    "round_restore": "GET leitet nur weiter, POST holt die Runde aus dem Archiv",
+    "round_status": "nur POST, ändert den Status",
+    "set_active_round": "ändert die aktive Runde",
+}
+
+# Zusätzliche URL-Parameter und Query-Strings je Route, eine Messung pro Eintrag:
+# (Name in der Baseline, kwargs, GET-Parameter). Fehlt eine Route, gilt (Name, {}, {}).
+REQUESTS = {
+    "api_list": [
+        (f"api_list[{resource}]", {"resource": resource}, {})
+        for resource in ("rounds", "orders", "items", "customers", "products")
+    ],
+    "customer_autocomplete": [("customer_autocomplete", {}, {"q": "a"})],
+    "search": [("search", {}, {"q": "a"})],
+}
+
+
+def iter_patterns(patterns):
+    for entry in patterns:
+        if isinstance(entry, URLResolver):
+            if entry.app_name == "admin":
+                continue
+            yield from iter_patterns(entry.url_patterns)
+        elif isinstance(entry, URLPattern) and entry.name:
+            yield entry
+
+
+def routes():
+    """Alle benannten Routen aus meatmanager.urls und core.urls, jede nur einmal."""
+    seen = {}
+    for urlconf in URLCONFS:
+        for pattern in iter_patterns(get_resolver(urlconf).url_patterns):
+            seen.setdefault(pattern.name, (urlconf, pattern))
+    return sorted(seen.items())
+
+
+@contextmanager
+def isolated_databases():
+    """Eigene Testdatenbanken für alle Aliase, auch fürs Archiv – echte Daten bleiben unberührt."""
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections))
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst alle Routen über den Test-Client (Zeit + Anzahl Queries) auf einer "
+        "Testdatenbank bei mehreren Datenmengen und vergleicht mit einer Baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="1,4", help="Multiplikatoren der Datenmenge, z.B. 1,4,16")
+        parser.add_argument("--repeat", type=int, default=5, help="Messungen pro Route (Median zählt)")
+        parser.add_argument("--baseline", default=str(settings.BASE_DIR / "benchmarks" / "baseline.json"))
+        parser.add_argument("--save-baseline", action="store_true", help="Ergebnis als neue Baseline speichern")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Erlaubte Verschlechterung der Zeit (0.25 = 25 %%)")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        scales = [int(s) for s in options["scales"].split(",") if s.strip()]
+
+        with isolated_databases():
+            results = {str(scale): self.run_scale(scale, options["repeat"]) for scale in scales}
+
+        baseline_path = Path(options["baseline"])
+        regressions = []
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+            regressions = self.compare(baseline.get("results", {}), results, options["tolerance"])
+        else:
+            self.stdout.write(f"Keine Baseline unter {baseline_path}.")
+
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(
+                json.dumps({"base": BASE, "results": results}, indent=2, sort_keys=True),
+                encoding="utf-8",
+            )
+            self.stdout.write(self.style.SUCCESS(f"Baseline gespeichert: {baseline_path}"))
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} Verschlechterung(en) gegenüber der Baseline.")
+
+    def seed(self, scale):
+        Round.objects.all().delete()
+        Customer.objects.all().delete()
+        Product.objects.all().delete()
+        call_command(
+            "seed_data",
+            customers=BASE["customers"] * scale,
+            products=BASE["products"],
+            rounds=BASE["rounds"] * scale,
+            orders_per_round=BASE["orders_per_round"] * scale,
+            items_per_order=BASE["items_per_order"],
+            stdout=self.stdout,
+        )
+
+    def url_kwargs(self):
+        busiest = RoundSummary.objects.order_by("-order_count").values_list("round_id", flat=True).first()
+        order = Order.objects.filter(round_id=busiest).order_by("id").first()
+        return {
+            "round_id": busiest,
+            "order_id": order.id if order else None,
+            "customer_id": Customer.objects.values_list("id", flat=True).first(),
+            "product_id": Product.objects.values_list("id", flat=True).first(),
+        }
+
+    def run_scale(self, scale, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Stufe x{scale}"))
+        self.seed(scale)
+
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"is_staff": True, "is_superuser": True}
+        )
+        client = Client()
+        client.force_login(user)
+        kwargs = self.url_kwargs()
+
+        results = {}
+        skipped = dict(SKIP)
+        for name, (urlconf, pattern) in routes():
+            if name in SKIP:
+                continue
+            for label, extra, params in REQUESTS.get(name, [(name, {}, {})]):
+                needed = {key: extra.get(key, kwargs.get(key)) for key in pattern.pattern.converters}
+                missing = [key for key, value in needed.items() if value is None]
+                if missing:
+                    skipped[label] = f"keine Werte für {', '.join(missing)}"
+                    continue
+                url = reverse(name, kwargs=needed, urlconf=urlconf)
+                result = self.measure(client, url, params, repeat)
+                if result["status"] == 405:
+                    skipped[label] = "GET nicht erlaubt, fehlt in SKIP oder REQUESTS"
+                    continue
+                results[label] = result
+                self.stdout.write(
+                    f"  {label:32} {result['status']}  {result['ms']:8.2f} ms  {result['queries']:4} Queries"
+                )
+
+        for label, reason in sorted(skipped.items()):
+            self.stdout.write(f"  {label:32} übersprungen: {reason}")
+        return results
+
+    def measure(self, client, url, params, repeat):
+        timings = []
+        queries = 0
+        status = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(url, params)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(captured.captured_queries)
+            status = response.status_code
+        return {
+            "url": url,
+            "status": status,
+            "ms": round(statistics.median(timings), 2),
+            "queries": queries,
+        }
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for scale, routes_now in results.items():
+            routes_then = baseline.get(scale, {})
+            for name, now in routes_now.items():
+                then = routes_then.get(name)
+                if not then:
+                    continue
+                slower = now["ms"] > then["ms"] * (1 + tolerance)
+                more_queries = now["queries"] > then["queries"]
+                if slower or more_queries:
+                    regressions.append((scale, name))
+                    self.stdout.write(self.style.WARNING(
+                        f"x{scale} {name}: {then['ms']} -> {now['ms']} ms, "
+                        f"{then['queries']} -> {now['queries']} Queries"
+                    ))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("Keine Verschlechterung gegenüber der Baseline."))
+        return regressions
@@ -0,0 +1,187 @@
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.models import Customer, Order, Product, Round
+from core.orders import create_order, update_order
+from core.summary import get_round_summary
+
+
+PROFILES = {
+    # Django-Standard: Rollback-Journal, DEFERRED, neue Verbindung pro Request
+    "default": {"OPTIONS": {}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "production": settings.SQLITE_PRODUCTION,
+}
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.locked = 0
+        self.errors = 0
+        self.reads = 0
+
+    def add(self, ms=None, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies.append(ms)
+            elif "locked" in str(error):
+                self.locked += 1
+            else:
+                self.errors += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Misst Schreibdurchsatz und 'database is locked'-Fehler mit mehreren gleichzeitigen "
+        "Schreibern (und Lesern) je SQLite-Profil, jeweils auf einer frischen Datenbankdatei."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="default,production", help=f"Auswahl aus {', '.join(PROFILES)}")
+        parser.add_argument("--writers", type=int, default=8, help="gleichzeitige Schreib-Threads")
+        parser.add_argument("--readers", type=int, default=2, help="gleichzeitige Lese-Threads (Dashboard)")
+        parser.add_argument("--requests", type=int, default=50, help="Schreib-Requests pro Schreiber")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Nur für SQLite.")
+        names = [name.strip() for name in options["profiles"].split(",") if name.strip()]
+        unknown = set(names) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unbekanntes Profil: {', '.join(sorted(unknown))}")
+
+        saved = {key: connection.settings_dict.get(key) for key in ("OPTIONS", "CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        saved_test_name = connection.settings_dict["TEST"].get("NAME")
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                results = [(name, self.run_profile(name, Path(tmp), options)) for name in names]
+        finally:
+            connection.settings_dict.update(saved)
+            connection.settings_dict["TEST"]["NAME"] = saved_test_name
+            teardown_test_environment()
+
+        self.stdout.write("")
+        self.stdout.write(f"{'Profil':12} {'ok':>6} {'locked':>7} {'Fehler':>7} {'Req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'Reads':>7}")
+        for name, (stats, seconds) in results:
+            ok = len(stats.latencies)
+            p50 = statistics.median(stats.latencies) if ok else 0
+            p95 = sorted(stats.latencies)[int(ok * 0.95) - 1] if ok else 0
+            self.stdout.write(
+                f"{name:12} {ok:6} {stats.locked:7} {stats.errors:7} {ok / seconds:8.1f} {p50:8.1f} {p95:8.1f} {stats.reads:7}"
+            )
+
+    def run_profile(self, name, tmp, options):
+        # Alle Threads bauen ihre Verbindung aus diesem settings_dict
+        connection.close()
+        connection.settings_dict.update(PROFILES[name])
+        connection.settings_dict["TEST"]["NAME"] = str(tmp / f"writers_{name}.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            rnd, customers, products = self.seed()
+            connection.close()
+            return self.hammer(rnd, customers, products, options)
+        finally:
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self):
+        customers = Customer.objects.bulk_create([Customer(name=f"Kunde {i}") for i in range(50)])
+        products = Product.objects.bulk_create([
+            Product(name=f"Produkt {i}", sell_price=Decimal("12.50"), buy_price=Decimal("9.00"))
+            for i in range(12)
+        ])
+        rnd = Round.objects.create(date="2026-01-01", is_active=True)
+        return rnd, customers, products
+
+    def hammer(self, rnd, customers, products, options):
+        stats = Stats()
+        writers_done = threading.Event()
+        start_gate = threading.Barrier(options["writers"] + options["readers"] + 1)
+
+        def request(work):
+            # wie request_started/request_finished: ohne CONN_MAX_AGE jedes Mal neu verbinden
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                work()
+            except DatabaseError as exc:
+                # "database is locked" oder z.B. Bestellung parallel gelöscht
+                stats.add(error=exc)
+            else:
+                stats.add(ms=(time.perf_counter() - started) * 1000)
+            finally:
+                close_old_connections()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            start_gate.wait()
+            for i in range(options["requests"]):
+                step = i % 4
+                if step in (0, 1):
+                    lines = [(p, Decimal(rng.randint(1, 6))) for p in rng.sample(products, 3)]
+                    request(lambda: create_order(rnd, rng.choice(customers), lines))
+                elif step == 2:
+                    request(lambda: self.edit_order(rnd, products, rng))
+                else:
+                    request(lambda: self.delete_or_pay(rnd, rng))
+            connections.close_all()
+
+        def reader():
+            start_gate.wait()
+            while not writers_done.is_set():
+                try:
+                    close_old_connections()
+                    get_round_summary(rnd)
+                    list(Order.objects.filter(round=rnd).select_related("customer").order_by("customer__name")[:25])
+                    with stats.lock:
+                        stats.reads += 1
+                except DatabaseError as exc:
+                    stats.add(error=exc)
+                finally:
+                    close_old_connections()
+            connections.close_all()
+
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(options["writers"])]
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        for thread in writers + readers:
+            thread.start()
+        start_gate.wait()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.join()
+        seconds = time.perf_counter() - started
+        writers_done.set()
+        for thread in readers:
+            thread.join()
+        return stats, seconds
+
+    def edit_order(self, rnd, products, rng):
+        # wie order_edit: Bestellung + Positionen lesen, dann Mengen ändern
+        order = Order.objects.filter(round=rnd).order_by("?").first()
+        if order is None:
+            return
+        existing = {item.product_id: item for item in order.items.all()}
+        wanted = {p.id: (p, Decimal(rng.randint(1, 6))) for p in rng.sample(products, 3)}
+        update_order(order, existing, wanted, comment=f"geändert {rng.randint(1, 99)}")
+
+    def delete_or_pay(self, rnd, rng):
+        order = Order.objects.filter(round=rnd).order_by("?").first()
+        if order is None:
+            return
+        if rng.random() < 0.5:
+            order.delete()
+        else:
+            order.paid = True
+            order.save()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import ledger
+
+
+class Command(BaseCommand):
+    help = "Berechnet die Kundensalden aus den Buchungen im Kundenkonto neu."
+
+    def handle(self, *args, **options):
+        changed = ledger.rebuild_balances()
+        self.stdout.write(self.style.SUCCESS(f"{changed} Saldo/Salden korrigiert."))
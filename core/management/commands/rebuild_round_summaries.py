@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Round
+from core.summary import rebuild_round_summary
+
+
+class Command(BaseCommand):
+    help = "Baut die Rundensummen (Umsatz, Einkauf, Zähler, Mengen je Produkt) neu auf."
+
+    def add_arguments(self, parser):
+        parser.add_argument("round_ids", nargs="*", type=int, help="Nur diese Runden (Standard: alle)")
+
+    def handle(self, *args, **options):
+        rounds = Round.objects.order_by("id")
+        if options["round_ids"]:
+            rounds = rounds.filter(id__in=options["round_ids"])
+
+        count = 0
+        for round_id in rounds.values_list("id", flat=True).iterator():
+            rebuild_round_summary(round_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{count} Runde(n) neu berechnet."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core import analytics, archive
+from core.models import Round, RoundSummary
+from core.routers import ARCHIVE_DB
+
+
+class Command(BaseCommand):
+    help = "Baut die Verkaufsfakten für die Auswertung neu auf (Haupt-DB und Archiv)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale", action="store_true",
+            help="Nur Runden mit geänderten Bestellungen (z.B. nächtlich per Cron).",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            count = analytics.refresh_stale()
+            self.stdout.write(self.style.SUCCESS(f"Verkaufsfakten für {count} Runde(n) aktualisiert."))
+            return
+
+        count = 0
+        versions = dict(RoundSummary.objects.values_list("round_id", "data_version"))
+        for round_id in Round.objects.order_by("id").values_list("id", flat=True).iterator():
+            analytics.refresh_round(round_id, versions.get(round_id))
+            count += 1
+
+        if archive.available():
+            for round_id in Round.objects.using(ARCHIVE_DB).order_by("id").values_list("id", flat=True).iterator():
+                analytics.refresh_round(round_id, using=ARCHIVE_DB)
+                count += 1
+        # auch Kunden, deren Fakten es nicht mehr gibt
+        analytics.update_customer_activity()
+
+        self.stdout.write(self.style.SUCCESS(f"Verkaufsfakten für {count} Runde(n) neu aufgebaut."))
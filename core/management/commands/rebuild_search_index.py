@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Baut den Volltext-Suchindex (Kunden, Produkte, Bestellnotizen) neu auf."
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("Kein FTS5-Suchindex vorhanden (nur mit SQLite + FTS5, migrate ausführen).")
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} Einträge indexiert."))
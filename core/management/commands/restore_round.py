@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+from core.models import Round
+from core.routers import ARCHIVE_DB
+
+
+class Command(BaseCommand):
+    help = "Holt archivierte Runden samt Bestellungen zurück in die Haupt-Datenbank."
+
+    def add_arguments(self, parser):
+        parser.add_argument("round_ids", nargs="+", type=int)
+
+    def handle(self, *args, **options):
+        if not archive.available():
+            raise CommandError("Keine Archiv-Datenbank vorhanden.")
+
+        for round_id in options["round_ids"]:
+            if not Round.objects.using(ARCHIVE_DB).filter(pk=round_id).exists():
+                raise CommandError(f"Runde {round_id} ist nicht im Archiv.")
+            count = archive.restore_round(round_id)
+            self.stdout.write(self.style.SUCCESS(f"Runde {round_id} mit {count} Bestellungen wiederhergestellt."))
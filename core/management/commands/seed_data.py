@@ -0,0 +1,111 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import ledger, search
+from core.models import Customer, Order, OrderItem, Product, Round
+from core.summary import rebuild_round_summary
+
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "Deniz", "Emil", "Fatma", "Georg", "Hanna", "Ilse", "Jonas",
+               "Karin", "Lukas", "Mehmet", "Nina", "Otto", "Paula", "Rüdiger", "Sabine", "Tim", "Ute"]
+LAST_NAMES = ["Müller", "Schmidt", "Yılmaz", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+              "Schulz", "Hoffmann", "Kaya", "Koch", "Richter", "Klein", "Wolf", "Schröder"]
+CUTS = ["Rinderhack", "Rindersteak", "Gulasch", "Suppenfleisch", "Lammkeule", "Lammkotelett",
+        "Hähnchenbrust", "Hähnchenschenkel", "Sucuk", "Kalbsschnitzel", "Rinderbrust", "Leber"]
+UNITS = ["kg", "kg", "kg", "Stück", "Pack"]
+COMMENTS = ["", "", "", "bitte mager", "in Portionen", "extra dünn", "holt Nachbar ab", "ohne Knochen"]
+
+
+class Command(BaseCommand):
+    help = "Erzeugt Testdaten (Kunden, Produkte, Runden, Bestellungen) per Bulk-Insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=200)
+        parser.add_argument("--products", type=int, default=30)
+        parser.add_argument("--rounds", type=int, default=10)
+        parser.add_argument("--orders-per-round", type=int, default=50)
+        parser.add_argument("--items-per-order", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=1, help="Zufalls-Seed für reproduzierbare Daten")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch = options["batch_size"]
+
+        customers = Customer.objects.bulk_create([
+            Customer(
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+                phone=f"0176 {rng.randint(1000000, 9999999)}",
+            )
+            for i in range(options["customers"])
+        ], batch_size=batch)
+
+        products = []
+        for i in range(options["products"]):
+            name = CUTS[i % len(CUTS)]
+            if i >= len(CUTS):
+                name = f"{name} {i // len(CUTS) + 1}"
+            buy = Decimal(rng.randint(400, 2500)) / 100
+            products.append(Product(
+                name=name,
+                unit=rng.choice(UNITS),
+                buy_price=buy,
+                sell_price=(buy * Decimal("1.3")).quantize(Decimal("0.01")),
+            ))
+        products = Product.objects.bulk_create(products, batch_size=batch)
+
+        # Neue Runden sind inaktiv, es darf nur eine aktive geben
+        today = timezone.localdate()
+        rounds = Round.objects.bulk_create([
+            Round(date=today - timedelta(weeks=i), travel_km=Decimal(rng.randint(10, 80)))
+            for i in range(options["rounds"])
+        ], batch_size=batch)
+
+        order_count = item_count = 0
+        items_per_order = min(options["items_per_order"], len(products))
+        for rnd in rounds:
+            if not customers or not products:
+                break
+            buyers = rng.sample(customers, min(options["orders_per_round"], len(customers)))
+            orders = Order.objects.bulk_create([
+                Order(
+                    customer=customer,
+                    round=rnd,
+                    source=rng.choice(Order.Source.values),
+                    comment=rng.choice(COMMENTS),
+                    paid=rng.random() < 0.6,
+                    picked_up=rng.random() < 0.5,
+                )
+                for customer in buyers
+            ], batch_size=batch)
+
+            items = []
+            for order in orders:
+                for product in rng.sample(products, rng.randint(1, items_per_order)):
+                    items.append(OrderItem(
+                        order=order,
+                        product=product,
+                        quantity=Decimal(rng.randint(1, 12)) / 2,
+                        sell_price=product.sell_price,
+                        buy_price=product.buy_price,
+                    ))
+            OrderItem.objects.bulk_create(items, batch_size=batch)
+
+            # bulk_create umgeht die Signale -> Summen und Kundenkonten einmal pro Runde buchen
+            rebuild_round_summary(rnd.id)
+            ledger.book_orders(orders)
+            order_count += len(orders)
+            item_count += len(items)
+
+        search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(customers)} Kunden, {len(products)} Produkte, {len(rounds)} Runden, "
+            f"{order_count} Bestellungen, {item_count} Positionen angelegt."
+        ))
@@ -0,0 +1,42 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import perf
+
+
+class PerfMiddleware:
+    """
+    Misst pro Request Anzahl und Dauer der SQL-Queries, Renderzeit und
+    Antwortgröße und schreibt sie nach PERF_LOG_FILE (JSON-Lines, rotierend).
+    Nur aktiv mit PERF_LOG_ENABLED = True, Auswertung unter /perf/.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_LOG_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        perf.configure_logger()
+
+    def __call__(self, request):
+        record = perf.RequestRecord()
+        token = perf.current_record.set(record)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            perf.current_record.reset(token)
+
+        match = getattr(request, "resolver_match", None)
+        perf.write(record.as_dict(
+            view=match.view_name if match else None,
+            path=request.path,
+            method=request.method,
+            status=response.status_code,
+            bytes=None if response.streaming else len(response.content),
+        ))
+        return response
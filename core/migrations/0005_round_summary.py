@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+
+
+def build_summaries(apps, schema_editor):
+    Round = apps.get_model("core", "Round")
+    Order = apps.get_model("core", "Order")
+    OrderItem = apps.get_model("core", "OrderItem")
+    RoundSummary = apps.get_model("core", "RoundSummary")
+    RoundProductTotal = apps.get_model("core", "RoundProductTotal")
+    db = schema_editor.connection.alias
+
+    for round_id in Round.objects.using(db).values_list("id", flat=True):
+        items = OrderItem.objects.using(db).filter(order__round_id=round_id)
+        totals = items.aggregate(
+            revenue=Sum(ExpressionWrapper(F("sell_price") * F("quantity"), output_field=DecimalField())),
+            cost=Sum(ExpressionWrapper(F("buy_price") * F("quantity"), output_field=DecimalField())),
+        )
+        counts = Order.objects.using(db).filter(round_id=round_id).aggregate(
+            order_count=Count("id"),
+            paid_count=Count("id", filter=Q(paid=True)),
+            picked_count=Count("id", filter=Q(picked_up=True)),
+        )
+        RoundSummary.objects.using(db).create(
+            round_id=round_id,
+            revenue=totals["revenue"] or 0,
+            cost=totals["cost"] or 0,
+            **counts,
+        )
+        RoundProductTotal.objects.using(db).bulk_create([
+            RoundProductTotal(round_id=round_id, product_id=row["product_id"], quantity=row["qty"])
+            for row in items.values("product_id").annotate(qty=Sum("quantity"))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_remove_round_notes_remove_round_travel_cost_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoundSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('picked_count', models.IntegerField(default=0)),
+                ('round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='core.round')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoundProductTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_totals', to='core.round')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('round', 'product'), name='unique_round_product_total')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+import re
+
+from django.db import OperationalError, migrations
+
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_search USING fts5("
+    "kind UNINDEXED, obj_id UNINDEXED, title, body, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+INSERT_SQL = "INSERT INTO core_search (rowid, kind, obj_id, title, body) VALUES (%s, %s, %s, %s, %s)"
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_SQL)
+        except OperationalError:
+            # SQLite ohne FTS5 -> Suche fällt auf icontains zurück
+            return
+
+    Customer = apps.get_model("core", "Customer")
+    Product = apps.get_model("core", "Product")
+    Order = apps.get_model("core", "Order")
+    db = connection.alias
+
+    rows = []
+    for c in Customer.objects.using(db).iterator():
+        body = " ".join([c.phone, re.sub(r"\D", "", c.phone), c.notes])
+        rows.append((c.pk * 4 + 1, "customer", c.pk, c.name, body))
+    for p in Product.objects.using(db).iterator():
+        rows.append((p.pk * 4 + 2, "product", p.pk, p.name, p.unit))
+    for o in Order.objects.using(db).exclude(comment="").select_related("customer").iterator():
+        rows.append((o.pk * 4 + 3, "order", o.pk, o.customer.name, o.comment))
+
+    with connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS core_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_round_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+def keep_latest_active_round(apps, schema_editor):
+    Round = apps.get_model("core", "Round")
+    db = schema_editor.connection.alias
+    latest = Round.objects.using(db).filter(is_active=True).order_by("-date", "-id").first()
+    if latest:
+        Round.objects.using(db).filter(is_active=True).exclude(pk=latest.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['name'], name='customer_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['round', 'customer'], name='order_round_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['round'], name='order_round_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('picked_up', False)), fields=['round'], name='order_round_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('active', True)), fields=['name'], name='product_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['-is_active', '-date'], name='round_active_date_idx'),
+        ),
+        migrations.RunPython(keep_latest_active_round, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='round',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='unique_active_round'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roundsummary',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='roundsummary',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_round_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_order_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roundsummary',
+            name='facts_version',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round_date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('revenue', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+                ('round', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.round')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['round_date'], name='salesfact_date_idx'), models.Index(fields=['product', 'round_date'], name='salesfact_product_date_idx'), models.Index(fields=['customer', 'round_date'], name='salesfact_customer_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('round', 'product', 'customer'), name='unique_sales_fact')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sales_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('average', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('trend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('buyers', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_lines', to='core.round')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('round', 'product'), name='unique_forecast_line')],
+            },
+        ),
+    ]
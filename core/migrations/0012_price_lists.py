@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_forecast_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('valid_from', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-valid_from', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceListEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sell_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('buy_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.pricelist')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('price_list', 'product'), name='unique_price_list_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sync_mutations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='pack_size',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+    ]
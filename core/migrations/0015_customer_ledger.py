@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:28
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def open_ledger(apps, schema_editor):
+    """Vorhandene Bestellungen einbuchen: Belastung je Bestellung, bezahlte gleich ausgebucht."""
+    Customer = apps.get_model("core", "Customer")
+    OrderItem = apps.get_model("core", "OrderItem")
+    LedgerEntry = apps.get_model("core", "LedgerEntry")
+    db = schema_editor.connection.alias
+
+    rows = (
+        OrderItem.objects.using(db)
+        .values("order_id", "order__customer_id", "order__paid")
+        .annotate(total=Sum(ExpressionWrapper(F("sell_price") * F("quantity"), output_field=DecimalField())))
+        .order_by()
+    )
+    entries = []
+    balances = defaultdict(Decimal)
+    for row in rows:
+        amount = Decimal(str(row["total"] or 0)).quantize(Decimal("0.0001"))
+        if not amount:
+            continue
+        customer_id, order_id = row["order__customer_id"], row["order_id"]
+        entries.append(LedgerEntry(customer_id=customer_id, order_id=order_id, kind="charge", amount=amount))
+        if row["order__paid"]:
+            entries.append(LedgerEntry(customer_id=customer_id, order_id=order_id, kind="settled", amount=-amount))
+        else:
+            balances[customer_id] += amount
+    LedgerEntry.objects.using(db).bulk_create(entries, batch_size=1000)
+    for customer_id, balance in balances.items():
+        Customer.objects.using(db).filter(pk=customer_id).update(balance=balance)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_product_pack_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('charge', 'Bestellung'), ('payment', 'Zahlung'), ('settled', 'Als bezahlt markiert')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='balance',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(condition=models.Q(('balance', 0), _negated=True), fields=['-balance', 'name'], name='customer_open_balance_idx'),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='core.customer'),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='order',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.order'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['customer', '-id'], name='ledger_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['order', 'kind'], name='ledger_order_idx'),
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
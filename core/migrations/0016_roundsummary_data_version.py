@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def split_versions(apps, schema_editor):
+    # Fakten, die zur aktuellen Version passen, bleiben gültig; der Rest ist veraltet
+    RoundSummary = apps.get_model("core", "RoundSummary")
+    RoundSummary.objects.filter(facts_version=F("version")).update(facts_version=0)
+    RoundSummary.objects.exclude(facts_version=0).update(facts_version=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_customer_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roundsummary',
+            name='data_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(split_versions, migrations.RunPython.noop),
+    ]
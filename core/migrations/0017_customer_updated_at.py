@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_roundsummary_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['updated_at'], name='customer_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+import datetime
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def fill_activity(apps, schema_editor):
+    """Kennzahlen aus den vorhandenen Verkaufsfakten übernehmen (wie analytics.update_customer_activity)."""
+    Customer = apps.get_model("core", "Customer")
+    SalesFact = apps.get_model("core", "SalesFact")
+    db = schema_editor.connection.alias
+
+    rows = (
+        SalesFact.objects.using(db)
+        .values("customer_id")
+        .annotate(last=Max("round_date"), rounds=Count("round_id", distinct=True), total=Sum("revenue"))
+        .order_by()
+    )
+    customers = []
+    for row in rows:
+        customers.append(Customer(
+            pk=row["customer_id"],
+            last_order=row["last"],
+            round_count=row["rounds"],
+            revenue=Decimal(str(row["total"] or 0)).quantize(Decimal("0.01")),
+        ))
+    Customer.objects.using(db).bulk_update(customers, ["last_order", "round_count", "revenue"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_customer_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_order',
+            field=models.DateField(default=datetime.date(1, 1, 1), editable=False),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='round_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-last_order', 'name'], name='customer_last_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-round_count', 'name'], name='customer_round_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-revenue', 'name'], name='customer_revenue_idx'),
+        ),
+        migrations.RunPython(fill_activity, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,47 @@
-from django.db import models
+from datetime import date
+
+from django.conf import settings
+from django.db import models, router, transaction
+
+# "letzte Bestellung" für Kunden ohne Bestellung, damit die Sortierung keine NULLs hat
+NEVER = date(1, 1, 1)
+
 
 class Customer(models.Model):
     name = models.CharField(max_length=120)
     phone = models.CharField(max_length=40, blank=True)
     active = models.BooleanField(default=True)
     notes = models.TextField(blank=True)
+    # offener Betrag laut Kundenkonto, gepflegt von core/ledger.py (positiv = Kunde schuldet)
+    balance = models.DecimalField(max_digits=14, decimal_places=4, default=0, editable=False)
+    # für den Offline-Abgleich der Kundenliste (api/customers/?changed_since=…); Saldo zählt nicht
+    updated_at = models.DateTimeField(auto_now=True)
+    # Kennzahlen der Kundenliste aus den Verkaufsfakten, Stand der letzten Auswertung
+    # (core/analytics.py) – als Spalten, damit die Liste per Index danach sortiert
+    last_order = models.DateField(default=NEVER, editable=False)
+    round_count = models.PositiveIntegerField(default=0, editable=False)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], name="customer_name_idx"),
+            models.Index(fields=["updated_at"], name="customer_updated_idx"),
+            # Offene Beträge: nur Kunden mit Saldo, größter zuerst
+            models.Index(fields=["-balance", "name"], condition=~models.Q(balance=0), name="customer_open_balance_idx"),
+            # Sortierungen der Kundenliste
+            models.Index(fields=["-last_order", "name"], name="customer_last_order_idx"),
+            models.Index(fields=["-round_count", "name"], name="customer_round_count_idx"),
+            models.Index(fields=["-revenue", "name"], name="customer_revenue_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Saldo (Kundenkonto) und Kennzahlen (Auswertung) nie mit veralteten Werten überschreiben
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ("balance", "last_order", "round_count", "revenue")
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -16,6 +53,14 @@ class Product(models.Model):
     sell_price = models.DecimalField(max_digits=10, decimal_places=2)
     buy_price = models.DecimalField(max_digits=10, decimal_places=2)
     active = models.BooleanField(default=True)
+    # Gebindegröße beim Einkauf (in unit), z.B. 2.5 kg – Einkaufsmengen werden darauf aufgerundet
+    pack_size = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Teilindex: SQLite nutzt "WHERE active" nur so für ORDER BY name
+            models.Index(fields=["name"], condition=models.Q(active=True), name="product_active_name_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -29,6 +74,20 @@ class Round(models.Model):
     # statt travel_cost (Euro) speichern wir jetzt km
     travel_km = models.DecimalField(max_digits=8, decimal_places=2, default=0)
 
+    class Meta:
+        indexes = [
+            # home() und round_list(): aktive Runde zuerst, dann nach Datum
+            models.Index(fields=["-is_active", "-date"], name="round_active_date_idx"),
+        ]
+        constraints = [
+            # höchstens eine aktive Runde
+            models.UniqueConstraint(
+                fields=["is_active"],
+                condition=models.Q(is_active=True),
+                name="unique_active_round",
+            ),
+        ]
+
     def __str__(self):
         return f"Round {self.date}"
 
@@ -46,6 +105,36 @@ class Order(models.Model):
     paid = models.BooleanField(default=False)
     picked_up = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # steigt bei jeder Änderung an Bestellung, Positionen, Kunde oder Produkt (Fragment-Cache)
+    version = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Packliste/Dashboard: Bestellungen einer Runde, gefiltert nach Status
+            models.Index(fields=["round", "customer"], name="order_round_customer_idx"),
+            models.Index(fields=["round"], condition=models.Q(paid=False), name="order_round_unpaid_idx"),
+            models.Index(fields=["round"], condition=models.Q(picked_up=False), name="order_round_open_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stand aus der DB merken, damit die Rundensumme nur das Delta bucht
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            # in der DB hochzählen, nie einen veralteten Wert zurückschreiben
+            self.version = models.F("version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        # post_save (Rundensumme, Kundenkonto) in derselben Transaktion wie die Änderung
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+        if not isinstance(self.version, int):
+            del self.version  # wird beim nächsten Zugriff nachgeladen
 
     def __str__(self):
         return f"{self.customer} – {self.round}"
@@ -60,10 +149,189 @@ class OrderItem(models.Model):
     buy_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # nur beim ersten Speichern
-            self.sell_price = self.product.sell_price
-            self.buy_price = self.product.buy_price
-        super().save(*args, **kwargs)
+        # Preis-Snapshot nur beim ersten Speichern und nur, wenn nicht schon gesetzt;
+        # das Produkt dafür nicht extra laden, wenn es schon am Objekt hängt
+        if not self.pk and (self.sell_price is None or self.buy_price is None):
+            if OrderItem.product.is_cached(self):
+                sell_price, buy_price = self.product.sell_price, self.product.buy_price
+            else:
+                sell_price, buy_price = (
+                    Product.objects.filter(pk=self.product_id).values_list("sell_price", "buy_price").get()
+                )
+            if self.sell_price is None:
+                self.sell_price = sell_price
+            if self.buy_price is None:
+                self.buy_price = buy_price
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return f"{self.product} ({self.quantity} {self.product.unit})"
+
+
+class RoundSummary(models.Model):
+    """Laufend gepflegte Summen einer Runde (siehe core/summary.py)."""
+
+    round = models.OneToOneField(Round, on_delete=models.CASCADE, related_name="summary")
+    revenue = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    order_count = models.IntegerField(default=0)
+    paid_count = models.IntegerField(default=0)
+    picked_count = models.IntegerField(default=0)
+
+    # steigt bei jeder Änderung an der Runde (ETag für Conditional GET)
+    version = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    # steigt nur, wenn sich Bestellungen/Positionen ändern (nicht bei Produkt-/Kundennamen)
+    data_version = models.IntegerField(default=0)
+    # data_version, auf dem die SalesFact-Zeilen der Runde beruhen (siehe core/analytics.py)
+    facts_version = models.IntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Summe {self.round}"
+
+
+class RoundProductTotal(models.Model):
+    round = models.ForeignKey(Round, on_delete=models.CASCADE, related_name="product_totals")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["round", "product"], name="unique_round_product_total"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} ({self.quantity})"
+
+
+class SalesFact(models.Model):
+    """
+    Auswertungstabelle: Menge/Umsatz/Einkauf je Runde × Produkt × Kunde.
+    Wird pro Runde neu erzeugt, sobald sich die Runde geändert hat (core/analytics.py).
+    Ohne DB-Constraint auf die Runde, damit die Historie beim Archivieren bleibt.
+    """
+
+    round = models.ForeignKey(Round, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    round_date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["round", "product", "customer"], name="unique_sales_fact"),
+        ]
+        indexes = [
+            models.Index(fields=["round_date"], name="salesfact_date_idx"),
+            models.Index(fields=["product", "round_date"], name="salesfact_product_date_idx"),
+            models.Index(fields=["customer", "round_date"], name="salesfact_customer_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.round_date} {self.product} {self.customer}"
+
+
+class ForecastLine(models.Model):
+    """Erwartete Menge je Produkt für eine Runde, beim Anlegen berechnet (core/forecast.py)."""
+
+    round = models.ForeignKey(Round, on_delete=models.CASCADE, related_name="forecast_lines")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Prognose
+    average = models.DecimalField(max_digits=12, decimal_places=2, default=0)   # gleitender Mittelwert
+    trend = models.DecimalField(max_digits=12, decimal_places=2, default=0)     # Änderung je Runde
+    buyers = models.DecimalField(max_digits=8, decimal_places=2, default=0)     # erwartete Käufer
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["round", "product"], name="unique_forecast_line"),
+        ]
+
+    def __str__(self):
+        return f"{self.product} (~{self.quantity})"
+
+
+class PriceList(models.Model):
+    """Preisstand ab einem Datum, z.B. für eine Runde nachträglich anzuwenden (core/pricing.py)."""
+
+    name = models.CharField(max_length=120)
+    valid_from = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-valid_from", "-id"]
+
+    def __str__(self):
+        return f"{self.name} (ab {self.valid_from})"
+
+
+class PriceListEntry(models.Model):
+    price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name="entries")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    sell_price = models.DecimalField(max_digits=10, decimal_places=2)
+    buy_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["price_list", "product"], name="unique_price_list_product"),
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.sell_price} / {self.buy_price}"
+
+
+class SyncMutation(models.Model):
+    """
+    Bereits verarbeitete Änderung aus der Offline-Warteschlange (api/sync/):
+    der Idempotenz-Schlüssel des Clients und das Ergebnis, das bei einem
+    erneuten Senden unverändert zurückgegeben wird.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=20)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.key}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Buchung im Kundenkonto: Bestellungen belasten (+), Zahlungen entlasten (−).
+    Customer.balance ist die Summe aller Buchungen des Kunden (siehe core/ledger.py).
+    """
+
+    class Kind(models.TextChoices):
+        CHARGE = "charge", "Bestellung"
+        PAYMENT = "payment", "Zahlung"
+        SETTLED = "settled", "Als bezahlt markiert"
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="ledger_entries")
+    # ohne DB-Constraint: Buchungen bleiben, wenn die Bestellung gelöscht oder archiviert wird
+    order = models.ForeignKey(
+        Order, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+"
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    amount = models.DecimalField(max_digits=14, decimal_places=4)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "-id"], name="ledger_customer_idx"),
+            models.Index(fields=["order", "kind"], name="ledger_order_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} {self.get_kind_display()} {self.amount}"
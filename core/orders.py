@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import events, ledger, signals
+from .models import Order, OrderItem
+from .summary import apply_item_changes, apply_order_change, item_change, touch_orders
+
+
+# Status-Name (URL/Formular) -> (Feld an Order, Zähler in apply_order_change)
+STATUS_FIELDS = {
+    "paid": ("paid", "paid"),
+    "picked": ("picked_up", "picked"),
+}
+
+
+def new_item(order, product, quantity):
+    # Preis-Snapshot direkt aus dem bereits geladenen Produkt
+    return OrderItem(
+        order=order,
+        product=product,
+        quantity=quantity,
+        sell_price=product.sell_price,
+        buy_price=product.buy_price,
+    )
+
+
+@transaction.atomic
+def create_order(rnd, customer, lines, source=Order.Source.CALL, comment=""):
+    """
+    Legt eine Bestellung samt Positionen in einer Transaktion an.
+    lines: Liste aus (product, quantity), bereits geprüft.
+    """
+    order = Order.objects.create(customer=customer, round=rnd, source=source, comment=comment)
+    # bulk_create löst keine Signale aus -> Rundensumme selbst buchen
+    items = OrderItem.objects.bulk_create([new_item(order, p, qty) for p, qty in lines])
+    changes = [item_change(item) for item in items]
+    apply_item_changes(rnd.id, changes)
+    ledger.charge_orders([(customer.pk, order.pk, sum(change[2] for change in changes))])
+    return order
+
+
+def diff_lines(existing_items, wanted):
+    """
+    Vergleicht vorhandene Positionen mit den gewünschten Mengen.
+    existing_items: {product_id: OrderItem}
+    wanted: {product_id: (product, quantity)} – Menge <= 0 heißt entfernen
+    Gibt (added, changed, removed) zurück.
+    """
+    added, changed, removed = [], [], []
+    for product_id, (product, qty) in wanted.items():
+        item = existing_items.get(product_id)
+        if qty <= 0:
+            if item:
+                removed.append(item)
+        elif item is None:
+            added.append((product, qty))
+        elif item.quantity != qty:
+            changed.append((item, qty))
+    return added, changed, removed
+
+
+def update_order(order, existing_items, wanted, **fields):
+    """
+    Schreibt nur, was sich geändert hat: Bestellfelder (z.B. comment, source)
+    und Positionen per Bulk create/update/delete in einer Transaktion.
+    Bleibt keine Position übrig, wird die Bestellung gelöscht.
+    Gibt False zurück, wenn nichts zu tun war (dann auch keine Transaktion).
+    """
+    changed_fields = [name for name, value in fields.items() if getattr(order, name) != value]
+    added, changed, removed = diff_lines(existing_items, wanted)
+    if not (changed_fields or added or changed or removed):
+        return False
+
+    with transaction.atomic():
+        # nur löschen, wenn die letzten Positionen entfernt wurden (nicht bei z.B. bezahlt ohne Positionen)
+        if removed and len(existing_items) - len(removed) + len(added) == 0:
+            order.delete()
+            return True
+
+        changes = []
+
+        if added:
+            items = OrderItem.objects.bulk_create([new_item(order, p, qty) for p, qty in added])
+            changes += [item_change(item) for item in items]
+
+        if changed:
+            for item, qty in changed:
+                changes.append(item_change(item, sign=-1))
+                item.quantity = qty
+                changes.append(item_change(item))
+            OrderItem.objects.bulk_update([item for item, _ in changed], ["quantity"])
+
+        if removed:
+            changes += [item_change(item, sign=-1) for item in removed]
+            with signals.items_accounted(order.pk):
+                OrderItem.objects.filter(pk__in=[item.pk for item in removed]).delete()
+
+        apply_item_changes(order.round_id, changes)
+        ledger.charge_orders([(order.customer_id, order.pk, sum(change[2] for change in changes))])
+
+        # Felder erst nach den Positionen: "bezahlt" bucht so den neuen Betrag aus, nicht den alten
+        if changed_fields:
+            for name in changed_fields:
+                setattr(order, name, fields[name])
+            order.save(update_fields=changed_fields)
+        else:
+            # Positionen per Bulk geändert -> Bestellkarte trotzdem neu rendern
+            touch_orders(pk=order.pk)
+            events.order_changed(order.round_id, order.pk)
+    return True
+
+
+@transaction.atomic
+def set_status(round_id, order_ids, status, value=True):
+    """
+    Setzt bezahlt/abgeholt für die gewählten Bestellungen einer Runde mit einem
+    einzigen UPDATE statt save() pro Bestellung. Summe, Versionen und Live-Events
+    werden deshalb hier gebucht. Gibt die Anzahl tatsächlich geänderter Bestellungen zurück.
+    """
+    field, counter = STATUS_FIELDS[status]
+    # nur die Bestellungen, die sich wirklich ändern – für Konto und Live-Events
+    changed_ids = list(
+        Order.objects.filter(round_id=round_id, pk__in=list(order_ids)).exclude(**{field: value}).values_list("pk", flat=True)
+    )
+    if not changed_ids:
+        return 0
+    orders = Order.objects.filter(pk__in=changed_ids)
+    if field == "paid":
+        # Kundenkonto mitbuchen: offenen Rest ausbuchen bzw. die Ausbuchung stornieren
+        if value:
+            ledger.settle_orders(orders)
+        else:
+            ledger.reopen_orders(orders)
+    changed = orders.update(**{field: value}, version=F("version") + 1)
+    apply_order_change(round_id, **{counter: changed if value else -changed})
+    for order_id in changed_ids:
+        events.order_changed(round_id, order_id)
+    return changed
@@ -0,0 +1,63 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_filter(ordering, values):
+    """
+    Bedingung "liegt hinter dem Cursor" für eine Sortierung wie
+    ["customer__name", "id"] oder ["-is_active", "-date", "id"].
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): value})
+        condition |= step
+    return condition
+
+
+def _cursor_value(row, field):
+    value = row
+    for part in field.lstrip("-").split("__"):
+        value = value[part] if isinstance(value, dict) else getattr(value, part)
+    return value
+
+
+def keyset_page(queryset, ordering, cursor=None, size=25):
+    """
+    Eine Seite per Keyset statt OFFSET: kostet gleich viel, egal wie weit
+    hinten man ist. Gibt (rows, next_cursor) zurück, next_cursor ist None
+    auf der letzten Seite.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor)
+    if values and len(values) == len(ordering):
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    rows = list(queryset[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([_cursor_value(rows[-1], f) for f in ordering])
+    return rows, next_cursor
@@ -0,0 +1,159 @@
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+
+# Messwerte des laufenden Requests (gesetzt von core.middleware.PerfMiddleware)
+current_record = ContextVar("perf_record", default=None)
+
+logger = logging.getLogger("core.perf")
+
+
+class RequestRecord:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest = []
+        self.template_ms = 0.0
+
+    def add_query(self, sql, ms, keep=3):
+        self.queries += 1
+        self.sql_ms += ms
+        self.slowest.append((ms, sql))
+        if len(self.slowest) > keep:
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[keep:]
+
+    def as_dict(self, **extra):
+        return {
+            "ts": round(time.time(), 3),
+            **extra,
+            "ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "queries": self.queries,
+            "sql_ms": round(self.sql_ms, 2),
+            "template_ms": round(self.template_ms, 2),
+            "slowest": [
+                {"ms": round(ms, 2), "sql": sql[:300]}
+                for ms, sql in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)
+            ],
+        }
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(sql, (time.perf_counter() - start) * 1000)
+
+
+def log_path():
+    return Path(getattr(settings, "PERF_LOG_FILE", settings.BASE_DIR / "perf.jsonl"))
+
+
+def configure_logger():
+    if logger.handlers:
+        return
+    handler = RotatingFileHandler(
+        log_path(),
+        maxBytes=getattr(settings, "PERF_LOG_MAX_BYTES", 5 * 1024 * 1024),
+        backupCount=getattr(settings, "PERF_LOG_BACKUPS", 3),
+        encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def write(entry):
+    logger.info(json.dumps(entry, ensure_ascii=False))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        record = current_record.get()
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            if record is not None:
+                record.template_ms += (time.perf_counter() - start) * 1000
+
+
+class PerfTemplates(DjangoTemplates):
+    """Django-Templates, die zusätzlich die Renderzeit pro Request mitschreiben."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def read_entries():
+    path = log_path()
+    backups = getattr(settings, "PERF_LOG_BACKUPS", 3)
+    files = [path.with_name(f"{path.name}.{i}") for i in range(backups, 0, -1)] + [path]
+    for file in files:
+        if not file.exists():
+            continue
+        with file.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def view_stats(entries):
+    by_view = defaultdict(list)
+    for entry in entries:
+        by_view[entry.get("view") or "?"].append(entry)
+
+    stats = []
+    for view, rows in by_view.items():
+        ms = [row["ms"] for row in rows]
+        queries = [row["queries"] for row in rows]
+        slowest = max(
+            (query for row in rows for query in row.get("slowest", [])),
+            key=lambda query: query["ms"],
+            default=None,
+        )
+        stats.append({
+            "view": view,
+            "count": len(rows),
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "queries_p50": percentile(queries, 50),
+            "queries_max": max(queries),
+            "sql_ms_p95": percentile([row["sql_ms"] for row in rows], 95),
+            "template_ms_p95": percentile([row["template_ms"] for row in rows], 95),
+            "bytes_p50": percentile([row.get("bytes") or 0 for row in rows], 50),
+            "slowest": slowest,
+        })
+    stats.sort(key=lambda row: row["p95"], reverse=True)
+    return stats
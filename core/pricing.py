@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+from . import events, ledger
+from .models import OrderItem, PriceList, PriceListEntry, Product
+from .summary import LINE_COST, LINE_REVENUE, apply_item_changes
+
+
+STEP = Decimal("0.0001")  # Genauigkeit der Rundensumme
+
+
+def snapshot_price_list(name, valid_from):
+    """Neue Preisliste mit den aktuellen Preisen aller aktiven Produkte (zum Weiterbearbeiten)."""
+    with transaction.atomic():
+        price_list = PriceList.objects.create(name=name, valid_from=valid_from)
+        PriceListEntry.objects.bulk_create([
+            PriceListEntry(price_list=price_list, product_id=pk, sell_price=sell, buy_price=buy)
+            for pk, sell, buy in Product.objects.filter(active=True).values_list("id", "sell_price", "buy_price")
+        ])
+    return price_list
+
+
+def price_list_for(date):
+    """Die zum Datum gültige Preisliste (jüngste mit valid_from <= date)."""
+    return PriceList.objects.filter(valid_from__lte=date).first()
+
+
+def _entry_price(price_list, field, product_ref="product_id"):
+    return Subquery(
+        PriceListEntry.objects
+        .filter(price_list=price_list, product_id=OuterRef(product_ref))
+        .values(field)[:1]
+    )
+
+
+def _lines(rnd, price_list, include_paid):
+    lines = OrderItem.objects.filter(
+        order__round=rnd,
+        product_id__in=PriceListEntry.objects.filter(price_list=price_list).values("product_id"),
+    )
+    if not include_paid:
+        lines = lines.filter(order__paid=False)
+    return lines
+
+
+def reprice_preview(rnd, price_list, include_paid=False):
+    """
+    Was die Preisliste an der Runde ändern würde, je Produkt: Positionen, Menge,
+    Umsatz/Einkauf vorher und nachher. Ein gruppierter Query, Produkte ohne Änderung fehlen.
+    """
+    new_sell = _entry_price(price_list, "sell_price")
+    new_buy = _entry_price(price_list, "buy_price")
+    rows = (
+        _lines(rnd, price_list, include_paid)
+        .values("product_id", "product__name", "product__unit")
+        .annotate(
+            lines=Count("id"),
+            qty=Sum("quantity"),
+            old_revenue=Sum(LINE_REVENUE),
+            old_cost=Sum(LINE_COST),
+            new_revenue=Sum(ExpressionWrapper(F("quantity") * new_sell, output_field=DecimalField())),
+            new_cost=Sum(ExpressionWrapper(F("quantity") * new_buy, output_field=DecimalField())),
+        )
+        .order_by("product__name")
+    )
+
+    result = []
+    for row in rows:
+        for key in ("old_revenue", "old_cost", "new_revenue", "new_cost"):
+            row[key] = Decimal(str(row[key] or 0)).quantize(STEP)
+        row["delta_revenue"] = row["new_revenue"] - row["old_revenue"]
+        row["delta_cost"] = row["new_cost"] - row["old_cost"]
+        row["delta_profit"] = row["delta_revenue"] - row["delta_cost"]
+        if row["delta_revenue"] or row["delta_cost"]:
+            result.append(row)
+    return result
+
+
+def preview_totals(rows):
+    return {
+        key: sum(row[key] for row in rows)
+        for key in ("lines", "old_revenue", "new_revenue", "delta_revenue", "delta_cost", "delta_profit")
+    }
+
+
+@transaction.atomic
+def reprice_round(rnd, price_list, include_paid=False):
+    """
+    Setzt die Preise aller betroffenen Positionen der Runde auf die der Preisliste –
+    ein UPDATE für die ganze Runde statt jede Bestellung einzeln zu öffnen.
+    Bezahlte Bestellungen nur mit include_paid. Gibt die Anzahl geänderter Positionen zurück.
+    """
+    rows = reprice_preview(rnd, price_list, include_paid)
+    if not rows:
+        return 0
+
+    lines = _lines(rnd, price_list, include_paid).filter(product_id__in=[row["product_id"] for row in rows])
+    # Delta je Bestellung fürs Kundenkonto, vor dem UPDATE (ein gruppierter Query)
+    new_revenue = ExpressionWrapper(F("quantity") * _entry_price(price_list, "sell_price"), output_field=DecimalField())
+    charges = [
+        (row["order__customer_id"], row["order_id"], row["delta"])
+        for row in (
+            lines
+            .values("order_id", "order__customer_id")
+            .annotate(delta=Sum(new_revenue) - Sum(LINE_REVENUE))
+            .order_by()
+        )
+    ]
+    updated = lines.update(
+        sell_price=_entry_price(price_list, "sell_price"), buy_price=_entry_price(price_list, "buy_price")
+    )
+    # update() umgeht die Signale -> Rundensumme mit den Deltas aus der Vorschau buchen
+    apply_item_changes(rnd.id, [(row["product_id"], 0, row["delta_revenue"], row["delta_cost"]) for row in rows])
+    ledger.charge_orders(charges, note=f"Preisliste {price_list}")
+    events.round_reload(rnd.id)
+    return updated
+
+
+def apply_to_products(price_list):
+    """Preise der Liste als aktuelle Produktpreise übernehmen (für neue Bestellungen)."""
+    return (
+        Product.objects
+        .filter(pk__in=PriceListEntry.objects.filter(price_list=price_list).values("product_id"))
+        .update(
+            sell_price=_entry_price(price_list, "sell_price", "pk"),
+            buy_price=_entry_price(price_list, "buy_price", "pk"),
+        )
+    )
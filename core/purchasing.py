@@ -0,0 +1,58 @@
+from decimal import ROUND_CEILING
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Round, RoundProductTotal
+
+
+def selected_rounds(round_ids=None, date_from=None, date_to=None):
+    """
+    Runden für den Sammeleinkauf: ausdrücklich gewählte IDs, sonst ein Zeitraum,
+    sonst die anstehenden (aktive und alle ab heute).
+    """
+    rounds = Round.objects.order_by("date", "id")
+    if round_ids:
+        return list(rounds.filter(id__in=round_ids))
+    if date_from or date_to:
+        if date_from:
+            rounds = rounds.filter(date__gte=date_from)
+        if date_to:
+            rounds = rounds.filter(date__lte=date_to)
+        return list(rounds)
+    return list(rounds.filter(Q(is_active=True) | Q(date__gte=timezone.localdate())))
+
+
+def pack_quantity(qty, pack_size):
+    """Auf ganze Gebinde aufrunden: (Anzahl Gebinde, Einkaufsmenge), ohne Gebinde (None, qty)."""
+    if not pack_size:
+        return None, qty
+    packs = int((qty / pack_size).to_integral_value(rounding=ROUND_CEILING))
+    return packs, packs * pack_size
+
+
+def consolidated(rounds):
+    """
+    Einkaufsmengen je Produkt über mehrere Runden, mit einer Spalte pro Runde.
+    Ein gruppierter Query über die gepflegten RoundProductTotal-Zeilen (bedingte
+    Summe je Runde), egal wie viele Runden gewählt sind.
+    """
+    round_ids = [rnd.id for rnd in rounds]
+    if not round_ids:
+        return []
+    per_round = {f"r{round_id}": Sum("quantity", filter=Q(round_id=round_id), default=0) for round_id in round_ids}
+    rows = (
+        RoundProductTotal.objects
+        .filter(round_id__in=round_ids)
+        .values("product_id", "product__name", "product__unit", "product__pack_size")
+        .annotate(total=Sum("quantity"), **per_round)
+        .filter(total__gt=0)
+        .order_by("product__name")
+    )
+
+    result = []
+    for row in rows:
+        row["per_round"] = [row.pop(f"r{round_id}") for round_id in round_ids]
+        row["packs"], row["buy_qty"] = pack_quantity(row["total"], row["product__pack_size"])
+        result.append(row)
+    return result
@@ -0,0 +1,21 @@
+ARCHIVE_DB = "archive"
+
+
+class ArchiveRouter:
+    """
+    Die Archiv-Datenbank (abgeschlossene Runden, siehe core.archive) enthält nur
+    die Tabellen von core. Alles läuft über default, außer es wird ausdrücklich
+    mit .using(ARCHIVE_DB) gelesen – Relationen einer Runde aus dem Archiv
+    (rnd.order_set, Prefetches) bleiben dann ebenfalls im Archiv.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db == ARCHIVE_DB:
+            return ARCHIVE_DB
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ARCHIVE_DB:
+            return app_label == "core"
+        return None
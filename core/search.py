@@ -0,0 +1,149 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Customer, Order, Product
+
+
+# SQLite-FTS5-Index über Kunden, Produkte und Bestellnotizen.
+# rowid = obj_id * 4 + Code der Art, damit ein Eintrag direkt ersetzt werden kann.
+TABLE = "core_search"
+KINDS = {"customer": 1, "product": 2, "order": 3}
+# Arten mit active-Flag: darauf lässt sich direkt in der Suche filtern
+ACTIVE_MODELS = {"customer": Customer, "product": Product}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_available():
+    # Einmal pro Verbindung nachsehen, ob die Migration die Tabelle angelegt hat
+    available = getattr(connection, "_core_fts_available", None)
+    if available is None:
+        available = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE])
+                available = cursor.fetchone() is not None
+        connection._core_fts_available = available
+    return available
+
+
+def _rowid(kind, obj_id):
+    return obj_id * 4 + KINDS[kind]
+
+
+def _digits(value):
+    return re.sub(r"\D", "", value or "")
+
+
+def customer_doc(customer):
+    return customer.name, " ".join([customer.phone, _digits(customer.phone), customer.notes])
+
+
+def product_doc(product):
+    return product.name, product.unit
+
+
+def order_doc(order):
+    return order.customer.name, order.comment
+
+
+def index(kind, obj_id, title, body):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, obj_id)])
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, kind, obj_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            [_rowid(kind, obj_id), kind, obj_id, title, body],
+        )
+
+
+def unindex(kind, obj_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, obj_id)])
+
+
+def index_customer(customer):
+    index("customer", customer.pk, *customer_doc(customer))
+
+
+def index_product(product):
+    index("product", product.pk, *product_doc(product))
+
+
+def index_order(order):
+    # Nur Bestellungen mit Notiz sind interessant
+    if order.comment:
+        index("order", order.pk, *order_doc(order))
+    else:
+        unindex("order", order.pk)
+
+
+def build_query(q):
+    """Nutzereingabe -> FTS5-Ausdruck: jedes Wort als Präfix, alle müssen passen."""
+    tokens = _TOKEN_RE.findall(q or "")
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search(q, kind, limit=50, active_only=False):
+    """
+    IDs der Treffer, beste zuerst. None, wenn kein FTS verfügbar ist.
+    active_only: nur aktive Kunden/Produkte – im Join gefiltert, damit inaktive
+    Treffer das Limit nicht aufbrauchen.
+    """
+    if not fts_available():
+        return None
+    match = build_query(q)
+    if not match:
+        return []
+    join = ""
+    if active_only:
+        table = ACTIVE_MODELS[kind]._meta.db_table
+        join = f"JOIN {table} ON {table}.id = {TABLE}.obj_id AND {table}.active"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {TABLE}.obj_id FROM {TABLE} {join} "
+            f"WHERE {TABLE} MATCH %s AND {TABLE}.kind = %s ORDER BY {TABLE}.rank LIMIT %s",
+            [match, kind, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def in_rank_order(queryset, ids):
+    by_id = {obj.pk: obj for obj in queryset.filter(pk__in=ids)}
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def _documents():
+    for customer in Customer.objects.iterator(chunk_size=2000):
+        yield ("customer", customer.pk, *customer_doc(customer))
+    for product in Product.objects.iterator(chunk_size=2000):
+        yield ("product", product.pk, *product_doc(product))
+    orders = Order.objects.exclude(comment="").select_related("customer")
+    for order in orders.iterator(chunk_size=2000):
+        yield ("order", order.pk, *order_doc(order))
+
+
+@transaction.atomic
+def rebuild(batch_size=2000):
+    if not fts_available():
+        return 0
+
+    insert = f"INSERT INTO {TABLE} (rowid, kind, obj_id, title, body) VALUES (%s, %s, %s, %s, %s)"
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        batch = []
+        for kind, obj_id, title, body in _documents():
+            batch.append((_rowid(kind, obj_id), kind, obj_id, title, body))
+            if len(batch) >= batch_size:
+                cursor.executemany(insert, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert, batch)
+            count += len(batch)
+    return count
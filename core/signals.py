@@ -0,0 +1,277 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analytics, events, ledger, search, summary
+from .models import Customer, Order, OrderItem, Product, Round, RoundSummary, SalesFact
+
+
+class _Marks(threading.local):
+    """Markierungen je Thread – sonst unterdrückt ein Request die Buchungen eines anderen."""
+
+    def __init__(self):
+        # Bestellungen/Runden, die gerade per Kaskade gelöscht werden. Deren Positionen
+        # werden nicht einzeln ausgebucht, das passiert gesammelt in pre_delete.
+        self.deleting_orders = set()
+        self.deleting_rounds = set()
+        # Runden, die gerade ins Archiv wandern: deren Auswertungszeilen bleiben stehen
+        self.archiving_rounds = set()
+
+
+_marks = _Marks()
+
+
+@contextmanager
+def items_accounted(order_id):
+    """Positionen dieser Bestellung bucht der Aufrufer selbst (z.B. Bulk-Löschen)."""
+    _marks.deleting_orders.add(order_id)
+    try:
+        yield
+    finally:
+        _marks.deleting_orders.discard(order_id)
+
+
+@contextmanager
+def keep_history(round_id):
+    """Runde wird archiviert, nicht gelöscht: SalesFact-Zeilen behalten."""
+    _marks.archiving_rounds.add(round_id)
+    try:
+        yield
+    finally:
+        _marks.archiving_rounds.discard(round_id)
+
+
+def _elsewhere(kwargs):
+    # Archiv-DB (core.archive): dort gibt es keine Summen, Suche oder Live-Updates zu pflegen
+    return kwargs.get("using", DEFAULT_DB_ALIAS) != DEFAULT_DB_ALIAS
+
+
+def _remember_loaded(instance, *fields):
+    instance._loaded_values = {f: getattr(instance, f) for f in fields}
+
+
+@receiver(post_save, sender=Round)
+def round_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _elsewhere(kwargs):
+        return
+    if created:
+        RoundSummary.objects.get_or_create(round=instance)
+    elif SalesFact.objects.filter(round_id=instance.pk).exclude(round_date=instance.date).exists():
+        # Datum geändert -> round_date in den Verkaufsfakten stimmt nicht mehr
+        summary.touch_facts(round_id=instance.pk)
+    else:
+        summary.touch_rounds(round_id=instance.pk)
+
+
+def _round_cascade(origin):
+    """Löschen ging von Runden aus (Instanz oder QuerySet), Bestellungen fallen per Kaskade."""
+    if isinstance(origin, QuerySet):
+        return origin.model is Round
+    return isinstance(origin, Round)
+
+
+@receiver(pre_delete, sender=Round)
+def round_deleting(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    # Bestellungen sind zu diesem Zeitpunkt schon ausgebucht (order_deleting kommt vorher)
+    _marks.deleting_rounds.add(instance.pk)
+
+
+@receiver(post_delete, sender=Round)
+def round_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    _marks.deleting_rounds.discard(instance.pk)
+    if instance.pk not in _marks.archiving_rounds:
+        analytics.forget_round(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _elsewhere(kwargs):
+        return
+
+    loaded = getattr(instance, "_loaded_values", None)
+    if created:
+        summary.apply_order_change(
+            instance.round_id, orders=1, paid=int(instance.paid), picked=int(instance.picked_up)
+        )
+    elif loaded is None:
+        # Alter Stand unbekannt -> Runde neu zusammenrechnen
+        summary.rebuild_round_summary(instance.round_id)
+    else:
+        old_round = loaded.get("round_id", instance.round_id)
+        old_paid = loaded.get("paid", instance.paid)
+        old_picked = loaded.get("picked_up", instance.picked_up)
+
+        if old_round != instance.round_id:
+            # Bestellung wurde in eine andere Runde verschoben
+            summary.apply_order_change(old_round, orders=-1, paid=-int(old_paid), picked=-int(old_picked))
+            summary.apply_order_change(
+                instance.round_id, orders=1, paid=int(instance.paid), picked=int(instance.picked_up)
+            )
+            summary.apply_item_changes(old_round, summary.order_item_changes(instance.pk, sign=-1))
+            summary.apply_item_changes(instance.round_id, summary.order_item_changes(instance.pk))
+        else:
+            summary.apply_order_change(
+                instance.round_id,
+                paid=int(instance.paid) - int(old_paid),
+                picked=int(instance.picked_up) - int(old_picked),
+            )
+
+        old_customer = loaded.get("customer_id", instance.customer_id)
+        if old_customer != instance.customer_id:
+            ledger.move_order(instance.pk, old_customer, instance.customer_id)
+            summary.touch_facts(round_id=instance.round_id)
+        if old_paid != instance.paid:
+            orders = Order.objects.filter(pk=instance.pk)
+            if instance.paid:
+                ledger.settle_orders(orders)
+            else:
+                ledger.reopen_orders(orders)
+
+    if loaded and loaded.get("round_id", instance.round_id) != instance.round_id:
+        events.order_removed(loaded["round_id"], instance.pk)
+    events.order_changed(instance.round_id, instance.pk)
+    _remember_loaded(instance, "round_id", "customer_id", "paid", "picked_up")
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    _marks.deleting_orders.add(instance.pk)
+    if instance.round_id in _marks.archiving_rounds:
+        # wandert ins Archiv: Buchungen bleiben, Summen und Dashboard gehen mit der Runde
+        return
+    if instance.round_id in _marks.deleting_rounds:
+        return
+    if _round_cascade(kwargs.get("origin")):
+        # pre_delete der Bestellungen kommt vor dem der Runde: beim ersten Mal die
+        # Belastungen der ganzen Runde gesammelt stornieren, Summen gehen mit der Runde
+        _marks.deleting_rounds.add(instance.round_id)
+        ledger.cancel_orders(Order.objects.filter(round_id=instance.round_id), note="Runde gelöscht")
+        return
+    ledger.cancel_orders(Order.objects.filter(pk=instance.pk))
+    summary.apply_order_change(
+        instance.round_id, orders=-1, paid=-int(instance.paid), picked=-int(instance.picked_up)
+    )
+    summary.apply_item_changes(instance.round_id, summary.order_item_changes(instance.pk, sign=-1))
+    events.order_removed(instance.round_id, instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    _marks.deleting_orders.discard(instance.pk)
+
+
+def _item_order(item):
+    """(round_id, customer_id) der Bestellung einer Position."""
+    if OrderItem.order.is_cached(item):
+        order = item.order
+        return order.round_id, order.customer_id
+    return Order.objects.filter(pk=item.order_id).values_list("round_id", "customer_id").first() or (None,) * 2
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or _elsewhere(kwargs):
+        return
+
+    round_id, customer_id = _item_order(instance)
+    loaded = getattr(instance, "_loaded_values", None)
+    if created:
+        changes = [summary.item_change(instance)]
+        summary.apply_item_changes(round_id, changes)
+    elif loaded is None:
+        # alter Betrag unbekannt -> im Konto kein Delta buchbar
+        changes = []
+        summary.rebuild_round_summary(round_id)
+    else:
+        old = OrderItem(
+            product_id=loaded.get("product_id", instance.product_id),
+            quantity=loaded.get("quantity", instance.quantity),
+            sell_price=loaded.get("sell_price", instance.sell_price),
+            buy_price=loaded.get("buy_price", instance.buy_price),
+        )
+        changes = [summary.item_change(old, sign=-1), summary.item_change(instance)]
+        summary.apply_item_changes(round_id, changes)
+    ledger.charge_orders([(customer_id, instance.order_id, revenue) for _, _, revenue, _ in changes])
+
+    summary.touch_orders(pk=instance.order_id)
+    events.order_changed(round_id, instance.order_id)
+    _remember_loaded(instance, "product_id", "quantity", "sell_price", "buy_price")
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    if instance.order_id in _marks.deleting_orders:
+        return
+    round_id, customer_id = _item_order(instance)
+    if round_id is None or round_id in _marks.deleting_rounds or round_id in _marks.archiving_rounds:
+        return
+    change = summary.item_change(instance, sign=-1)
+    summary.apply_item_changes(round_id, [change])
+    ledger.charge_orders([(customer_id, instance.order_id, change[2])])
+    summary.touch_orders(pk=instance.order_id)
+    events.order_changed(round_id, instance.order_id)
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, raw=False, **kwargs):
+    if raw or _elsewhere(kwargs):
+        return
+    search.index_customer(instance)
+    # Name/Telefon stehen auf Dashboard und Packliste der Runden des Kunden
+    summary.touch_rounds(round__order__customer=instance)
+    summary.touch_orders(customer=instance)
+    # Kundenname steht auch im Index der Bestellnotizen
+    for order in instance.order_set.exclude(comment=""):
+        order.customer = instance
+        search.index_order(order)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    search.unindex("customer", instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw or _elsewhere(kwargs):
+        return
+    search.index_product(instance)
+    summary.touch_rounds(round__product_totals__product=instance)
+    summary.touch_orders(items__product=instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    search.unindex("product", instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def order_search_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or _elsewhere(kwargs) or (update_fields is not None and "comment" not in update_fields):
+        return
+    search.index_order(instance)
+
+
+@receiver(post_delete, sender=Order)
+def order_search_deleted(sender, instance, **kwargs):
+    if _elsewhere(kwargs):
+        return
+    search.unindex("order", instance.pk)
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem, RoundProductTotal, RoundSummary
+
+
+LINE_REVENUE = ExpressionWrapper(F("sell_price") * F("quantity"), output_field=DecimalField())
+LINE_COST = ExpressionWrapper(F("buy_price") * F("quantity"), output_field=DecimalField())
+
+
+def item_change(item, sign=1):
+    """(product_id, Menge, Umsatz, Einkauf) einer Position, mit Vorzeichen."""
+    qty = item.quantity * sign
+    return (item.product_id, qty, qty * item.sell_price, qty * item.buy_price)
+
+
+def get_round_summary(rnd):
+    # rnd._state.db: archivierte Runden haben ihre Summe im Archiv
+    summary = RoundSummary.objects.using(rnd._state.db).filter(round=rnd).first()
+    if summary is None:
+        summary = rebuild_round_summary(rnd.id)
+    return summary
+
+
+def round_product_totals(rnd):
+    return (
+        RoundProductTotal.objects
+        .using(rnd._state.db)
+        .filter(round=rnd)
+        .exclude(quantity=0)
+        .values("product_id", "product__name", "product__unit", total_qty=F("quantity"))
+        .order_by("product__name")
+    )
+
+
+def apply_item_changes(round_id, changes):
+    """
+    Bucht Positionsänderungen inkrementell auf die Rundensumme.
+    changes: Iterable aus (product_id, Menge, Umsatz, Einkauf) – Deltas.
+    """
+    per_product = defaultdict(Decimal)
+    revenue = Decimal("0")
+    cost = Decimal("0")
+    for product_id, qty, rev, cst in changes:
+        per_product[product_id] += qty
+        revenue += rev
+        cost += cst
+
+    if not per_product:
+        return
+
+    with transaction.atomic(savepoint=False):
+        updated = RoundSummary.objects.filter(round_id=round_id).update(
+            revenue=F("revenue") + revenue,
+            cost=F("cost") + cost,
+            **_bumped(data=True),
+        )
+        if not updated:
+            # Noch keine Summe vorhanden -> einmal komplett aufbauen
+            rebuild_round_summary(round_id)
+            return
+
+        for product_id, qty in per_product.items():
+            if not qty:
+                continue
+            updated = (
+                RoundProductTotal.objects
+                .filter(round_id=round_id, product_id=product_id)
+                .update(quantity=F("quantity") + qty)
+            )
+            if not updated:
+                RoundProductTotal.objects.create(round_id=round_id, product_id=product_id, quantity=qty)
+
+
+def apply_order_change(round_id, orders=0, paid=0, picked=0):
+    # Auch ohne Zähler-Delta (z.B. neue Notiz) ändert sich die Runde -> Version
+    with transaction.atomic(savepoint=False):
+        updated = RoundSummary.objects.filter(round_id=round_id).update(
+            order_count=F("order_count") + orders,
+            paid_count=F("paid_count") + paid,
+            picked_count=F("picked_count") + picked,
+            **_bumped(),
+        )
+        if not updated:
+            rebuild_round_summary(round_id)
+
+
+def _bumped(data=False):
+    values = {"version": F("version") + 1, "updated_at": timezone.now()}
+    if data:
+        # Verkaufsfakten der Runde sind damit veraltet (analytics.refresh_stale)
+        values["data_version"] = F("data_version") + 1
+    return values
+
+
+def touch_rounds(**filters):
+    """Version der betroffenen Runden erhöhen, z.B. touch_rounds(round_id=5)."""
+    return RoundSummary.objects.filter(**filters).update(**_bumped())
+
+
+def touch_facts(**filters):
+    """Wie touch_rounds, markiert zusätzlich die Verkaufsfakten als veraltet."""
+    return RoundSummary.objects.filter(**filters).update(**_bumped(data=True))
+
+
+def touch_orders(**filters):
+    """Version einzelner Bestellungen erhöhen (Schlüssel der Bestellkarten im Cache)."""
+    return Order.objects.filter(**filters).update(version=F("version") + 1)
+
+
+def all_orders_marked(round_id, counter):
+    """Nach einem Bulk-Update aller Bestellungen (update() umgeht die Signale)."""
+    RoundSummary.objects.filter(round_id=round_id).update(**{counter: F("order_count")}, **_bumped())
+
+
+def order_item_changes(order_id, sign=1):
+    """Alle Positionen einer Bestellung als Deltas (ein gruppierter Query)."""
+    rows = (
+        OrderItem.objects
+        .filter(order_id=order_id)
+        .values("product_id")
+        .annotate(qty=Sum("quantity"), revenue=Sum(LINE_REVENUE), cost=Sum(LINE_COST))
+    )
+    return [
+        (
+            row["product_id"],
+            row["qty"] * sign,
+            Decimal(str(row["revenue"] or 0)) * sign,
+            Decimal(str(row["cost"] or 0)) * sign,
+        )
+        for row in rows
+    ]
+
+
+@transaction.atomic
+def rebuild_round_summary(round_id):
+    totals = (
+        OrderItem.objects
+        .filter(order__round_id=round_id)
+        .aggregate(revenue=Sum(LINE_REVENUE), cost=Sum(LINE_COST))
+    )
+    counts = (
+        Order.objects
+        .filter(round_id=round_id)
+        .aggregate(
+            order_count=Count("id"),
+            paid_count=Count("id", filter=Q(paid=True)),
+            picked_count=Count("id", filter=Q(picked_up=True)),
+        )
+    )
+
+    values = {
+        "revenue": totals["revenue"] or Decimal("0"),
+        "cost": totals["cost"] or Decimal("0"),
+        **counts,
+    }
+    if not RoundSummary.objects.filter(round_id=round_id).update(**values, **_bumped(data=True)):
+        RoundSummary.objects.create(round_id=round_id, version=1, data_version=1, updated_at=timezone.now(), **values)
+
+    RoundProductTotal.objects.filter(round_id=round_id).delete()
+    RoundProductTotal.objects.bulk_create([
+        RoundProductTotal(round_id=round_id, product_id=row["product_id"], quantity=row["qty"])
+        for row in (
+            OrderItem.objects
+            .filter(order__round_id=round_id)
+            .values("product_id")
+            .annotate(qty=Sum("quantity"))
+        )
+    ])
+
+    return RoundSummary.objects.get(round_id=round_id)
@@ -0,0 +1,46 @@
+// Offline-Betrieb: nur die Schnellbestellung wird offline vorgehalten, und zwar nur
+// die zuletzt geöffnete (aktive Runde). Andere Seiten gehen ohne Cache ans Netz.
+// Bestellungen selbst laufen über die Warteschlange in quick_order.html (api/sync/).
+const CACHE = "meatmanager-pages-{{ version }}";
+const SHELL = new RegExp("^" + "{% url 'quick_order' 0 %}".replace("/0/", "/\\d+/") + "$");
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((keys) => Promise.all(keys.filter((key) => key !== CACHE).map((key) => caches.delete(key))))
+      .then(() => self.clients.claim())
+  );
+});
+
+async function remember(request, response) {
+  const cache = await caches.open(CACHE);
+  const keys = await cache.keys();
+  await Promise.all(keys.filter((key) => key.url !== request.url).map((key) => cache.delete(key)));
+  await cache.put(request, response);
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  // nur Aufrufe der Schnellbestellung; API, Live-Events, POSTs und alle anderen Seiten gehen direkt ans Netz
+  if (request.method !== "GET" || request.mode !== "navigate") return;
+  if (!SHELL.test(new URL(request.url).pathname)) return;
+
+  event.respondWith(
+    fetch(request)
+      .then((response) => {
+        if (response.ok && !response.redirected) {
+          event.waitUntil(remember(request, response.clone()));
+        }
+        return response;
+      })
+      .catch(async () => {
+        const cached = await caches.match(request);
+        return cached || new Response("Offline – Schnellbestellung noch nicht im Cache.", {
+          status: 503,
+          headers: {"Content-Type": "text/plain; charset=utf-8"},
+        });
+      })
+  );
+});
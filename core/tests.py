@@ -1,3 +1,1420 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib.util
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import nullcontext
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import analytics, archive, events, forecast, ledger, perf, pricing, purchasing, search, signals
+from .admin import ApproximateCountPaginator
+from .management.commands import benchmark_views
+from .models import (
+    Customer, ForecastLine, LedgerEntry, Order, OrderItem, PriceListEntry, Product, Round, RoundProductTotal,
+    RoundSummary, SalesFact, SyncMutation,
+)
+from .orders import create_order, set_status, update_order
+from .paging import encode_cursor, keyset_filter
+from .routers import ARCHIVE_DB
+from .summary import rebuild_round_summary
+from .views import CUSTOMER_SORTS, ORDER_FILTERS, _deactivate_rounds, _order_page
+
+
+# "SCAN core_order" ohne "USING ... INDEX" = kompletter Tabellendurchlauf
+FULL_SCAN_RE = re.compile(r"\bSCAN (core_\w+)\s*$", re.MULTILINE)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN ist SQLite-spezifisch")
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.round = Round.objects.create(date="2026-01-01", is_active=True)
+        customer = Customer.objects.create(name="Anna")
+        product = Product.objects.create(name="Rinderhack", sell_price=Decimal("10"), buy_price=Decimal("7"))
+        order = Order.objects.create(customer=customer, round=cls.round)
+        OrderItem.objects.create(order=order, product=product, quantity=Decimal("1"))
+
+    def assertNoFullScan(self, plan):
+        self.assertIsNone(FULL_SCAN_RE.search(plan), plan)
+
+    def explain_sql(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return "\n".join(row[-1] for row in cursor.fetchall())
+
+    def test_home_active_round(self):
+        self.assertNoFullScan(Round.objects.filter(is_active=True).order_by("-date").explain())
+
+    def test_round_list_keyset(self):
+        ordering = ["-is_active", "-date", "id"]
+        self.assertNoFullScan(Round.objects.order_by(*ordering).explain())
+        after = keyset_filter(ordering, [False, "2025-01-01", 1])
+        self.assertNoFullScan(Round.objects.filter(after).order_by(*ordering).explain())
+
+    def test_pack_list_orders(self):
+        orders = Order.objects.filter(round=self.round).select_related("customer").order_by("customer__name", "id")
+        self.assertNoFullScan(orders.explain())
+        for condition in ORDER_FILTERS.values():
+            self.assertNoFullScan(orders.filter(condition).explain())
+
+    def test_round_summary_reads(self):
+        self.assertNoFullScan(RoundSummary.objects.filter(round=self.round).explain())
+        self.assertNoFullScan(RoundProductTotal.objects.filter(round=self.round).values("product__name").explain())
+
+    def test_customer_list_sorts(self):
+        for _, ordering, condition in CUSTOMER_SORTS.values():
+            customers = Customer.objects.filter(condition).order_by(*ordering)
+            self.assertNotIn("TEMP B-TREE FOR ORDER BY", customers[:50].explain())
+
+    def test_quick_order_products(self):
+        self.assertNoFullScan(Product.objects.filter(active=True).order_by("name").explain())
+
+    def test_deactivate_touches_only_active_round(self):
+        with CaptureQueriesContext(connection) as queries:
+            _deactivate_rounds()
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertNoFullScan(self.explain_sql(queries.captured_queries[0]["sql"]))
+
+
+class ActiveRoundTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(self.user)
+
+    def test_only_one_active_round(self):
+        Round.objects.create(date="2026-01-01", is_active=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Round.objects.create(date="2026-01-08", is_active=True)
+
+    def test_set_active_round_switches(self):
+        old = Round.objects.create(date="2026-01-01", is_active=True)
+        product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        create_order(old, Customer.objects.create(name="Anna"), [(product, Decimal("1"))])
+        new = Round.objects.create(date="2026-01-08")
+        self.client.get(reverse("set_active_round", args=[new.id]))
+        self.assertEqual(list(Round.objects.filter(is_active=True)), [new])
+        old.refresh_from_db()
+        self.assertFalse(old.is_active)
+        # Auswertung bleibt dem Cron bzw. dem Knopf überlassen
+        self.assertFalse(SalesFact.objects.filter(round=old).exists())
+
+    def test_create_round_becomes_only_active(self):
+        Round.objects.create(date="2026-01-01", is_active=True)
+        self.client.post(reverse("create_round"), {"date": "2026-01-08", "travel_km": "30"})
+        self.assertEqual(Round.objects.filter(is_active=True).get().date.isoformat(), "2026-01-08")
+
+
+class RoundEtagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(self.user)
+        self.round = Round.objects.create(date="2026-01-01", is_active=True)
+        self.customer = Customer.objects.create(name="Anna")
+        self.product = Product.objects.create(name="Rinderhack", sell_price=Decimal("10"), buy_price=Decimal("7"))
+        self.order = Order.objects.create(customer=self.customer, round=self.round)
+        self.url = reverse("round_dashboard", args=[self.round.id])
+        # erster Aufruf setzt das CSRF-Cookie (gehört zum ETag)
+        self.client.get(self.url)
+
+    def etag(self):
+        return self.client.get(self.url)["ETag"]
+
+    def test_unchanged_round_answers_304(self):
+        etag = self.etag()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Session, Benutzer, Version
+        self.assertLessEqual(len(queries.captured_queries), 3)
+
+    def test_changes_invalidate_etag(self):
+        changes = [
+            lambda: OrderItem.objects.create(order=self.order, product=self.product, quantity=Decimal("1")),
+            lambda: Customer.objects.filter(pk=self.customer.pk).get().save(),
+            lambda: Product.objects.filter(pk=self.product.pk).get().save(),
+            lambda: self.client.post(reverse("round_mark_all_paid", args=[self.round.id])),
+        ]
+        for change in changes:
+            etag = self.etag()
+            change()
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class OrderCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.round = Round.objects.create(date="2026-01-01", is_active=True)
+        product = Product.objects.create(name="Rinderhack", sell_price=Decimal("10"), buy_price=Decimal("7"))
+        self.items = []
+        for name in ["Anna", "Ben", "Clara"]:
+            order = Order.objects.create(customer=Customer.objects.create(name=name), round=self.round)
+            self.items.append(OrderItem.objects.create(order=order, product=product, quantity=Decimal("1")))
+        self.url = reverse("round_dashboard", args=[self.round.id])
+
+    def item_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            html = self.client.get(self.url).content.decode()
+        return html, [q["sql"] for q in queries.captured_queries if 'FROM "core_orderitem"' in q["sql"]]
+
+    def test_only_changed_card_is_rerendered(self):
+        self.item_queries()
+        _, queries = self.item_queries()
+        self.assertEqual(queries, [])
+
+        item = self.items[1]
+        item.quantity = Decimal("4")
+        item.save()
+        html, queries = self.item_queries()
+        self.assertIn("4,00", html)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f"IN ({item.order_id})", queries[0])
+
+    def test_customer_rename_invalidates_card(self):
+        self.item_queries()
+        customer = self.items[0].order.customer
+        customer.name = "Anna B."
+        customer.save()
+        html, _ = self.item_queries()
+        self.assertIn("Anna B.", html)
+
+
+class BroadcasterTests(SimpleTestCase):
+    def test_publish_from_worker_thread(self):
+        async def listen():
+            queue = events.subscribe(7)
+            try:
+                thread = threading.Thread(target=events.publish, args=(7, "order", 3))
+                thread.start()
+                thread.join()
+                return await asyncio.wait_for(queue.get(), 1)
+            finally:
+                events.unsubscribe(7, queue)
+
+        self.assertEqual(asyncio.run(listen()), ("order", 3))
+        self.assertNotIn(7, events._listeners)
+
+    def test_full_queue_collapses_to_reload(self):
+        async def listen():
+            queue = events.subscribe(7)
+            try:
+                for order_id in range(events.QUEUE_SIZE + 1):
+                    events.publish(7, "order", order_id)
+                await asyncio.sleep(0)
+                return events.drain(queue)
+            finally:
+                events.unsubscribe(7, queue)
+
+        self.assertEqual(asyncio.run(listen()), [("reload", None)])
+
+
+class RoundEventsViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("chef", password="pw")
+        self.round = Round.objects.create(date="2026-01-01", is_active=True)
+        product = Product.objects.create(name="Rinderhack", sell_price=Decimal("10"), buy_price=Decimal("7"))
+        self.order = Order.objects.create(customer=Customer.objects.create(name="Anna"), round=self.round)
+        OrderItem.objects.create(order=self.order, product=product, quantity=Decimal("1"))
+        self.url = reverse("round_events", args=[self.round.id])
+
+    def test_wsgi_answers_no_content(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn(self.round.id, events._listeners)
+
+    async def test_asgi_streams_events(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        stream = response.streaming_content
+        try:
+            self.assertEqual(await anext(stream), b"retry: 3000\n: verbunden\n\n")
+            self.assertIn(self.round.id, events._listeners)
+            events.publish(self.round.id, "order", self.order.id)
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+            self.assertTrue(chunk.startswith("event: order\n"))
+            self.assertEqual(json.loads(chunk.split("data: ", 1)[1])["id"], self.order.id)
+            self.assertTrue((await anext(stream)).decode().startswith("event: totals\n"))
+        finally:
+            await stream.aclose()
+            # der Server bricht den Stream beim Trennen ab, hier bleibt der Zuhörer sonst hängen
+            events._listeners.pop(self.round.id, None)
+
+
+class ArchiveTests(TestCase):
+    databases = {"default", ARCHIVE_DB}
+
+    def setUp(self):
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.round = Round.objects.create(date="2025-01-01", travel_km=Decimal("20"))
+        self.customer = Customer.objects.create(name="Bert")
+        product = Product.objects.create(name="Gulasch", sell_price=Decimal("20"), buy_price=Decimal("15"))
+        order = Order.objects.create(
+            customer=self.customer, round=self.round, comment="ohne Knochen", paid=True, picked_up=True
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=Decimal("2"))
+
+    def test_closed_rounds_only(self):
+        Round.objects.create(date="2025-01-08", is_active=True)
+        open_round = Round.objects.create(date="2025-01-15")
+        Order.objects.create(customer=self.customer, round=open_round)
+        self.assertEqual(list(archive.closed_rounds("2025-06-01")), [self.round])
+
+    def test_archived_round_is_read_only_viewable(self):
+        archive.archive_round(self.round.id)
+        self.assertFalse(Round.objects.filter(pk=self.round.pk).exists())
+        self.assertEqual(search.search("Knochen", "order"), [] if search.fts_available() else None)
+
+        response = self.client.get(reverse("round_dashboard", args=[self.round.id]))
+        self.assertContains(response, "Bert")
+        self.assertContains(response, "Archivierte Runde")
+        self.assertContains(self.client.get(reverse("shopping_list", args=[self.round.id])), "Gulasch")
+        self.assertEqual(self.client.get(reverse("quick_order", args=[self.round.id])).status_code, 404)
+
+    def test_restore_round(self):
+        archive.archive_round(self.round.id)
+        self.customer.name = "Bert Neu"
+        self.customer.save()
+
+        self.client.post(reverse("round_restore", args=[self.round.id]))
+        self.assertFalse(Round.objects.using(ARCHIVE_DB).filter(pk=self.round.pk).exists())
+        summary = RoundSummary.objects.get(round_id=self.round.id)
+        self.assertEqual((summary.order_count, summary.revenue), (1, Decimal("40")))
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).name, "Bert Neu")
+
+    def history(self):
+        return (
+            list(Customer.objects.values_list("pk", "balance")),
+            list(LedgerEntry.objects.values_list("pk", "kind", "amount")),
+            list(SalesFact.objects.values_list("round_id", "customer_id", "quantity", "revenue")),
+        )
+
+    def test_archiving_keeps_ledger_and_facts(self):
+        analytics.refresh_stale()
+        before = self.history()
+        self.assertTrue(before[1])
+
+        with patch.object(events, "order_removed") as removed, patch.object(events, "order_changed") as changed:
+            archive.archive_round(self.round.id)
+        self.assertEqual(self.history(), before)
+        removed.assert_not_called()
+        changed.assert_not_called()
+
+    def test_archive_and_restore_keep_balances(self):
+        analytics.refresh_stale()
+        before = self.history()
+        archive.archive_round(self.round.id)
+        archive.restore_round(self.round.id)
+        self.assertEqual(self.history(), before)
+
+    def test_sales_facts_survive_archiving(self):
+        archive.archive_round(self.round.id)
+        fact = SalesFact.objects.get(round_id=self.round.id)
+        self.assertEqual((fact.quantity, fact.revenue), (Decimal("2"), Decimal("40")))
+
+        response = self.client.get(reverse("analytics_customers") + "?von=2025-01-01")
+        self.assertContains(response, "Bert")
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.round = Round.objects.create(date="2026-02-01", is_active=True)
+        self.customer = Customer.objects.create(name="Clara")
+        self.product = Product.objects.create(name="Leber", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        self.order = Order.objects.create(customer=self.customer, round=self.round)
+        self.item = OrderItem.objects.create(order=self.order, product=self.product, quantity=Decimal("3"))
+
+    def test_refresh_only_stale_rounds(self):
+        self.assertEqual(analytics.refresh_stale(), 1)
+        self.assertEqual(analytics.refresh_stale(), 0)
+
+        self.item.quantity = Decimal("5")
+        self.item.save()
+        self.assertEqual(analytics.refresh_stale(), 1)
+        row = analytics.product_stats().get()
+        self.assertEqual((row["total_qty"], row["total_revenue"], row["margin"]), (Decimal("5"), Decimal("50"), Decimal("20")))
+
+    def test_rename_keeps_facts_fresh(self):
+        analytics.refresh_stale()
+        self.product.name = "Kalbsleber"
+        self.product.save()
+        self.customer.name = "Clara B."
+        self.customer.save()
+        self.assertEqual(analytics.stale_count(), 0)
+
+        self.round.date = date(2026, 2, 2)
+        self.round.save()
+        self.assertEqual(analytics.stale_count(), 1)
+
+    def test_views_do_not_refresh(self):
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        for name in ["analytics_products", "analytics_customers", "customer_list"]:
+            response = self.client.get(reverse(name))
+            self.assertContains(response, "noch nicht ausgewertet")
+        self.assertFalse(SalesFact.objects.exists())
+
+        response = self.client.post(reverse("analytics_refresh"), {"next": reverse("analytics_customers")})
+        self.assertRedirects(response, reverse("analytics_customers"))
+        self.assertEqual(analytics.stale_count(), 0)
+        self.assertTrue(SalesFact.objects.exists())
+
+    def test_deleted_round_drops_facts(self):
+        analytics.refresh_stale()
+        self.round.delete()
+        self.assertFalse(SalesFact.objects.exists())
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.product = Product.objects.create(name="Steak", sell_price=Decimal("30"), buy_price=Decimal("22"))
+        for i, date in enumerate(["2026-03-01", "2026-03-08", "2026-03-15"], start=1):
+            rnd = Round.objects.create(date=date)
+            for name in ["Anna", "Bert"][:i]:
+                customer, _ = Customer.objects.get_or_create(name=name)
+                order = Order.objects.create(customer=customer, round=rnd)
+                OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("1"))
+
+    def test_forecast_uses_existing_facts(self):
+        # Fakten noch nicht aufgebaut (Cron lief nicht): keine Prognose, kein Nachziehen beim Anlegen
+        self.client.post(reverse("create_round"), {"date": "2026-03-22", "travel_km": "0"})
+        self.assertFalse(ForecastLine.objects.exists())
+        self.assertFalse(SalesFact.objects.exists())
+
+    def test_forecast_built_when_round_is_created(self):
+        analytics.refresh_stale()
+        self.client.post(reverse("create_round"), {"date": "2026-03-22", "travel_km": "0"})
+        line = ForecastLine.objects.get(round__is_active=True, product=self.product)
+        self.assertEqual((line.average, line.trend), (Decimal("1.67"), Decimal("0.50")))
+        self.assertGreater(line.quantity, line.average)
+
+        response = self.client.get(reverse("shopping_list", args=[line.round_id]))
+        self.assertContains(response, "Prognose")
+        self.assertContains(response, f"~{line.quantity}".replace(".", ","))
+
+    def test_no_history_no_forecast(self):
+        rnd = Round.objects.create(date="2026-01-01")
+        self.assertEqual(forecast.build_forecast(rnd), 0)
+
+
+class OrderStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.round = Round.objects.create(date="2026-04-01", is_active=True)
+        self.orders = [
+            Order.objects.create(customer=Customer.objects.create(name=name), round=self.round)
+            for name in ["Anna", "Bert", "Clara"]
+        ]
+
+    def test_toggle_single_order_with_one_update(self):
+        order = self.orders[0]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("order_status", args=[order.id]), {"status": "paid"})
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE") and "core_order" in q["sql"]]
+        self.assertEqual(len(updates), 1)
+
+        data = response.json()
+        self.assertEqual((data["changed"], data["orders"][0]["paid"]), (1, True))
+        self.assertIn("Bezahlt", data["orders"][0]["html"])
+        self.assertEqual(RoundSummary.objects.get(round=self.round).paid_count, 1)
+
+        self.client.post(reverse("order_status", args=[order.id]), {"status": "paid", "value": "0"})
+        self.assertEqual(RoundSummary.objects.get(round=self.round).paid_count, 0)
+
+    def test_fallback_needs_post(self):
+        order = self.orders[0]
+        for name in ["mark_paid", "mark_picked"]:
+            self.assertEqual(self.client.get(reverse(name, args=[order.id])).status_code, 405)
+        order.refresh_from_db()
+        self.assertEqual((order.paid, order.picked_up), (False, False))
+
+        response = self.client.post(reverse("mark_paid", args=[order.id]))
+        self.assertRedirects(response, reverse("round_dashboard", args=[self.round.id]))
+        self.client.post(reverse("mark_picked", args=[order.id]))
+        order.refresh_from_db()
+        self.assertEqual((order.paid, order.picked_up), (True, True))
+
+    def test_fallback_forms_in_dashboard_and_pack_list(self):
+        order = self.orders[0]
+        dashboard = self.client.get(reverse("round_dashboard", args=[self.round.id]))
+        self.assertContains(dashboard, '<form id="statusForm" method="post">')
+        self.assertContains(dashboard, f'formaction="{reverse("mark_paid", args=[order.id])}"')
+        pack_list = self.client.get(reverse("pack_list", args=[self.round.id]))
+        self.assertContains(pack_list, f'<form method="post" action="{reverse("mark_picked", args=[order.id])}">')
+
+    def test_batch_marks_only_selected_orders_of_round(self):
+        other = Order.objects.create(customer=self.orders[0].customer, round=Round.objects.create(date="2026-03-01"))
+        ids = [self.orders[0].id, self.orders[1].id, other.id]
+        response = self.client.post(reverse("round_status", args=[self.round.id]), {"status": "picked", "ids": ids})
+        self.assertEqual(response.json()["changed"], 2)
+        self.assertFalse(Order.objects.get(pk=other.pk).picked_up)
+        self.assertEqual(RoundSummary.objects.get(round=self.round).picked_count, 2)
+
+        # schon abgeholt -> keine Änderung, Zähler bleibt
+        response = self.client.post(reverse("round_status", args=[self.round.id]), {"status": "picked", "ids": ids})
+        self.assertEqual(response.json()["changed"], 0)
+        self.assertEqual(RoundSummary.objects.get(round=self.round).picked_count, 2)
+
+    def test_publishes_only_changed_orders(self):
+        set_status(self.round.id, [self.orders[0].id], "paid")
+        with patch("core.orders.events.order_changed") as order_changed:
+            changed = set_status(self.round.id, [o.id for o in self.orders], "paid")
+        self.assertEqual(changed, 2)
+        published = sorted(call.args[1] for call in order_changed.call_args_list)
+        self.assertEqual(published, [self.orders[1].id, self.orders[2].id])
+
+    def test_rejects_get_and_unknown_status(self):
+        self.assertEqual(self.client.get(reverse("order_status", args=[self.orders[0].id])).status_code, 405)
+        response = self.client.post(reverse("round_status", args=[self.round.id]), {"status": "weg", "ids": [1]})
+        self.assertEqual(response.status_code, 400)
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        self.round = Round.objects.create(date="2026-05-01", is_active=True)
+        self.product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("7"))
+        self.open_order = Order.objects.create(customer=Customer.objects.create(name="Anna"), round=self.round)
+        self.paid_order = Order.objects.create(customer=Customer.objects.create(name="Bert"), round=self.round, paid=True)
+        for order in (self.open_order, self.paid_order):
+            OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("2"))
+
+        self.price_list = pricing.snapshot_price_list("Korrektur", "2026-04-01")
+        PriceListEntry.objects.filter(price_list=self.price_list).update(sell_price=Decimal("12"))
+
+    def test_preview_and_reprice_open_orders(self):
+        rows = pricing.reprice_preview(self.round, self.price_list)
+        self.assertEqual(pricing.preview_totals(rows)["delta_revenue"], Decimal("4"))
+
+        self.assertEqual(pricing.reprice_round(self.round, self.price_list), 1)
+        prices = dict(OrderItem.objects.values_list("order_id", "sell_price"))
+        self.assertEqual(prices, {self.open_order.id: Decimal("12"), self.paid_order.id: Decimal("10")})
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("44"))
+        self.assertEqual(pricing.reprice_preview(self.round, self.price_list), [])
+
+    def test_include_paid_and_product_prices(self):
+        pricing.reprice_round(self.round, self.price_list, include_paid=True)
+        pricing.apply_to_products(self.price_list)
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("48"))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).sell_price, Decimal("12"))
+        self.assertEqual(pricing.price_list_for(self.round.date), self.price_list)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.round = Round.objects.create(date="2026-06-01", is_active=True)
+        self.customer = Customer.objects.create(name="Anna")
+        self.products = [
+            Product.objects.create(name=name, sell_price=Decimal("10"), buy_price=Decimal("6"))
+            for name in ["Hack", "Leber", "Steak"]
+        ]
+
+    def post_bulk(self, name, payload):
+        return self.client.post(reverse(name), json.dumps(payload), content_type="application/json")
+
+    def test_cursor_pagination_and_fields(self):
+        url = reverse("api_list", args=["products"])
+        first = self.client.get(url, {"fields": "name", "limit": 2}).json()
+        self.assertEqual(first["results"], [{"name": "Hack"}, {"name": "Leber"}])
+        second = self.client.get(url, {"fields": "name", "limit": 2, "cursor": first["next"]}).json()
+        self.assertEqual((second["results"], second["next"]), ([{"name": "Steak"}], None))
+        self.assertEqual(self.client.get(url, {"fields": "name,geheim"}).status_code, 400)
+
+    def test_bulk_create_and_update_orders(self):
+        hack, leber, _ = self.products
+        response = self.post_bulk("api_orders_bulk", {"create": [
+            {"round": self.round.id, "customer": self.customer.id, "items": [{"product": hack.id, "quantity": "1,5"}]},
+            {"round": self.round.id, "customer": self.customer.id, "items": [{"product": leber.id, "quantity": 2}]},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        first, second = response.json()["created"]
+        self.assertEqual(OrderItem.objects.get(order_id=first).quantity, Decimal("1.5"))
+
+        response = self.post_bulk("api_orders_bulk", {"update": [
+            {"id": first, "paid": True, "items": [{"product": leber.id, "quantity": "1"}]},
+            {"id": second, "items": [{"product": leber.id, "quantity": "0"}]},
+        ]})
+        self.assertEqual(response.json(), {"created": [], "updated": [first], "deleted": [second]})
+        summary = RoundSummary.objects.get(round=self.round)
+        self.assertEqual((summary.order_count, summary.paid_count, summary.revenue), (1, 1, Decimal("25")))
+
+        orders = self.client.get(reverse("api_list", args=["orders"]), {"fields": "id,items", "round": self.round.id})
+        self.assertEqual(len(orders.json()["results"][0]["items"]), 2)
+
+    def test_paid_and_items_in_one_update_settle_new_total(self):
+        hack, leber, _ = self.products
+        order = create_order(self.round, self.customer, [(hack, Decimal("1"))])
+        response = self.post_bulk("api_orders_bulk", {"update": [
+            {"id": order.id, "paid": True, "items": [{"product": leber.id, "quantity": "2"}]},
+        ]})
+        self.assertEqual(response.json()["updated"], [order.id])
+        self.assertEqual(ledger.open_amount(order), 0)
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).balance, 0)
+
+    def test_bulk_repeats_same_order(self):
+        hack, leber, _ = self.products
+        order = create_order(self.round, self.customer, [(hack, Decimal("1"))])
+        response = self.post_bulk("api_orders_bulk", {"update": [
+            {"id": order.id, "items": [{"product": leber.id, "quantity": "1"}]},
+            {"id": order.id, "items": [{"product": leber.id, "quantity": "2"}, {"product": hack.id, "quantity": "3"}]},
+        ]})
+        self.assertEqual(response.json(), {"created": [], "updated": [order.id], "deleted": []})
+        quantities = dict(OrderItem.objects.filter(order=order).values_list("product_id", "quantity"))
+        self.assertEqual(quantities, {hack.id: Decimal("3"), leber.id: Decimal("2")})
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("50"))
+
+        # erst gelöscht, dann geändert: nichts gespeichert
+        response = self.post_bulk("api_orders_bulk", {"update": [
+            {"id": order.id, "items": [{"product": hack.id, "quantity": "0"}, {"product": leber.id, "quantity": "0"}]},
+            {"id": order.id, "paid": True},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], [{"update": 1, "error": "Bestellung wurde im selben Stapel gelöscht"}])
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+
+    def test_bulk_is_all_or_nothing(self):
+        hack = self.products[0].id
+        response = self.post_bulk("api_orders_bulk", {"create": [
+            {"round": self.round.id, "customer": self.customer.id, "items": [{"product": hack, "quantity": "1"}]},
+            {"round": self.round.id, "customer": self.customer.id, "items": [{"product": hack, "quantity": "viel"}]},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], [
+            {"create": 1, "error": "Ungültige Menge für Hack"},
+            {"create": 1, "error": "Keine Positionen"},
+        ])
+        self.assertFalse(Order.objects.exists())
+
+    def test_bulk_products_parse_prices(self):
+        response = self.post_bulk("api_products_bulk", {
+            "create": [{"name": "Wurst", "sell_price": "3,20", "buy_price": "2"}],
+            "update": [{"id": self.products[0].id, "sell_price": " 11,5 "}],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Product.objects.get(name="Wurst").sell_price, Decimal("3.20"))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).sell_price, Decimal("11.50"))
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api_list", args=["rounds"])).status_code, 401)
+
+
+class OfflineSyncTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("chef", password="pw")
+        self.client.force_login(user)
+        self.round = Round.objects.create(date="2026-07-01", is_active=True)
+        self.customer = Customer.objects.create(name="Anna")
+        self.product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+
+    def sync(self, mutations):
+        return self.client.post(reverse("api_sync"), json.dumps({"mutations": mutations}), content_type="application/json")
+
+    def test_resent_batch_is_applied_once(self):
+        mutations = [
+            {"key": "a1", "type": "create_order", "data": {
+                "round": self.round.id, "customer": self.customer.id,
+                "items": [{"product": self.product.id, "quantity": "1,5"}],
+            }},
+            {"key": "a2", "type": "create_order", "data": {"round": self.round.id, "customer": self.customer.id}},
+        ]
+        first = self.sync(mutations).json()["results"]
+        self.assertEqual([r["status"] for r in first], ["ok", "error"])
+
+        again = self.sync(mutations).json()["results"]
+        self.assertEqual(again[0], {**first[0], "duplicate": True})
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(SyncMutation.objects.count(), 2)
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("15"))
+
+    def test_update_and_missing_key(self):
+        order = Order.objects.create(customer=self.customer, round=self.round)
+        result = self.sync([{"key": "b1", "type": "update_order", "data": {"id": order.id, "paid": True}}])
+        self.assertEqual(result.json()["results"][0]["status"], "ok")
+        self.assertTrue(Order.objects.get(pk=order.pk).paid)
+        self.assertEqual(self.sync([{"type": "update_order", "data": {}}]).status_code, 400)
+
+    def test_customer_list_only_changes_since(self):
+        Customer.objects.filter(pk=self.customer.pk).update(updated_at="2026-01-01T00:00:00Z")
+        bert = Customer.objects.create(name="Bert")
+        url = reverse("api_list", args=["customers"])
+        data = self.client.get(url, {"fields": "id,updated_at", "changed_since": "2026-06-01T00:00:00Z"}).json()
+        self.assertEqual([row["id"] for row in data["results"]], [bert.id])
+
+        # nächster Abgleich ab dem neuesten Stand liefert nur noch den Rand
+        again = self.client.get(url, {"fields": "id", "changed_since": data["results"][0]["updated_at"]}).json()
+        self.assertEqual(again["results"], [{"id": bert.id}])
+        self.assertEqual(self.client.get(url, {"changed_since": "gestern"}).status_code, 400)
+
+    def test_service_worker_caches_only_quick_order(self):
+        content = self.client.get(reverse("service_worker")).content.decode()
+        self.assertIn(reverse("quick_order", args=[0]), content)
+        self.assertNotIn("FALLBACK", content)
+
+    def test_update_after_delete_in_same_batch(self):
+        order = Order.objects.create(customer=self.customer, round=self.round)
+        OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("1"))
+        response = self.sync([
+            {"key": "c1", "type": "update_order", "data": {"id": order.id, "items": [{"product": self.product.id, "quantity": "0"}]}},
+            {"key": "c2", "type": "update_order", "data": {"id": order.id, "paid": True}},
+            {"key": "c3", "type": "create_order", "data": {
+                "round": self.round.id, "customer": self.customer.id,
+                "items": [{"product": self.product.id, "quantity": "2"}],
+            }},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ok"])
+        self.assertTrue(results[0]["deleted"])
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("20"))
+        # Ergebnis gespeichert -> erneutes Senden leert die Warteschlange
+        self.assertEqual(SyncMutation.objects.count(), 3)
+
+
+class PurchasingTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Anna")
+        self.hack = Product.objects.create(
+            name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"), pack_size=Decimal("2.5")
+        )
+        self.leber = Product.objects.create(name="Leber", sell_price=Decimal("8"), buy_price=Decimal("5"))
+        self.rounds = [Round.objects.create(date=f"2026-09-0{i}") for i in range(1, 5)]
+        for i, rnd in enumerate(self.rounds, start=1):
+            order = Order.objects.create(customer=self.customer, round=rnd)
+            OrderItem.objects.create(order=order, product=self.hack, quantity=Decimal(i))
+        OrderItem.objects.create(order=order, product=self.leber, quantity=Decimal("0.5"))
+
+    def test_one_query_for_any_number_of_rounds(self):
+        with self.assertNumQueries(1):
+            rows = purchasing.consolidated(self.rounds)
+        hack, leber = rows
+        self.assertEqual(hack["per_round"], [1, 2, 3, 4])
+        self.assertEqual((hack["total"], hack["packs"], hack["buy_qty"]), (10, 4, Decimal("10.00")))
+        self.assertEqual((leber["per_round"], leber["packs"], leber["buy_qty"]), ([0, 0, 0, Decimal("0.5")], None, Decimal("0.5")))
+
+    def test_pack_rounding_and_csv(self):
+        self.assertEqual(purchasing.pack_quantity(Decimal("3"), Decimal("2.5")), (2, Decimal("5.0")))
+
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        response = self.client.get(reverse("export_purchasing"), {"runde": [self.rounds[0].id, self.rounds[1].id]})
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("Hack;kg;1,00;2,00;3,00;2,50;2;5,00", content)
+
+
+class OrderAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.admin)
+        self.customer = Customer.objects.create(name="Anna")
+        self.product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+
+    def add_round(self, day):
+        rnd = Round.objects.create(date=f"2026-09-{day:02d}")
+        order = Order.objects.create(customer=self.customer, round=rnd)
+        OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("2"))
+
+    def test_changelist_queries_do_not_grow_with_rounds(self):
+        self.add_round(1)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("admin:core_order_changelist"))
+        for day in range(2, 12):
+            self.add_round(day)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse("admin:core_order_changelist"))
+        self.assertEqual(len(large), len(small))
+        self.assertContains(response, "20.00 €", count=11)
+        self.assertContains(response, "round__date__")
+
+    def test_count_stays_exact_after_deletes_and_is_capped(self):
+        for day in range(1, 6):
+            self.add_round(day)
+        Order.objects.order_by("-id").first().delete()
+        Order.objects.order_by("id").first().delete()
+        self.assertEqual(ApproximateCountPaginator(Order.objects.order_by("id"), 2).count, 3)
+        with patch.object(ApproximateCountPaginator, "COUNT_LIMIT", 2):
+            self.assertEqual(ApproximateCountPaginator(Order.objects.order_by("id"), 2).count, 2)
+
+    def test_order_added_as_paid_is_settled(self):
+        rnd = Round.objects.create(date="2026-09-01")
+        prefix = "items"
+        response = self.client.post(reverse("admin:core_order_add"), {
+            "customer": self.customer.id, "round": rnd.id, "source": "call", "comment": "", "paid": "on",
+            f"{prefix}-TOTAL_FORMS": "1", f"{prefix}-INITIAL_FORMS": "0",
+            f"{prefix}-0-product": self.product.id, f"{prefix}-0-quantity": "3",
+            f"{prefix}-0-sell_price": "10", f"{prefix}-0-buy_price": "6",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(OrderItem.objects.get().quantity, Decimal("3"))
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).balance, 0)
+
+    def test_order_form_uses_autocomplete(self):
+        self.add_round(1)
+        Round.objects.create(date="2026-09-02")
+        order = Order.objects.get()
+        response = self.client.get(reverse("admin:core_order_change", args=[order.id]))
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "Round 2026-09-02")
+
+
+class CustomerListTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        self.anna = Customer.objects.create(name="Anna")
+        self.bernd = Customer.objects.create(name="Bernd")
+        for i in range(3):
+            Customer.objects.create(name=f"Kunde {i}")
+        for day, paid in ((1, True), (8, False)):
+            rnd = Round.objects.create(date=f"2026-09-{day:02d}")
+            order = Order.objects.create(customer=self.bernd, round=rnd)
+            OrderItem.objects.create(order=order, product=self.product, quantity=Decimal("2"))
+            if paid:
+                set_status(rnd.id, [order.id], "paid")
+        analytics.refresh_stale()
+
+    def test_activity_columns(self):
+        bernd = Customer.objects.get(pk=self.bernd.pk)
+        self.assertEqual(bernd.last_order, date(2026, 9, 8))
+        self.assertEqual(bernd.round_count, 2)
+        self.assertEqual(bernd.revenue, Decimal("40"))
+        self.assertEqual(bernd.balance, Decimal("20"))
+        anna = Customer.objects.get(pk=self.anna.pk)
+        self.assertEqual((anna.last_order, anna.round_count, anna.balance), (analytics.NEVER, 0, 0))
+
+    def test_activity_as_of_last_refresh(self):
+        rnd = Round.objects.create(date="2026-09-15")
+        create_order(rnd, self.anna, [(self.product, Decimal("1"))])
+        # Kunde speichern schreibt die Kennzahlen nicht zurück
+        Customer.objects.get(pk=self.anna.pk).save()
+        self.assertEqual(Customer.objects.get(pk=self.anna.pk).round_count, 0)
+        self.assertContains(self.client.get(reverse("customer_list")), "Stand der letzten Auswertung")
+
+        analytics.refresh_stale()
+        anna = Customer.objects.get(pk=self.anna.pk)
+        self.assertEqual((anna.last_order, anna.round_count, anna.revenue), (date(2026, 9, 15), 1, Decimal("10")))
+
+        rnd.delete()
+        self.assertEqual(Customer.objects.get(pk=self.anna.pk).last_order, analytics.NEVER)
+
+    def test_sort_by_activity(self):
+        Customer.objects.filter(pk=self.anna.pk).update(revenue=Decimal("5"), last_order="2026-01-01", round_count=1)
+        for sort, expected in [("umsatz", ["Bernd", "Anna"]), ("letzte", ["Bernd", "Anna"]), ("runden", ["Bernd", "Anna"])]:
+            with patch("core.views.CUSTOMER_PAGE_SIZE", 2):
+                response = self.client.get(reverse("customer_list"), {"sort": sort})
+                self.assertEqual([c.name for c in response.context["customers"]], expected)
+                response = self.client.get(reverse("customer_list"), {"sort": sort, "after": response.context["next_cursor"]})
+                self.assertEqual([c.name for c in response.context["customers"]], ["Kunde 0", "Kunde 1"])
+
+    def test_pages_in_one_query_and_sorts(self):
+        with patch("core.views.CUSTOMER_PAGE_SIZE", 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("customer_list"), {"sort": "offen"})
+            customer_queries = [q for q in queries if "core_customer" in q["sql"]]
+            self.assertEqual(len(customer_queries), 1)
+            # nur Kunden mit Saldo
+            self.assertEqual([c.name for c in response.context["customers"]], ["Bernd"])
+            self.assertIsNone(response.context["next_cursor"])
+
+            seen = []
+            cursor = None
+            while True:
+                params = {"sort": "name"}
+                if cursor:
+                    params["after"] = cursor
+                response = self.client.get(reverse("customer_list"), params)
+                seen += [c.name for c in response.context["customers"]]
+                cursor = response.context["next_cursor"]
+                if not cursor:
+                    break
+        self.assertEqual(seen, ["Anna", "Bernd", "Kunde 0", "Kunde 1", "Kunde 2"])
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.customer = Customer.objects.create(name="Anna")
+        self.round = Round.objects.create(date="2026-10-01", is_active=True)
+        self.hack = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        self.order = create_order(self.round, self.customer, [(self.hack, Decimal("2"))])
+
+    def balance(self):
+        balance = Customer.objects.get(pk=self.customer.pk).balance
+        entries = LedgerEntry.objects.filter(customer=self.customer).aggregate(total=Sum("amount"))["total"]
+        self.assertEqual(balance, entries or 0)
+        return balance
+
+    def test_order_changes_are_charged(self):
+        self.assertEqual(self.balance(), Decimal("20"))
+        items = {item.product_id: item for item in self.order.items.all()}
+        update_order(self.order, items, {self.hack.id: (self.hack, Decimal("3"))})
+        self.assertEqual(self.balance(), Decimal("30"))
+
+        item = OrderItem.objects.get(order=self.order)
+        item.quantity = Decimal("1")
+        item.save()
+        self.assertEqual(self.balance(), Decimal("10"))
+
+        self.order.delete()
+        self.assertEqual(self.balance(), 0)
+
+    def test_paid_settles_and_partial_payments_stay(self):
+        self.client.post(reverse("customer_ledger", args=[self.customer.id]), {"amount": "5", "order": self.order.id})
+        self.assertEqual(self.balance(), Decimal("15"))
+        self.assertFalse(Order.objects.get(pk=self.order.pk).paid)
+
+        self.client.post(reverse("order_status", args=[self.order.id]), {"status": "paid"})
+        self.assertEqual(self.balance(), 0)
+        # zurücknehmen storniert nur die Ausbuchung, die Teilzahlung bleibt
+        self.client.post(reverse("order_status", args=[self.order.id]), {"status": "paid", "value": "0"})
+        self.assertEqual(self.balance(), Decimal("15"))
+
+        self.client.post(reverse("customer_ledger", args=[self.customer.id]), {"amount": "15", "order": self.order.id})
+        self.assertEqual(self.balance(), 0)
+        self.assertTrue(Order.objects.get(pk=self.order.pk).paid)
+
+    def paid_order(self):
+        order = create_order(self.round, Customer.objects.create(name="Bernd"), [(self.hack, Decimal("3"))])
+        set_status(self.round.id, [order.id], "paid")
+        self.customer = order.customer
+        self.assertEqual(self.balance(), 0)
+        return order
+
+    def test_editing_paid_order_credits_and_charges_difference(self):
+        order = self.paid_order()
+        item = OrderItem.objects.get(order=order)
+        item.quantity = Decimal("1")
+        item.save()
+        self.assertEqual(self.balance(), Decimal("-20"))
+        # wieder auf 30: ausgeglichen, nichts doppelt gutgeschrieben
+        update_order(order, {item.product_id: item}, {self.hack.id: (self.hack, Decimal("3"))})
+        self.assertEqual(self.balance(), 0)
+        self.assertEqual(ledger.open_amount(order), 0)
+
+    def test_deleting_paid_order_credits_payment(self):
+        order = self.paid_order()
+        item = OrderItem.objects.get(order=order)
+        item.quantity = Decimal("1")
+        item.save()
+        order.delete()
+        # wie beim Ändern: bezahlte 30 stehen als Guthaben
+        self.assertEqual(self.balance(), Decimal("-30"))
+
+    def test_deleting_round_cancels_each_order_once(self):
+        paid = self.paid_order()
+        self.round.delete()
+        cancels = LedgerEntry.objects.exclude(kind=LedgerEntry.Kind.SETTLED).filter(amount__lt=0)
+        self.assertEqual(
+            sorted(cancels.values_list("order_id", "note", "amount")),
+            sorted([(self.order.id, "Runde gelöscht", Decimal("-20")), (paid.id, "Runde gelöscht", Decimal("-30"))]),
+        )
+        # bezahlte 30 bleiben Guthaben, offene 20 sind weg
+        self.assertEqual(self.balance(), Decimal("-30"))
+        self.customer = self.order.customer
+        self.assertEqual(self.balance(), 0)
+        self.assertFalse(signals._marks.deleting_rounds)
+
+    def test_ledger_rolls_back_with_the_order_change(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            OrderItem.objects.create(order=self.order, product=self.hack, quantity=Decimal("1"))
+            raise RuntimeError
+        self.assertEqual(self.balance(), Decimal("20"))
+
+    def test_customer_save_keeps_balance(self):
+        stale = Customer.objects.get(pk=self.customer.pk)
+        ledger.record_payment(self.customer, Decimal("20"))
+        stale.name = "Anna B."
+        stale.save()
+        self.assertEqual(self.balance(), 0)
+
+    def test_open_balances_reads_stored_balance(self):
+        Customer.objects.create(name="Bernd")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("open_balances"))
+        self.assertFalse([q for q in queries if "core_ledgerentry" in q["sql"] or "core_orderitem" in q["sql"]])
+        self.assertEqual([c.name for c in response.context["customers"]], ["Anna"])
+        self.assertEqual(response.context["total"], Decimal("20"))
+
+
+class RoundSummaryMaintenanceTests(TestCase):
+    """Inkrementell gepflegte Rundensumme muss immer einer Neuberechnung entsprechen."""
+
+    def setUp(self):
+        self.round = Round.objects.create(date="2026-05-01")
+        self.anna = Customer.objects.create(name="Anna")
+        self.hack = Product.objects.create(name="Hack", sell_price=Decimal("10.50"), buy_price=Decimal("6.25"))
+        self.leber = Product.objects.create(name="Leber", sell_price=Decimal("8"), buy_price=Decimal("5"))
+
+    def state(self):
+        summary = RoundSummary.objects.get(round=self.round)
+        totals = dict(
+            RoundProductTotal.objects.filter(round=self.round).exclude(quantity=0)
+            .values_list("product_id", "quantity")
+        )
+        return (
+            summary.revenue, summary.cost, summary.order_count, summary.paid_count, summary.picked_count, totals,
+        )
+
+    def assertMatchesRecompute(self):
+        incremental = self.state()
+        rebuild_round_summary(self.round.id)
+        self.assertEqual(incremental, self.state())
+
+    def test_marks_of_other_threads_do_not_apply(self):
+        order = Order.objects.create(customer=self.anna, round=self.round)
+        item = OrderItem.objects.create(order=order, product=self.hack, quantity=Decimal("2"))
+        entered, release = threading.Event(), threading.Event()
+
+        def other_request():
+            with signals.items_accounted(order.pk):
+                entered.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=other_request)
+        thread.start()
+        entered.wait(5)
+        try:
+            item.delete()
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, 0)
+        self.assertMatchesRecompute()
+
+    def test_create_edit_delete_and_price_change(self):
+        order = Order.objects.create(customer=self.anna, round=self.round)
+        item = OrderItem.objects.create(order=order, product=self.hack, quantity=Decimal("1.5"))
+        OrderItem.objects.create(order=order, product=self.leber, quantity=Decimal("2"))
+        self.assertMatchesRecompute()
+
+        item.quantity = Decimal("3")
+        item.save()
+        self.assertMatchesRecompute()
+
+        # Preis am Produkt ändert den Snapshot der Position nicht, eine neue Position schon
+        self.hack.sell_price = Decimal("12")
+        self.hack.save()
+        self.assertMatchesRecompute()
+        item.sell_price = Decimal("12")
+        item.save()
+        self.assertMatchesRecompute()
+
+        order.paid = True
+        order.save()
+        self.assertMatchesRecompute()
+
+        item.delete()
+        self.assertMatchesRecompute()
+
+        order.delete()
+        self.assertMatchesRecompute()
+        self.assertEqual(self.state()[:3], (0, 0, 0))
+
+    def test_moving_an_order_between_rounds(self):
+        other = Round.objects.create(date="2026-05-08")
+        order = Order.objects.create(customer=self.anna, round=self.round)
+        OrderItem.objects.create(order=order, product=self.hack, quantity=Decimal("2"))
+        order.round = other
+        order.save()
+        self.assertMatchesRecompute()
+        self.assertEqual(RoundSummary.objects.get(round=other).revenue, Decimal("21"))
+
+
+
+class OrderEditDiffTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.round = Round.objects.create(date="2026-05-01")
+        self.hack = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        self.leber = Product.objects.create(name="Leber", sell_price=Decimal("8"), buy_price=Decimal("5"))
+        self.wurst = Product.objects.create(name="Wurst", sell_price=Decimal("4"), buy_price=Decimal("2"))
+        self.order = create_order(
+            self.round, Customer.objects.create(name="Anna"),
+            [(self.hack, Decimal("1")), (self.leber, Decimal("2"))], comment="mager",
+        )
+
+    def edit(self, quantities):
+        """Bearbeiten-Formular absenden, gibt die schreibenden Queries auf Positionen zurück."""
+        data = {"comment": "mager", "source": self.order.source}
+        data.update({f"qty_{product.id}": qty for product, qty in quantities})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("order_edit", args=[self.order.id]), data)
+        return [q["sql"] for q in queries if '"core_orderitem"' in q["sql"] and not q["sql"].startswith("SELECT")]
+
+    def lines(self):
+        return {item.product_id: (item.pk, item.quantity) for item in self.order.items.all()}
+
+    def test_only_changed_lines_are_written(self):
+        before = self.lines()
+        writes = self.edit([(self.hack, "1"), (self.leber, "3"), (self.wurst, "")])
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith("UPDATE"))
+        self.assertEqual(self.lines(), {**before, self.leber.id: (before[self.leber.id][0], Decimal("3"))})
+
+    def test_add_and_remove_lines(self):
+        before = self.lines()
+        writes = self.edit([(self.hack, "0"), (self.leber, "2"), (self.wurst, "1,5")])
+        self.assertEqual([sql.split()[0] for sql in writes], ["INSERT", "DELETE"])
+        lines = self.lines()
+        self.assertEqual(set(lines), {self.leber.id, self.wurst.id})
+        self.assertEqual(lines[self.leber.id], before[self.leber.id])
+
+        summary = RoundSummary.objects.get(round=self.round)
+        self.assertEqual(summary.revenue, Decimal("22"))
+        self.assertEqual(
+            dict(RoundProductTotal.objects.filter(round=self.round).exclude(quantity=0).values_list("product_id", "quantity")),
+            {self.leber.id: Decimal("2"), self.wurst.id: Decimal("1.5")},
+        )
+
+    def test_unchanged_form_writes_nothing(self):
+        self.assertEqual(self.edit([(self.hack, "1"), (self.leber, "2"), (self.wurst, "")]), [])
+
+    def test_removing_all_lines_deletes_order(self):
+        self.edit([(self.hack, "0"), (self.leber, "0")])
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+        self.assertEqual(RoundSummary.objects.get(round=self.round).order_count, 0)
+
+
+class QuickOrderTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.round = Round.objects.create(date="2026-05-01", is_active=True)
+        self.customer = Customer.objects.create(name="Anna")
+        self.hack = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        self.leber = Product.objects.create(name="Leber", sell_price=Decimal("8"), buy_price=Decimal("5"))
+        self.url = reverse("quick_order", args=[self.round.id])
+
+    def test_lines_are_inserted_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {
+                "customer": self.customer.id, "source": "call",
+                f"qty_{self.hack.id}": "1,5", f"qty_{self.leber.id}": "2",
+            })
+        inserts = [q["sql"] for q in queries if q["sql"].startswith('INSERT INTO "core_orderitem"')]
+        self.assertEqual(len(inserts), 1)
+        order = Order.objects.get()
+        self.assertEqual(
+            sorted(order.items.values_list("product__name", "quantity", "sell_price")),
+            [("Hack", Decimal("1.5"), Decimal("10")), ("Leber", Decimal("2"), Decimal("8"))],
+        )
+        self.assertEqual(RoundSummary.objects.get(round=self.round).revenue, Decimal("31"))
+
+    def test_invalid_input_writes_nothing(self):
+        response = self.client.post(self.url, {"customer": self.customer.id, f"qty_{self.hack.id}": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(RoundSummary.objects.get(round=self.round).order_count, 0)
+
+
+class PackListPagingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.round = Round.objects.create(date="2026-05-01", is_active=True)
+        # gleiche Namen: die ID entscheidet, kein Kunde darf doppelt oder gar nicht kommen
+        for name in ["Anna", "Anna", "Bert", "Bert", "Clara", "Dora"]:
+            Order.objects.create(customer=Customer.objects.create(name=name), round=self.round)
+
+    def collect(self, order_filter=""):
+        seen, cursor = [], None
+        while True:
+            orders, cursor = _order_page(self.round, order_filter, cursor)
+            seen += [order.id for order in orders]
+            if cursor is None:
+                return seen
+
+    def expected(self, **filters):
+        return list(
+            Order.objects.filter(round=self.round, **filters).order_by("customer__name", "id").values_list("id", flat=True)
+        )
+
+    def test_every_order_once_across_page_boundaries(self):
+        for size in (1, 2, 3, 6, 7):
+            with patch("core.views.PACK_PAGE_SIZE", size):
+                self.assertEqual(self.collect(), self.expected(), size)
+
+    def test_last_full_page_has_no_cursor(self):
+        with patch("core.views.PACK_PAGE_SIZE", 3):
+            _, cursor = _order_page(self.round)
+            orders, cursor = _order_page(self.round, cursor=cursor)
+        self.assertEqual(len(orders), 3)
+        self.assertIsNone(cursor)
+
+    def test_filter_is_kept_while_paging(self):
+        Order.objects.filter(customer__name="Bert").update(paid=True)
+        with patch("core.views.PACK_PAGE_SIZE", 2):
+            self.assertEqual(self.collect("unbezahlt"), self.expected(paid=False))
+            response = self.client.get(reverse("round_dashboard", args=[self.round.id]), {"filter": "unbezahlt"})
+        self.assertContains(response, "filter=unbezahlt")
+
+    def test_broken_cursor_starts_over(self):
+        for cursor in ("kaputt", encode_cursor(["Anna"])):
+            orders, _ = _order_page(self.round, cursor=cursor)
+            self.assertEqual([order.id for order in orders], self.expected()[:len(orders)])
+
+
+class RoundListPagingTests(TestCase):
+    databases = {"default", ARCHIVE_DB}
+
+    def setUp(self):
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        # mehrere Runden am selben Tag, die aktive steht immer vorne
+        for day in (3, 3, 2, 2, 1):
+            Round.objects.create(date=f"2026-05-0{day}")
+        self.active = Round.objects.create(date="2026-04-01", is_active=True)
+        customer = Customer.objects.create(name="Anna")
+        product = Product.objects.create(name="Hack", sell_price=Decimal("10"), buy_price=Decimal("6"))
+        order = Order.objects.create(customer=customer, round=self.active)
+        OrderItem.objects.create(order=order, product=product, quantity=Decimal("2"))
+
+    def pages(self, size):
+        pages, cursor = [], None
+        with patch("core.views.ROUND_PAGE_SIZE", size):
+            while True:
+                response = self.client.get(reverse("round_list"), {"after": cursor} if cursor else {})
+                pages.append(response.context["rounds"])
+                cursor = response.context["next_cursor"]
+                if cursor is None:
+                    return pages
+
+    def test_every_round_once_in_order(self):
+        expected = list(Round.objects.order_by("-is_active", "-date", "id").values_list("id", flat=True))
+        self.assertEqual(expected[0], self.active.id)
+        for size in (1, 2, 4, 6):
+            pages = self.pages(size)
+            self.assertEqual([rnd.id for page in pages for rnd in page], expected, size)
+            self.assertTrue(all(len(page) == size for page in pages[:-1]))
+            self.assertTrue(pages[-1])
+
+    def test_stats_in_one_query_per_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("round_list"))
+        self.assertEqual(len([q for q in queries if '"core_round"' in q["sql"]]), 1)
+        active = response.context["rounds"][0]
+        self.assertEqual((active.order_count, active.unpaid_count, active.revenue), (1, 1, Decimal("20")))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        if not search.fts_available():
+            self.skipTest("SQLite ohne FTS5")
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+
+    def test_prefix_words_and_diacritics(self):
+        anna = Customer.objects.create(name="Anna Müller", phone="+49 171 2345")
+        Customer.objects.create(name="Annemarie Schulz")
+        self.assertEqual(search.search("mul an", "customer"), [anna.pk])
+        self.assertEqual(search.search("491712", "customer"), [anna.pk])
+        anna.name = "Anna Meier"
+        anna.save()
+        self.assertEqual(search.search("müller", "customer"), [])
+
+    def test_autocomplete_filters_inactive_before_the_limit(self):
+        for i in range(12):
+            Customer.objects.create(name=f"Anna {i}", active=False)
+        active = Customer.objects.create(name="Anna Zett")
+        response = self.client.get(reverse("customer_autocomplete"), {"q": "anna"})
+        self.assertEqual([row["id"] for row in response.json()["results"]], [active.id])
+
+
+@override_settings(PERF_LOG_ENABLED=True)
+class PerfTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(PERF_LOG_FILE=Path(tmp.name) / "perf.jsonl"))
+        self.addCleanup(self.close_log)
+        self.user = User.objects.create_user("chef", password="pw")
+
+    def close_log(self):
+        for handler in list(perf.logger.handlers):
+            perf.logger.removeHandler(handler)
+            handler.close()
+
+    def test_request_writes_record(self):
+        self.client.force_login(self.user)
+        Round.objects.create(date="2026-01-01", is_active=True)
+        self.assertEqual(self.client.get(reverse("home")).status_code, 200)
+        entry = next(e for e in perf.read_entries() if e["view"] == "home")
+        self.assertEqual((entry["method"], entry["status"]), ("GET", 200))
+        self.assertGreater(entry["queries"], 0)
+        self.assertGreater(entry["ms"], 0)
+        self.assertGreater(entry["bytes"], 0)
+
+    def test_perf_page_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("perf")).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("perf")).status_code, 200)
+
+    def test_percentiles_and_view_stats(self):
+        self.assertEqual(perf.percentile([], 50), 0)
+        self.assertEqual(perf.percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(perf.percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(perf.percentile([10, 20], 99), 20)
+
+        def entry(view, ms, queries, slowest=()):
+            return {"view": view, "ms": ms, "queries": queries, "sql_ms": ms / 2, "template_ms": 1,
+                    "bytes": 100, "slowest": [{"ms": q, "sql": f"q{q}"} for q in slowest]}
+
+        stats = perf.view_stats([
+            entry("home", 10, 2, [3]), entry("home", 20, 4, [7]), entry("home", 30, 3),
+            entry("pack_list", 100, 9, [50]),
+        ])
+        self.assertEqual([row["view"] for row in stats], ["pack_list", "home"])
+        home = stats[1]
+        self.assertEqual((home["count"], home["p50"], home["p95"], home["queries_p50"], home["queries_max"]),
+                         (3, 20, 30, 3, 4))
+        self.assertEqual(home["slowest"], {"ms": 7, "sql": "q7"})
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    # eigene Verbindung auf eine Datei im Temp-Verzeichnis, nicht die Testdatenbank
+    databases = {"default"}
+
+    def load_settings(self, profile):
+        spec = importlib.util.spec_from_file_location("profile_settings", settings.BASE_DIR / "meatmanager" / "settings.py")
+        module = importlib.util.module_from_spec(spec)
+        with patch.dict(os.environ, {"MEATMANAGER_DB_PROFILE": profile}):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_default_profile_keeps_django_defaults(self):
+        default = self.load_settings("default").DATABASES["default"]
+        self.assertNotIn("OPTIONS", default)
+        self.assertNotIn("CONN_MAX_AGE", default)
+
+    def test_production_profile_applies_pragmas(self):
+        default = self.load_settings("production").DATABASES["default"]
+        self.assertEqual(default["CONN_MAX_AGE"], 600)
+        self.assertTrue(default["CONN_HEALTH_CHECKS"])
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        handler = ConnectionHandler({"default": {**default, "NAME": Path(tmp.name) / "db.sqlite3"}})
+        conn = handler["default"]
+        self.addCleanup(conn.close)
+        with conn.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.transaction_mode, "IMMEDIATE")
+        self.assertEqual(conn.settings_dict["CONN_MAX_AGE"], 600)
+
+
+class BenchmarkCommandTests(TestCase):
+    databases = {"default", ARCHIVE_DB}
+
+    def test_seed_data(self):
+        call_command("seed_data", customers=5, products=3, rounds=2, orders_per_round=4,
+                     items_per_order=2, stdout=io.StringIO())
+        self.assertEqual((Customer.objects.count(), Product.objects.count(), Round.objects.count()), (5, 3, 2))
+        self.assertEqual(Order.objects.count(), 8)
+        self.assertEqual(RoundSummary.objects.aggregate(n=Sum("order_count"))["n"], 8)
+
+    def test_benchmark_views_measures_reads_only(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        baseline = Path(tmp.name) / "baseline.json"
+        small = {"customers": 6, "products": 3, "rounds": 2, "orders_per_round": 4, "items_per_order": 2}
+        # läuft schon auf der Testdatenbank, keine eigene anlegen
+        def order_states():
+            return sorted(Order.objects.values_list("customer__name", "round__date", "paid", "picked_up"))
+
+        with patch.dict(benchmark_views.BASE, small), \
+                patch.object(benchmark_views, "isolated_databases", nullcontext):
+            out = io.StringIO()
+            call_command("benchmark_views", scales="1", repeat=1, baseline=str(baseline),
+                         save_baseline=True, stdout=out)
+            measured = order_states()
+            benchmark_views.Command(stdout=io.StringIO()).seed(1)
+            # gemessen wurde nur lesend: Stand wie frisch erzeugt
+            self.assertEqual(measured, order_states())
+
+        results = json.loads(baseline.read_text(encoding="utf-8"))["results"]["1"]
+        self.assertIn("api_list[orders]", results)
+        self.assertIn("round_dashboard", results)
+        self.assertFalse(set(benchmark_views.SKIP) & set(results))
+        self.assertFalse([name for name, r in results.items() if r["status"] == 405])
+        self.assertIn("übersprungen: nur POST, ändert den Bezahlstatus", out.getvalue())
+
+
+@override_settings(KM_RATE=Decimal("0.30"))
+class CsvExportTests(TestCase):
+    databases = {"default", ARCHIVE_DB}
+
+    def setUp(self):
+        User.objects.create_user("chef", password="pw")
+        self.client.login(username="chef", password="pw")
+        self.round = Round.objects.create(date="2026-05-01", travel_km=Decimal("10"))
+        anna = Customer.objects.create(name="Anna; Ärger", phone="0171")
+        self.hack = Product.objects.create(name="Hack", sell_price=Decimal("10.50"), buy_price=Decimal("6"))
+        order = Order.objects.create(customer=anna, round=self.round, comment='sagt "bitte mager"', paid=True)
+        OrderItem.objects.create(order=order, product=self.hack, quantity=Decimal("1.5"))
+        self.order = order
+
+    def rows(self, response):
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        content = b"".join(response.streaming_content).decode()
+        self.assertTrue(content.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(content[1:]), delimiter=";"))
+
+    def test_round_lines(self):
+        rows = self.rows(self.client.get(reverse("export_round_lines", args=[self.round.id])))
+        self.assertEqual(rows[0][:3], ["Kunde", "Telefon", "Bestellung"])
+        self.assertEqual(rows[1], [
+            "Anna; Ärger", "0171", str(self.order.id), "call", "ja", "nein", "Hack", "kg",
+            "1,50", "10,50", "6,00", "15,75", "9,00", 'sagt "bitte mager"',
+        ])
+        self.assertEqual(len(rows), 2)
+
+    def test_shopping_list_and_profit(self):
+        rows = self.rows(self.client.get(reverse("export_shopping_list", args=[self.round.id])))
+        self.assertEqual(rows, [["Produkt", "Einheit", "Menge"], ["Hack", "kg", "1,50"]])
+
+        rows = self.rows(self.client.get(reverse("export_profit"), {"von": "2026-01-01", "bis": "2026-12-31"}))
+        self.assertEqual(rows[1], ["2026-05-01", "1", "1", "15,75", "9,00", "10,00", "3,00", "3,75"])
+        self.assertEqual(len(rows), 2)
@@ -1,29 +1,56 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 urlpatterns = [
     path("", views.home, name="home"),
+    path("sw.js", views.service_worker, name="service_worker"),
     path("runden/", views.round_list, name="round_list"),
+    path("runden/archiv/", views.round_archive, name="round_archive"),
     path("runden/<int:round_id>/einkaufsliste/", views.shopping_list, name="shopping_list"),
     path("runden/<int:round_id>/packliste/", views.pack_list, name="pack_list"),
     path("order/<int:order_id>/paid/", views.mark_paid, name="mark_paid"),
     path("order/<int:order_id>/picked/", views.mark_picked, name="mark_picked"),
+    path("order/<int:order_id>/status/", views.order_status, name="order_status"),
     path("runden/<int:round_id>/gewinn/", views.round_profit, name="round_profit"),
     path("runden/<int:round_id>/dashboard/", views.round_dashboard, name="round_dashboard"),
+    path("runden/<int:round_id>/bestellungen/", views.round_orders, name="round_orders"),
+    path("runden/<int:round_id>/live/", views.round_events, name="round_events"),
     path("runden/<int:round_id>/neu/", views.quick_order, name="quick_order"),
     path("runden/<int:round_id>/aktiv/", views.set_active_round, name="set_active_round"),
+    path("runden/<int:round_id>/wiederherstellen/", views.round_restore, name="round_restore"),
     path("runden/neu/", views.create_round, name="create_round"),
     path("kunden/", views.customer_list, name="customer_list"),
     path("kunden/neu/", views.customer_create, name="customer_create"),
+    path("kunden/suche/", views.customer_autocomplete, name="customer_autocomplete"),
     path("kunden/<int:customer_id>/bearbeiten/", views.customer_edit, name="customer_edit"),
+    path("kunden/<int:customer_id>/konto/", views.customer_ledger, name="customer_ledger"),
+    path("kunden/offen/", views.open_balances, name="open_balances"),
     path("produkte/", views.product_list, name="product_list"),
     path("produkte/neu/", views.product_create, name="product_create"),
     path("produkte/<int:product_id>/bearbeiten/", views.product_edit, name="product_edit"),
+    path("produkte/preisliste/", views.price_list_create, name="price_list_create"),
     path("order/<int:order_id>/bearbeiten/", views.order_edit, name="order_edit"),
     path("order/<int:order_id>/loeschen/", views.order_delete, name="order_delete"),
     path("runden/<int:round_id>/alle-bezahlt/", views.round_mark_all_paid, name="round_mark_all_paid"),
     path("runden/<int:round_id>/alle-abgeholt/", views.round_mark_all_picked, name="round_mark_all_picked"),
+    path("runden/<int:round_id>/status/", views.round_status, name="round_status"),
+    path("runden/<int:round_id>/preise/", views.round_reprice, name="round_reprice"),
+    path("runden/<int:round_id>/export/positionen.csv", views.export_round_lines, name="export_round_lines"),
+    path("runden/<int:round_id>/export/einkaufsliste.csv", views.export_shopping_list, name="export_shopping_list"),
+    path("export/gewinn.csv", views.export_profit, name="export_profit"),
+    path("einkauf/", views.purchasing_list, name="purchasing_list"),
+    path("einkauf/sammeleinkauf.csv", views.export_purchasing, name="export_purchasing"),
+    path("suche/", views.search_view, name="search"),
+    path("auswertung/produkte/", views.analytics_products, name="analytics_products"),
+    path("auswertung/produkte/<int:product_id>/", views.analytics_product, name="analytics_product"),
+    path("auswertung/kunden/", views.analytics_customers, name="analytics_customers"),
+    path("auswertung/aktualisieren/", views.analytics_refresh, name="analytics_refresh"),
+    path("perf/", views.perf_view, name="perf"),
+    path("api/sync/", api.sync, name="api_sync"),
+    path("api/orders/bulk/", api.orders_bulk, name="api_orders_bulk"),
+    path("api/products/bulk/", api.products_bulk, name="api_products_bulk"),
+    path("api/<str:resource>/", api.resource_list, name="api_list"),
 
 
 ]
@@ -0,0 +1,15 @@
+from decimal import Decimal, InvalidOperation
+
+
+def parse_decimal(value, default=None):
+    """Liest Eingaben wie "1,5" oder " 2.25 ". Leer/ungültig -> default."""
+    value = (value or "").strip().replace(",", ".")
+    if not value:
+        return default
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return default
+    if not number.is_finite():
+        return default
+    return number
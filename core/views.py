@@ -1,13 +1,36 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Sum, F, DecimalField, ExpressionWrapper
-from django.http import HttpResponseBadRequest
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.db.models import Q
 from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from decimal import Decimal, InvalidOperation
-
-from .models import Round, Customer, Product, Order, OrderItem
+from asgiref.sync import sync_to_async
+from functools import partial
+import asyncio
+import hashlib
+import heapq
+import json
+
+from . import analytics, archive, events, exports, forecast, ledger, perf, pricing, purchasing, search
+from .models import Round, Customer, Product, Order, OrderItem, PriceList, RoundSummary
+from .orders import STATUS_FIELDS, create_order, set_status, update_order
+from .paging import keyset_page
+from .routers import ARCHIVE_DB
+from .summary import all_orders_marked, get_round_summary, round_product_totals
+from .utils import parse_decimal
 
 
 # Helper (KEIN login_required nötig)
@@ -16,16 +39,80 @@ def calc_travel_cost_eur(rnd):
     return (rnd.travel_km or Decimal("0")) * km_rate
 
 
+def service_worker(request):
+    """Service Worker für den Offline-Betrieb; muss unter / ausgeliefert werden (Scope)."""
+    response = render(request, "core/sw.js", {"version": settings.CACHE_VERSION},
+                      content_type="application/javascript")
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
 @login_required
 def home(request):
     active = Round.objects.filter(is_active=True).order_by("-date").first()
     return render(request, "core/home.html", {"active": active})
 
 
+ROUND_PAGE_SIZE = 20
+
+
 @login_required
 def round_list(request):
-    rounds = Round.objects.order_by("-is_active", "-date")
-    return render(request, "core/round_list.html", {"rounds": rounds})
+    rounds, next_cursor = keyset_page(
+        _with_round_stats(Round.objects.all()), ["-is_active", "-date", "id"],
+        request.GET.get("after"), size=ROUND_PAGE_SIZE,
+    )
+    return render(request, "core/round_list.html", {
+        "rounds": rounds,
+        "next_cursor": next_cursor,
+        "has_archive": archive.available(),
+    })
+
+
+@login_required
+def round_archive(request):
+    """Archivierte Runden (nur lesen, einzeln wiederherstellbar)."""
+    if not archive.available():
+        return redirect("round_list")
+    rounds, next_cursor = keyset_page(
+        _with_round_stats(Round.objects.using(ARCHIVE_DB)), ["-date", "id"],
+        request.GET.get("after"), size=ROUND_PAGE_SIZE,
+    )
+    return render(request, "core/round_list.html", {
+        "rounds": rounds,
+        "next_cursor": next_cursor,
+        "archived": True,
+    })
+
+
+@login_required
+def round_restore(request, round_id):
+    if request.method == "POST" and archive.available():
+        if Round.objects.using(ARCHIVE_DB).filter(pk=round_id).exists():
+            archive.restore_round(round_id)
+    return redirect("round_dashboard", round_id=round_id)
+
+
+def _with_round_stats(rounds):
+    km_rate = getattr(settings, "KM_RATE", Decimal("0.30"))
+    money = DecimalField(max_digits=14, decimal_places=2)
+
+    # Kennzahlen kommen aus der Rundensumme -> ein Query pro Seite, kein N+1
+    return rounds.annotate(
+        order_count=Coalesce(F("summary__order_count"), 0),
+        unpaid_count=Coalesce(F("summary__order_count") - F("summary__paid_count"), 0),
+        revenue=Coalesce(F("summary__revenue"), Value(Decimal("0")), output_field=money),
+        profit=ExpressionWrapper(
+            Coalesce(F("summary__revenue") - F("summary__cost"), Value(Decimal("0")), output_field=money)
+            - F("travel_km") * Value(km_rate),
+            output_field=money,
+        ),
+    )
+
+
+def _deactivate_rounds():
+    # Trifft über den Teilindex nur die bisher aktive Runde, nicht alle
+    Round.objects.filter(is_active=True).update(is_active=False)
 
 
 @login_required
@@ -43,8 +130,11 @@ def create_round(request):
         except (InvalidOperation, TypeError):
             travel_km = Decimal("0")
 
-        rnd = Round.objects.create(date=date, travel_km=travel_km, is_active=True)
-        Round.objects.exclude(id=rnd.id).update(is_active=False)
+        with transaction.atomic():
+            _deactivate_rounds()
+            rnd = Round.objects.create(date=date, travel_km=travel_km, is_active=True)
+        # einmalig beim Anlegen, nicht bei jedem Aufruf der Einkaufsliste
+        forecast.build_forecast(rnd)
 
         return redirect("round_dashboard", round_id=rnd.id)
 
@@ -54,34 +144,60 @@ def create_round(request):
 @login_required
 def set_active_round(request, round_id):
     rnd = get_object_or_404(Round, id=round_id)
-    Round.objects.update(is_active=False)
-    rnd.is_active = True
-    rnd.save()
+    if not rnd.is_active:
+        with transaction.atomic():
+            _deactivate_rounds()
+            Round.objects.filter(id=rnd.id).update(is_active=True)
+        # Auswertung nicht hier nachziehen: das macht rebuild_sales_facts --stale (Cron)
+        # oder der Knopf in der Auswertung
     return redirect("round_dashboard", round_id=rnd.id)
 
 
-@login_required
-def shopping_list(request, round_id):
-    rnd = get_object_or_404(Round, id=round_id)
+def _get_round(round_id):
+    """Runde aus der Haupt-DB oder (nur lesend) aus dem Archiv."""
+    rnd = archive.get_round(round_id)
+    if rnd is None:
+        raise Http404("Runde nicht gefunden")
+    return rnd
 
-    items = (
-        OrderItem.objects
-        .filter(order__round=rnd)
-        .values("product__name", "product__unit")
-        .annotate(total_qty=Sum("quantity"))
-        .order_by("product__name")
-    )
 
-    return render(request, "core/shopping_list.html", {"round": rnd, "items": items})
+def _round_etag(request, round_id, *args, **kwargs):
+    """
+    ETag der Rundenseiten: Versionszähler aus RoundSummary (eine Query).
+    Benutzer und CSRF-Cookie gehören dazu, weil beides im HTML steckt.
+    """
+    version = RoundSummary.objects.filter(round_id=round_id).values_list("version", flat=True).first()
+    if version is None:
+        # archivierte Runde ändert sich nicht mehr
+        rnd = archive.get_round(round_id)
+        if rnd is None:
+            return None
+        version = f"archiv{get_round_summary(rnd).version}"
+    csrf = hashlib.md5(request.META.get("CSRF_COOKIE", "").encode()).hexdigest()[:8]
+    return f"r{round_id}-v{version}-u{request.user.pk}-{csrf}"
 
 
 @login_required
+@cache_control(private=True, no_cache=True)  # immer nachfragen, meist 304
+@condition(etag_func=_round_etag)
+def shopping_list(request, round_id):
+    rnd = _get_round(round_id)
+    items = forecast.with_forecast(rnd, round_product_totals(rnd))
+    return render(request, "core/shopping_list.html", {
+        "round": rnd,
+        "items": items,
+        "has_forecast": any(i["forecast"] is not None for i in items),
+    })
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_round_etag)
 def pack_list(request, round_id):
-    rnd = get_object_or_404(Round, id=round_id)
+    rnd = _get_round(round_id)
 
     orders = (
-        Order.objects
-        .filter(round=rnd)
+        rnd.order_set
         .select_related("customer")
         .prefetch_related("items__product")
         .order_by("customer__name")
@@ -91,36 +207,81 @@ def pack_list(request, round_id):
 
 
 @login_required
+@require_POST
 def mark_paid(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    order.paid = True
-    order.save()
-    return redirect("round_dashboard", round_id=order.round.id)
+    # Fallback ohne JavaScript (Formular), sonst order_status per fetch
+    order = get_object_or_404(Order.objects.only("round_id"), id=order_id)
+    set_status(order.round_id, [order.id], "paid")
+    return redirect("round_dashboard", round_id=order.round_id)
 
 
 @login_required
+@require_POST
 def mark_picked(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    order.picked_up = True
-    order.save()
-    return redirect("round_dashboard", round_id=order.round.id)
+    order = get_object_or_404(Order.objects.only("round_id"), id=order_id)
+    set_status(order.round_id, [order.id], "picked")
+    return redirect("round_dashboard", round_id=order.round_id)
+
+
+def _status_from_post(request):
+    status = request.POST.get("status")
+    if status not in STATUS_FIELDS:
+        return None, None
+    return status, request.POST.get("value", "1") != "0"
+
+
+def _status_response(rnd, order_ids, changed):
+    """Neu gerenderte Karten der gewählten Bestellungen und die Summen, zum Ersetzen im Dashboard."""
+    orders = list(Order.objects.filter(round=rnd, id__in=order_ids).select_related("customer"))
+    _prefetch_uncached_items(orders)
+    totals = render_to_string("core/partials/round_totals.html", _round_totals(rnd, get_round_summary(rnd)))
+    return JsonResponse({
+        "changed": changed,
+        "orders": [
+            {"id": o.id, "paid": o.paid, "picked_up": o.picked_up, "html": _render_order_card(rnd, o)}
+            for o in orders
+        ],
+        "totals": totals,
+    })
 
 
 @login_required
-def round_profit(request, round_id):
+@require_POST
+def order_status(request, order_id):
+    """Bezahlt/abgeholt einer Bestellung setzen (status=paid|picked, value=1|0), Antwort als JSON."""
+    status, value = _status_from_post(request)
+    if status is None:
+        return HttpResponseBadRequest("Unbekannter Status")
+    order = get_object_or_404(Order.objects.select_related("round"), id=order_id)
+    changed = set_status(order.round_id, [order.id], status, value)
+    return _status_response(order.round, [order.id], changed)
+
+
+@login_required
+@require_POST
+def round_status(request, round_id):
+    """Wie order_status, aber für mehrere Bestellungen (ids=…&ids=…) in einem UPDATE."""
     rnd = get_object_or_404(Round, id=round_id)
+    status, value = _status_from_post(request)
+    try:
+        order_ids = {int(i) for i in request.POST.getlist("ids")}
+    except ValueError:
+        order_ids = None
+    if status is None or not order_ids:
+        return HttpResponseBadRequest("Status und Bestellungen angeben")
+    changed = set_status(rnd.id, order_ids, status, value)
+    return _status_response(rnd, order_ids, changed)
 
-    totals = (
-        OrderItem.objects
-        .filter(order__round=rnd)
-        .aggregate(
-            revenue=Sum(ExpressionWrapper(F("sell_price") * F("quantity"), output_field=DecimalField())),
-            cost=Sum(ExpressionWrapper(F("buy_price") * F("quantity"), output_field=DecimalField())),
-        )
-    )
 
-    revenue = totals["revenue"] or Decimal("0")
-    cost = totals["cost"] or Decimal("0")
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_round_etag)
+def round_profit(request, round_id):
+    rnd = _get_round(round_id)
+    summary = get_round_summary(rnd)
+
+    revenue = summary.revenue
+    cost = summary.cost
 
     travel = calc_travel_cost_eur(rnd)
     profit = revenue - cost - travel
@@ -135,58 +296,182 @@ def round_profit(request, round_id):
     })
 
 
-@login_required
-def round_dashboard(request, round_id):
-    rnd = get_object_or_404(Round, id=round_id)
+PACK_PAGE_SIZE = 25
 
-    shopping_items = (
-        OrderItem.objects
-        .filter(order__round=rnd)
-        .values("product__name", "product__unit")
-        .annotate(total_qty=Sum("quantity"))
-        .order_by("product__name")
-    )
+ORDER_FILTERS = {
+    "unbezahlt": Q(paid=False),
+    "offen": Q(picked_up=False),
+}
 
-    orders = (
-        Order.objects
-        .filter(round=rnd)
-        .select_related("customer")
-        .prefetch_related("items__product")
-        .order_by("customer__name")
-    )
 
-    totals = (
-        OrderItem.objects
-        .filter(order__round=rnd)
-        .aggregate(
-            revenue=Sum(ExpressionWrapper(F("sell_price") * F("quantity"), output_field=DecimalField())),
-            cost=Sum(ExpressionWrapper(F("buy_price") * F("quantity"), output_field=DecimalField())),
-        )
+def _order_card_key(order):
+    # gleiche Schlüssel wie {% cache ... order_card o.id o.version %} in partials/order_cards.html
+    return make_template_fragment_key("order_card", [order.id, order.version])
+
+
+def _order_page(rnd, order_filter="", cursor=None):
+    orders = rnd.order_set.select_related("customer")
+    if order_filter in ORDER_FILTERS:
+        orders = orders.filter(ORDER_FILTERS[order_filter])
+    orders, next_cursor = keyset_page(orders, ["customer__name", "id"], cursor, size=PACK_PAGE_SIZE)
+    _prefetch_uncached_items(orders)
+    return orders, next_cursor
+
+
+def _prefetch_uncached_items(orders):
+    # Positionen nur für Karten laden, die nicht schon fertig im Cache liegen
+    keys = {_order_card_key(order): order for order in orders}
+    cached = cache.get_many(keys)
+    prefetch_related_objects(
+        [order for key, order in keys.items() if key not in cached],
+        Prefetch("items", queryset=OrderItem.objects.select_related("product")),
     )
 
-    revenue = totals["revenue"] or Decimal("0")
-    cost = totals["cost"] or Decimal("0")
 
+def _round_totals(rnd, summary):
+    """Kontext für partials/round_totals.html."""
     travel = calc_travel_cost_eur(rnd)
-    profit = revenue - cost - travel
+    return {
+        "round": rnd,
+        "summary": summary,
+        "revenue": summary.revenue,
+        "cost": summary.cost,
+        "travel": travel,
+        "profit": summary.revenue - summary.cost - travel,
+        "km_rate": getattr(settings, "KM_RATE", Decimal("0.30")),
+        "fragment_timeout": settings.FRAGMENT_CACHE_TIMEOUT,
+    }
 
-    return render(request, "core/round_dashboard.html", {
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_round_etag)
+def round_orders(request, round_id):
+    """Weitere Bestellkarten fürs Dashboard (wird beim Scrollen nachgeladen)."""
+    rnd = _get_round(round_id)
+    order_filter = request.GET.get("filter", "")
+    orders, next_cursor = _order_page(rnd, order_filter, request.GET.get("after"))
+    return render(request, "core/partials/order_cards.html", {
         "round": rnd,
+        "orders": orders,
+        "next_cursor": next_cursor,
+        "order_filter": order_filter,
+        "is_first_page": False,
+        "fragment_timeout": settings.FRAGMENT_CACHE_TIMEOUT,
+    })
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_round_etag)
+def round_dashboard(request, round_id):
+    rnd = _get_round(round_id)
+    summary = get_round_summary(rnd)
+
+    # erst im Template auswerten, bei gecachtem Fragment gar nicht
+    shopping_items = partial(forecast.with_forecast, rnd, round_product_totals(rnd))
+
+    order_filter = request.GET.get("filter", "")
+    orders, next_cursor = _order_page(rnd, order_filter)
+
+    return render(request, "core/round_dashboard.html", {
+        **_round_totals(rnd, summary),
         "shopping_items": shopping_items,
         "orders": orders,
-        "revenue": revenue,
-        "cost": cost,
-        "travel": travel,
-        "profit": profit,
-        "km_rate": getattr(settings, "KM_RATE", Decimal("0.30")),
+        "next_cursor": next_cursor,
+        "order_filter": order_filter,
+        "archived": archive.is_archived(rnd),
+    })
+
+
+EVENTS_HEARTBEAT = 15  # Sekunden
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _render_order_card(rnd, order):
+    return render_to_string("core/partials/order_cards.html", {
+        "round": rnd,
+        "orders": [order],
+        "fragment_timeout": settings.FRAGMENT_CACHE_TIMEOUT,
     })
 
 
+def _render_events(round_id, messages):
+    """
+    Fasst die gesammelten Meldungen zusammen und rendert die Deltas:
+    geänderte Bestellkarten (aus dem Fragment-Cache), entfernte IDs und die Summen.
+    """
+    kinds = {kind for kind, _ in messages}
+    changed = {order_id for kind, order_id in messages if kind == "order"}
+    removed = {order_id for kind, order_id in messages if kind == "removed"} - changed
+
+    rnd = Round.objects.filter(id=round_id).first()
+    if rnd is None:
+        return [_sse("reload", {})]
+
+    chunks = []
+    if "reload" in kinds:
+        chunks.append(_sse("reload", {}))
+    elif changed:
+        orders = list(Order.objects.filter(round_id=round_id, id__in=changed).select_related("customer"))
+        _prefetch_uncached_items(orders)
+        for order in orders:
+            chunks.append(_sse("order", {
+                "id": order.id,
+                "paid": order.paid,
+                "picked_up": order.picked_up,
+                "html": _render_order_card(rnd, order),
+            }))
+        # nicht mehr in dieser Runde (verschoben)
+        removed |= changed - {order.id for order in orders}
+    for order_id in sorted(removed):
+        chunks.append(_sse("removed", {"id": order_id}))
+
+    totals = render_to_string("core/partials/round_totals.html", _round_totals(rnd, get_round_summary(rnd)))
+    chunks.append(_sse("totals", {"html": totals}))
+    return chunks
+
+
+@login_required
+async def round_events(request, round_id):
+    """
+    Server-Sent Events fürs Dashboard: neue/geänderte Bestellkarten und Summen,
+    dazwischen alle EVENTS_HEARTBEAT Sekunden ein Kommentar als Heartbeat.
+    Braucht ASGI (meatmanager/asgi.py), unter WSGI würde die Verbindung einen Worker blockieren.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)  # EventSource verbindet sich dann nicht neu
+
+    queue = events.subscribe(round_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n: verbunden\n\n"
+            while True:
+                try:
+                    first = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                messages = [first] + events.drain(queue)
+                for chunk in await sync_to_async(_render_events)(round_id, messages):
+                    yield chunk
+        finally:
+            events.unsubscribe(round_id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: nicht puffern
+    return response
+
+
 @login_required
 def quick_order(request, round_id):
     rnd = get_object_or_404(Round, id=round_id)
 
-    customers = Customer.objects.filter(active=True).order_by("name")
     products = Product.objects.filter(active=True).order_by("name")
 
     if request.method == "POST":
@@ -198,55 +483,108 @@ def quick_order(request, round_id):
             return HttpResponseBadRequest("Kunde fehlt")
 
         customer = get_object_or_404(Customer, id=customer_id)
+        if source not in Order.Source.values:
+            source = Order.Source.CALL
 
-        order = Order.objects.create(
-            customer=customer,
-            round=rnd,
-            source=source,
-            comment=comment,
-        )
-
-        created_items = 0
+        # Erst alles prüfen, dann in einem Rutsch schreiben
+        lines = []
         for p in products:
-            qty_str = (request.POST.get(f"qty_{p.id}") or "").strip().replace(",", ".")
-            if not qty_str:
+            qty = parse_decimal(request.POST.get(f"qty_{p.id}"))
+            if qty is None or qty <= 0:
                 continue
-            try:
-                qty = Decimal(qty_str)
-            except (InvalidOperation, TypeError):
-                continue
-            if qty <= 0:
-                continue
-
-            OrderItem.objects.create(
-                order=order,
-                product=p,
-                quantity=qty,
-                sell_price=p.sell_price,
-                buy_price=p.buy_price,
-            )
-            created_items += 1
+            lines.append((p, qty))
 
-        if created_items == 0:
-            order.delete()
+        if not lines:
             return HttpResponseBadRequest("Keine Positionen eingegeben")
 
+        create_order(rnd, customer, lines, source=source, comment=comment)
+
         return redirect("round_dashboard", round_id=rnd.id)
 
     return render(request, "core/quick_order.html", {
         "round": rnd,
+        "products": products,
+    })
+
+
+def _search_customers(q, customers, limit=50, active_only=False):
+    ids = search.search(q, "customer", limit=limit, active_only=active_only)
+    if ids is None:
+        return customers.filter(Q(name__icontains=q) | Q(phone__icontains=q))[:limit]
+    return search.in_rank_order(customers, ids)
+
+
+@login_required
+def customer_autocomplete(request):
+    q = (request.GET.get("q") or "").strip()
+    customers = _search_customers(q, Customer.objects.filter(active=True), limit=10, active_only=True) if q else []
+    return JsonResponse({
+        "results": [{"id": c.id, "name": c.name, "phone": c.phone} for c in customers],
+    })
+
+
+@login_required
+def search_view(request):
+    q = (request.GET.get("q") or "").strip()
+    customers, products, orders = [], [], []
+    if q:
+        customers = _search_customers(q, Customer.objects.all(), limit=20)
+        ids = search.search(q, "product", limit=20)
+        if ids is None:
+            products = Product.objects.filter(name__icontains=q)[:20]
+        else:
+            products = search.in_rank_order(Product.objects.all(), ids)
+        order_qs = Order.objects.select_related("customer", "round")
+        ids = search.search(q, "order", limit=50)
+        if ids is None:
+            orders = order_qs.filter(comment__icontains=q).order_by("-round__date")[:50]
+        else:
+            orders = search.in_rank_order(order_qs, ids)
+    return render(request, "core/search.html", {
+        "q": q,
         "customers": customers,
         "products": products,
+        "orders": orders,
     })
 
 
+CUSTOMER_PAGE_SIZE = 50
+
+# Sortierung der Kundenliste: Beschriftung, Keyset-Reihenfolge (immer mit eindeutigem Ende)
+# und Bedingung. Nur über indizierte Spalten (Customer.Meta.indexes) – "offen" nutzt
+# customer_open_balance_idx, der nur Kunden mit Saldo enthält.
+CUSTOMER_SORTS = {
+    "name": ("Name", ["name", "id"], Q()),
+    "letzte": ("Letzte Bestellung", ["-last_order", "name", "id"], Q()),
+    "runden": ("Runden", ["-round_count", "name", "id"], Q()),
+    "umsatz": ("Umsatz", ["-revenue", "name", "id"], Q()),
+    "offen": ("Offen", ["-balance", "name", "id"], ~Q(balance=0)),
+}
+
+
 @login_required
 def customer_list(request):
     q = (request.GET.get("q") or "").strip()
-    customers = Customer.objects.all().order_by("name")
+    sort = request.GET.get("sort")
+    if sort not in CUSTOMER_SORTS:
+        sort = "name"
+    _, ordering, condition = CUSTOMER_SORTS[sort]
+    next_cursor = None
     if q:
-        customers = customers.filter(Q(name__icontains=q) | Q(phone__icontains=q))
-    return render(request, "core/customer_list.html", {"customers": customers, "q": q})
+        customers = _search_customers(q, Customer.objects.all())
+    else:
+        customers, next_cursor = keyset_page(
+            Customer.objects.filter(condition), ordering, request.GET.get("after"), size=CUSTOMER_PAGE_SIZE,
+        )
+    return render(request, "core/customer_list.html", {
+        "customers": customers,
+        "q": q,
+        "sort": sort,
+        "sorts": [(key, label) for key, (label, _, _) in CUSTOMER_SORTS.items()],
+        "next_cursor": next_cursor,
+        "never": analytics.NEVER,
+        "stale": analytics.stale_count(),
+    })
 
 
 @login_required
@@ -273,12 +611,69 @@ def customer_edit(request, customer_id):
     return render(request, "core/customer_form.html", {"title": "Kunde bearbeiten", "customer": c})
 
 
+BALANCE_PAGE_SIZE = 50
+
+
+@login_required
+def open_balances(request):
+    """Kunden mit offenem Betrag (oder Guthaben), direkt aus dem gepflegten Saldo."""
+    customers = Customer.objects.filter(~Q(balance=0))
+    total = customers.filter(balance__gt=0).aggregate(total=Sum("balance"))["total"] or Decimal("0")
+    customers, next_cursor = keyset_page(
+        customers, ["-balance", "name", "id"], request.GET.get("after"), size=BALANCE_PAGE_SIZE,
+    )
+    return render(request, "core/open_balances.html", {
+        "customers": customers,
+        "total": total,
+        "next_cursor": next_cursor,
+    })
+
+
+LEDGER_PAGE_SIZE = 30
+
+
+@login_required
+def customer_ledger(request, customer_id):
+    """Kundenkonto: offene Bestellungen, Buchungen und Zahlung erfassen (auch Teilzahlung)."""
+    customer = get_object_or_404(Customer, id=customer_id)
+    open_orders = ledger.open_orders(customer)
+    error = ""
+
+    if request.method == "POST":
+        amount = parse_decimal(request.POST.get("amount"))
+        order = next((o for o, _ in open_orders if str(o.id) == request.POST.get("order")), None)
+        if amount is None or amount <= 0:
+            error = "Bitte einen Betrag größer 0 eingeben."
+        else:
+            with transaction.atomic():
+                ledger.record_payment(customer, amount, order, note=(request.POST.get("note") or "").strip()[:200])
+                # Bestellung damit ganz bezahlt -> auch als bezahlt markieren
+                if order is not None and not order.paid and ledger.open_amount(order) <= 0:
+                    set_status(order.round_id, [order.id], "paid")
+            return redirect("customer_ledger", customer_id=customer.id)
+
+    entries, next_cursor = keyset_page(
+        customer.ledger_entries.all(), ["-id"], request.GET.get("after"), size=LEDGER_PAGE_SIZE,
+    )
+    return render(request, "core/customer_ledger.html", {
+        "customer": customer,
+        "open_orders": open_orders,
+        "entries": entries,
+        "next_cursor": next_cursor,
+        "error": error,
+    })
+
+
 @login_required
 def product_list(request):
     q = (request.GET.get("q") or "").strip()
     products = Product.objects.all().order_by("name")
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(unit__icontains=q))
+        ids = search.search(q, "product")
+        if ids is None:
+            products = products.filter(Q(name__icontains=q) | Q(unit__icontains=q))
+        else:
+            products = search.in_rank_order(products, ids)
     return render(request, "core/product_list.html", {"products": products, "q": q})
 
 
@@ -290,6 +685,7 @@ def product_create(request):
         buy_price = (request.POST.get("buy_price") or "0").replace(",", ".").strip()
         sell_price = (request.POST.get("sell_price") or "0").replace(",", ".").strip()
         active = request.POST.get("active") == "on"
+        pack_size = parse_decimal(request.POST.get("pack_size"))
 
         if name:
             try:
@@ -307,6 +703,7 @@ def product_create(request):
                 buy_price=buy_price_val,
                 sell_price=sell_price_val,
                 active=active,
+                pack_size=pack_size if pack_size and pack_size > 0 else None,
             )
             return redirect("product_list")
 
@@ -335,6 +732,8 @@ def product_edit(request, product_id):
             p.sell_price = Decimal("0")
 
         p.active = request.POST.get("active") == "on"
+        pack_size = parse_decimal(request.POST.get("pack_size"))
+        p.pack_size = pack_size if pack_size and pack_size > 0 else None
         p.save()
         return redirect("product_list")
 
@@ -345,42 +744,26 @@ def product_edit(request, product_id):
 def order_edit(request, order_id):
     order = get_object_or_404(Order.objects.select_related("round", "customer"), id=order_id)
     rnd = order.round
-    products = Product.objects.all().order_by("name")
     existing_items = {item.product_id: item for item in order.items.select_related("product").all()}
+    # Inaktive Produkte nur, wenn sie schon in der Bestellung stehen
+    products = (
+        Product.objects
+        .filter(Q(active=True) | Q(id__in=existing_items.keys()))
+        .order_by("name")
+    )
 
     if request.method == "POST":
-        order.comment = (request.POST.get("comment") or "").strip()
-        order.source = request.POST.get("source") or order.source
-        order.save()
+        comment = (request.POST.get("comment") or "").strip()
+        source = request.POST.get("source") or order.source
+        if source not in Order.Source.values:
+            source = order.source
 
-        for p in products:
-            qty_str = (request.POST.get(f"qty_{p.id}") or "").strip().replace(",", ".")
-            try:
-                qty = Decimal(qty_str) if qty_str != "" else Decimal("0")
-            except (InvalidOperation, TypeError):
-                qty = Decimal("0")
+        wanted = {
+            p.id: (p, parse_decimal(request.POST.get(f"qty_{p.id}"), Decimal("0")))
+            for p in products
+        }
 
-            item = existing_items.get(p.id)
-
-            if qty <= 0:
-                if item:
-                    item.delete()
-                continue
-
-            if item:
-                item.quantity = qty
-                item.save()
-            else:
-                OrderItem.objects.create(
-                    order=order,
-                    product=p,
-                    quantity=qty,
-                    sell_price=p.sell_price,
-                    buy_price=p.buy_price,
-                )
-
-        if not order.items.exists():
-            order.delete()
+        update_order(order, existing_items, wanted, comment=comment, source=source)
 
         return redirect("round_dashboard", round_id=rnd.id)
 
@@ -406,7 +789,11 @@ def order_delete(request, order_id):
 def round_mark_all_paid(request, round_id):
     rnd = get_object_or_404(Round, id=round_id)
     if request.method == "POST":
-        Order.objects.filter(round=rnd).update(paid=True)
+        with transaction.atomic():
+            ledger.settle_orders(Order.objects.filter(round=rnd, paid=False))
+            Order.objects.filter(round=rnd).update(paid=True, version=F("version") + 1)
+            all_orders_marked(rnd.id, "paid_count")
+        events.round_reload(rnd.id)
     return redirect("round_dashboard", round_id=rnd.id)
 
 
@@ -414,5 +801,248 @@ def round_mark_all_paid(request, round_id):
 def round_mark_all_picked(request, round_id):
     rnd = get_object_or_404(Round, id=round_id)
     if request.method == "POST":
-        Order.objects.filter(round=rnd).update(picked_up=True)
+        Order.objects.filter(round=rnd).update(picked_up=True, version=F("version") + 1)
+        all_orders_marked(rnd.id, "picked_count")
+        events.round_reload(rnd.id)
     return redirect("round_dashboard", round_id=rnd.id)
+
+
+@login_required
+def round_reprice(request, round_id):
+    """Preisliste auf eine Runde anwenden: erst Vorschau (GET), dann per POST übernehmen."""
+    rnd = get_object_or_404(Round, id=round_id)
+    params = request.POST if request.method == "POST" else request.GET
+    price_lists = list(PriceList.objects.all()[:50])
+    price_list = next((pl for pl in price_lists if str(pl.id) == params.get("price_list")), None)
+    if price_list is None and "price_list" not in params:
+        price_list = pricing.price_list_for(rnd.date)
+    include_paid = params.get("include_paid") == "on"
+
+    if request.method == "POST" and price_list is not None:
+        pricing.reprice_round(rnd, price_list, include_paid)
+        if params.get("update_products") == "on":
+            pricing.apply_to_products(price_list)
+        return redirect("round_dashboard", round_id=rnd.id)
+
+    rows = pricing.reprice_preview(rnd, price_list, include_paid) if price_list else []
+    return render(request, "core/round_reprice.html", {
+        "round": rnd,
+        "price_lists": price_lists,
+        "price_list": price_list,
+        "include_paid": include_paid,
+        "rows": rows,
+        "totals": pricing.preview_totals(rows),
+    })
+
+
+@staff_member_required
+def price_list_create(request):
+    """Neue Preisliste aus den aktuellen Produktpreisen, Bearbeiten im Admin."""
+    if request.method != "POST":
+        return redirect("product_list")
+    valid_from = _parse_date_param(request.POST.get("valid_from")) or timezone.localdate()
+    price_list = pricing.snapshot_price_list(f"Preise {valid_from:%d.%m.%Y}", valid_from)
+    return redirect("admin:core_pricelist_change", price_list.id)
+
+
+def _parse_date_param(value):
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
+
+
+@login_required
+def export_round_lines(request, round_id):
+    rnd = _get_round(round_id)
+    lines = (
+        OrderItem.objects
+        .using(rnd._state.db)
+        .filter(order__round=rnd)
+        .order_by("order__customer__name", "order_id", "product__name")
+        .values_list(
+            "order__customer__name", "order__customer__phone", "order_id", "order__source",
+            "order__paid", "order__picked_up", "product__name", "product__unit",
+            "quantity", "sell_price", "buy_price", "order__comment",
+        )
+        .iterator(chunk_size=exports.CHUNK_SIZE)
+    )
+
+    def rows():
+        for name, phone, order_id, source, paid, picked, product, unit, qty, sell, buy, comment in lines:
+            yield [
+                name, phone, order_id, source, paid, picked, product, unit,
+                qty, sell, buy, qty * sell, qty * buy, comment,
+            ]
+
+    return exports.csv_response(
+        f"runde-{rnd.date}-positionen.csv",
+        ["Kunde", "Telefon", "Bestellung", "Quelle", "Bezahlt", "Abgeholt", "Produkt", "Einheit",
+         "Menge", "VK", "EK", "Umsatz", "Einkauf", "Notiz"],
+        rows(),
+    )
+
+
+@login_required
+def export_shopping_list(request, round_id):
+    rnd = _get_round(round_id)
+    items = round_product_totals(rnd).values_list("product__name", "product__unit", "total_qty")
+    return exports.csv_response(
+        f"runde-{rnd.date}-einkaufsliste.csv",
+        ["Produkt", "Einheit", "Menge"],
+        items.iterator(chunk_size=exports.CHUNK_SIZE),
+    )
+
+
+def _purchasing_rounds(request):
+    """Runden aus ?runde=1&runde=2 oder ?von=&bis=, ohne Angabe die anstehenden."""
+    round_ids = [int(value) for value in request.GET.getlist("runde") if value.isdigit()]
+    return purchasing.selected_rounds(
+        round_ids,
+        _parse_date_param(request.GET.get("von")),
+        _parse_date_param(request.GET.get("bis")),
+    )
+
+
+@login_required
+def purchasing_list(request):
+    """Sammeleinkauf über mehrere Runden, auf Gebinde aufgerundet."""
+    rounds = _purchasing_rounds(request)
+    selected = {rnd.id for rnd in rounds}
+    choices = list(Round.objects.order_by("-date", "-id")[:12])
+    choices += [rnd for rnd in rounds if rnd not in choices]
+    return render(request, "core/purchasing.html", {
+        "rounds": rounds,
+        "rows": purchasing.consolidated(rounds),
+        "choices": sorted(choices, key=lambda rnd: (rnd.date, rnd.id)),
+        "selected": selected,
+        "query": request.GET.urlencode(),
+    })
+
+
+@login_required
+def export_purchasing(request):
+    rounds = _purchasing_rounds(request)
+    rows = (
+        [row["product__name"], row["product__unit"], *row["per_round"], row["total"],
+         row["product__pack_size"], row["packs"], row["buy_qty"]]
+        for row in purchasing.consolidated(rounds)
+    )
+    return exports.csv_response(
+        "sammeleinkauf.csv",
+        ["Produkt", "Einheit", *[f"Runde {rnd.date:%d.%m.%Y}" for rnd in rounds],
+         "Summe", "Gebinde", "Anzahl Gebinde", "Einkaufsmenge"],
+        rows,
+    )
+
+
+@login_required
+def export_profit(request):
+    """Gewinn je Runde über einen Zeitraum (?von=JJJJ-MM-TT&bis=JJJJ-MM-TT)."""
+    km_rate = getattr(settings, "KM_RATE", Decimal("0.30"))
+    date_from = _parse_date_param(request.GET.get("von"))
+    date_to = _parse_date_param(request.GET.get("bis"))
+
+    def round_stats(db):
+        rounds = Round.objects.using(db).order_by("date", "id")
+        if date_from:
+            rounds = rounds.filter(date__gte=date_from)
+        if date_to:
+            rounds = rounds.filter(date__lte=date_to)
+        return rounds.values_list(
+            "date", "travel_km", "summary__order_count", "summary__paid_count",
+            "summary__revenue", "summary__cost",
+        ).iterator(chunk_size=exports.CHUNK_SIZE)
+
+    # archivierte Runden gehören in die Auswertung, beide Quellen sind nach Datum sortiert
+    sources = [round_stats(DEFAULT_DB_ALIAS)]
+    if archive.available():
+        sources.append(round_stats(ARCHIVE_DB))
+    stats = heapq.merge(*sources, key=lambda row: row[0])
+
+    def rows():
+        for date, km, order_count, paid_count, revenue, cost in stats:
+            revenue = revenue or Decimal("0")
+            cost = cost or Decimal("0")
+            travel = (km or Decimal("0")) * km_rate
+            yield [date, order_count or 0, paid_count or 0, revenue, cost, km, travel, revenue - cost - travel]
+
+    return exports.csv_response(
+        f"gewinn-{date_from or 'anfang'}-{date_to or 'heute'}.csv",
+        ["Datum", "Bestellungen", "Bezahlt", "Umsatz", "Einkauf", "KM", "Fahrtkosten", "Gewinn"],
+        rows(),
+    )
+
+
+def _analytics_range(request):
+    """Zeitraum aus ?von=&bis=, ohne Angabe das laufende Jahr."""
+    if "von" not in request.GET and "bis" not in request.GET:
+        return timezone.localdate().replace(month=1, day=1), None
+    return _parse_date_param(request.GET.get("von")), _parse_date_param(request.GET.get("bis"))
+
+
+@login_required
+def analytics_products(request):
+    """Menge, Umsatz und Marge je Produkt – liest nur die SalesFact-Tabelle."""
+    date_from, date_to = _analytics_range(request)
+    products = list(analytics.product_stats(date_from, date_to))
+    for row in products:
+        row["margin_pct"] = row["margin"] / row["total_revenue"] * 100 if row["total_revenue"] else None
+    return render(request, "core/analytics_products.html", {
+        "products": products,
+        "date_from": date_from,
+        "date_to": date_to,
+        "stale": analytics.stale_count(),
+    })
+
+
+@login_required
+def analytics_product(request, product_id):
+    """Nachfrage eines Produkts je Runde."""
+    product = get_object_or_404(Product, id=product_id)
+    trend = analytics.product_trend(product)
+    peak = max((row["total_qty"] for row in trend), default=0)
+    for row in trend:
+        row["bar"] = int(row["total_qty"] / peak * 100) if peak else 0
+    average = sum(row["total_qty"] for row in trend) / len(trend) if trend else None
+    return render(request, "core/analytics_product.html", {
+        "product": product,
+        "trend": trend,
+        "average": average,
+        "stale": analytics.stale_count(),
+    })
+
+
+@login_required
+def analytics_customers(request):
+    """Umsatz und Bestellhäufigkeit je Kunde."""
+    date_from, date_to = _analytics_range(request)
+    customers = list(analytics.customer_stats(date_from, date_to))
+    for row in customers:
+        row["average"] = row["total_revenue"] / row["rounds"]
+    return render(request, "core/analytics_customers.html", {
+        "customers": customers,
+        "date_from": date_from,
+        "date_to": date_to,
+        "stale": analytics.stale_count(),
+    })
+
+
+@login_required
+@require_POST
+def analytics_refresh(request):
+    """Veraltete Verkaufsfakten neu aufbauen – bewusst per POST, nicht beim Anzeigen."""
+    analytics.refresh_stale()
+    target = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(target, allowed_hosts={request.get_host()}):
+        target = "analytics_products"
+    return redirect(target)
+
+
+@staff_member_required
+def perf_view(request):
+    stats = perf.view_stats(perf.read_entries())
+    return render(request, "core/perf.html", {
+        "stats": stats,
+        "enabled": getattr(settings, "PERF_LOG_ENABLED", False),
+    })
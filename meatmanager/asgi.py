@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Live-Updates im Dashboard (Server-Sent Events, core.views.round_events) laufen
+nur über diesen Einstiegspunkt, z.B.:
+
+    uvicorn meatmanager.asgi:application --workers 1
+
+Der Broadcaster (core.events) lebt im Prozess, daher nur EIN Worker-Prozess.
+Unter WSGI/runserver antwortet der Endpunkt mit 204 und das Dashboard bleibt statisch.
 """
 
 import os
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decimal import Decimal
 
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerfMiddleware',  # nur aktiv mit PERF_LOG_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +88,77 @@ DATABASES = {
     }
 }
 
+# Produktionsprofil für SQLite, einschalten mit MEATMANAGER_DB_PROFILE=production.
+# WAL: Lesen blockiert Schreiben nicht mehr; IMMEDIATE holt die Schreibsperre schon
+# bei BEGIN, statt beim ersten UPDATE in "database is locked" zu laufen (wartet
+# stattdessen bis busy_timeout). Verbindungen bleiben offen (CONN_MAX_AGE).
+# Vergleich mit den Standardwerten: python manage.py benchmark_writers
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",     # mit WAL sicher, spart fsync pro Commit
+    "PRAGMA busy_timeout=5000",      # ms warten statt sofort "locked"
+    "PRAGMA mmap_size=134217728",    # 128 MB
+    "PRAGMA cache_size=-20000",      # ~20 MB Page-Cache pro Verbindung
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA optimize=0x10002",       # Statistiken bei Bedarf auffrischen (langlebige Verbindung)
+]
+
+SQLITE_PRODUCTION = {
+    "OPTIONS": {
+        "init_command": "; ".join(SQLITE_PRAGMAS),
+        "transaction_mode": "IMMEDIATE",
+    },
+    "CONN_MAX_AGE": 600,
+    "CONN_HEALTH_CHECKS": True,
+}
+
+DB_PROFILE = os.environ.get("MEATMANAGER_DB_PROFILE", "default")
+
+if DB_PROFILE == "production":
+    DATABASES["default"].update(SQLITE_PRODUCTION)
+
+# Archiv für abgeschlossene Runden (manage.py archive_rounds), eigene SQLite-Datei.
+# Die Rundenansichten lesen archivierte Runden von dort, ändern kann man sie erst
+# nach dem Wiederherstellen.
+DATABASES["archive"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": os.environ.get("MEATMANAGER_ARCHIVE_DB", BASE_DIR / "archive.sqlite3"),
+}
+
+DATABASE_ROUTERS = ["core.routers.ArchiveRouter"]
+
+
+# Cache für gerenderte Fragmente (Bestellkarten, Einkaufsliste) – Schlüssel enthalten
+# Versionszähler, veraltete Einträge werden nie gelesen und laufen einfach aus.
+# Standard: Arbeitsspeicher pro Prozess. Mit MEATMANAGER_CACHE_DIR=/pfad ein Datei-Cache,
+# den sich mehrere Worker teilen.
+CACHE_DIR = os.environ.get("MEATMANAGER_CACHE_DIR")
+# erhöhen, wenn sich gecachte Templates ändern (macht alle alten Einträge ungültig)
+CACHE_VERSION = 2
+
+if CACHE_DIR:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR,
+            "TIMEOUT": 24 * 60 * 60,
+            "VERSION": CACHE_VERSION,
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "meatmanager",
+            "TIMEOUT": 24 * 60 * 60,
+            "VERSION": CACHE_VERSION,
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        }
+    }
+
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -127,3 +200,15 @@ STATIC_URL = 'static/'
 
 LOGIN_URL = "/admin/login/"
 
+
+# Performance-Messung pro Request (core.middleware.PerfMiddleware), Auswertung unter /perf/
+# Einschalten mit MEATMANAGER_PERF=1
+PERF_LOG_ENABLED = os.environ.get("MEATMANAGER_PERF") == "1"
+PERF_LOG_FILE = BASE_DIR / "perf.jsonl"
+PERF_LOG_MAX_BYTES = 5 * 1024 * 1024
+PERF_LOG_BACKUPS = 3
+
+if PERF_LOG_ENABLED:
+    # misst zusätzlich die Renderzeit der Templates
+    TEMPLATES[0]["BACKEND"] = "core.perf.PerfTemplates"
+